@@ -0,0 +1,53 @@
+from flask import Blueprint, request, jsonify, make_response
+from services import letterhead
+
+asset_bp = Blueprint('assets', __name__)
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def _not_modified(etag):
+    return etag in [c.strip() for c in request.headers.get('If-None-Match', '').split(',')]
+
+
+@asset_bp.route('/letterhead', methods=['GET'])
+def letterhead_manifest():
+    """Letterhead asset names and a ready-made logo data URI for printing.
+
+    Small and revalidated by ETag, so a print only downloads it again after
+    the logo changes. Served gzip-compressed when the client accepts it.
+    """
+    try:
+        assets = letterhead.load()
+        etag = f'"{assets["hash"]}"'
+        if _not_modified(etag):
+            response = make_response('', 304)
+        elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+            response = make_response(assets['manifest_gzip'])
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = make_response(assets['manifest'])
+        response.mimetype = 'application/json'
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = 'public, no-cache'
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@asset_bp.route('/<name>', methods=['GET'])
+def letterhead_file(name):
+    """Content-hash named logo variant (letterhead-<hash>.jpeg / .webp)."""
+    asset = letterhead.load()['files'].get(name)
+    if asset is None:
+        return jsonify({'error': 'Asset not found'}), 404
+    etag = f'"{name}"'
+    if _not_modified(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(asset['data'])
+        response.mimetype = asset['mimetype']
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
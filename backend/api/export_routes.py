@@ -0,0 +1,57 @@
+from flask import Blueprint, Response, request, jsonify
+import logging
+from datetime import datetime
+from api.routes import _get_user_from_header
+from services import export
+
+export_bp = Blueprint('export', __name__)
+
+
+@export_bp.route('/<table>', methods=['GET', 'OPTIONS'])
+def export_table(table):
+    """Stream visits, medicines or prescriptions with a date in [from, to] as a download.
+
+    Query params: from, to (YYYY-MM-DD, either may be left out for an open range),
+    format=csv|ndjson|xlsx (default csv), gzip=1 (csv and ndjson),
+    medicines=0 (prescriptions without their medicines)
+    """
+    if request.method == 'OPTIONS':
+        return ('', 200)
+
+    try:
+        user_id = _get_user_from_header(request)
+        if not user_id:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        if table not in export.TABLES:
+            return jsonify({"error": f"table must be one of: {', '.join(export.TABLES)}"}), 404
+
+        date_from = request.args.get('from') or None
+        date_to = request.args.get('to') or None
+        output = request.args.get('format', 'csv')
+        if output not in export.FORMATS:
+            return jsonify({"error": f"format must be one of: {', '.join(export.FORMATS)}"}), 400
+        try:
+            for value in (date_from, date_to):
+                if value:
+                    datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({"error": "from and to must be dates (YYYY-MM-DD)"}), 400
+
+        try:
+            body = export.Export(table, output, date_from, date_to,
+                                 gzip=request.args.get('gzip') == '1',
+                                 with_medicines=request.args.get('medicines') != '0')
+        except RuntimeError as e:
+            return jsonify({"error": str(e)}), 503
+
+        response = Response(body, mimetype=body.mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="{body.file_name}"'
+        response.headers['Cache-Control'] = 'no-store'
+        # Keep proxies such as nginx from buffering the whole export before sending it
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    except Exception as e:
+        logging.exception('export_table error')
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,29 @@
+from flask import Blueprint, request, jsonify
+import logging
+from api.routes import _get_user_from_header
+from services import medicine_index
+
+medicine_bp = Blueprint('medicine_list', __name__)
+
+
+@medicine_bp.route('/suggest', methods=['GET', 'OPTIONS'])
+def suggest_medicines():
+    """Ranked medicine name suggestions for the prescription dropdown.
+
+    Query params: q (partial name, brand or generic), limit (default 10, max 50)
+    """
+    if request.method == 'OPTIONS':
+        return ('', 200)
+
+    try:
+        user_id = _get_user_from_header(request)
+        if not user_id:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        query = request.args.get('q', '')
+        limit = request.args.get('limit', medicine_index.DEFAULT_LIMIT, type=int)
+        return jsonify({'query': query, 'suggestions': medicine_index.suggest(query, limit)}), 200
+
+    except Exception as e:
+        logging.exception('suggest_medicines error')
+        return jsonify({"error": str(e)}), 500
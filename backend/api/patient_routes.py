@@ -1,12 +1,19 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file
 import os
+import logging
 from werkzeug.utils import secure_filename
-from supabase_client import get_admin_client
+from supabase_client import get_admin_client, mark_admin_client_failed, CONNECTION_ERRORS
+from api.routes import _get_user_from_header
+from services import image_processing, image_cache, patient_index, patient_card
 
 patient_bp = Blueprint('patients', __name__)
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 SUPABASE_BUCKET = 'patient_images'
+# 'proxy' serves images (and ?w= variants) from the local image cache,
+# 'redirect' sends the browser to the Supabase public URL
+IMAGE_PROXY_MODE = os.getenv('IMAGE_PROXY_MODE', 'proxy').lower()
+IMAGE_MAX_AGE = 365 * 24 * 3600
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -14,6 +21,13 @@ def allowed_file(filename):
 @patient_bp.route('/upload-image', methods=['POST'])
 def upload_image():
     try:
+        # Enforce the size limit before the multipart body is parsed or buffered
+        if request.content_length is None:
+            return jsonify({'error': 'Content-Length required'}), 411
+        if request.content_length > image_processing.IMAGE_MAX_UPLOAD_BYTES:
+            limit_mb = image_processing.IMAGE_MAX_UPLOAD_BYTES / (1024 * 1024)
+            return jsonify({'error': f'Image is too large (max {limit_mb:.0f} MB)'}), 413
+        
         if 'image' not in request.files:
             return jsonify({'error': 'No image file provided'}), 400
         
@@ -37,15 +51,26 @@ def upload_image():
         if not supabase:
             return jsonify({'error': 'Supabase client not available'}), 500
         
-        # Read file bytes
-        file_bytes = file.read()
+        if image_processing.available():
+            # Decode, fix orientation and shrink in the image worker pool;
+            # the upload is read straight from werkzeug's spooled temp file
+            try:
+                file_bytes = image_processing.process_upload(file.stream)
+            except image_processing.ImageProcessingError as e:
+                return jsonify({'error': str(e)}), 400
+            secure_name = image_processing.jpeg_name(secure_name)
+            content_type = 'image/jpeg'
+        else:
+            file_bytes = file.read()
+            content_type = file.content_type
         
         # Upload to Supabase Storage bucket
         response = supabase.storage.from_(SUPABASE_BUCKET).upload(
             path=secure_name,
             file=file_bytes,
-            file_options={"content-type": file.content_type, "upsert": "true"}
+            file_options={"content-type": content_type, "upsert": "true"}
         )
+        image_cache.invalidate(secure_name)
         
         return jsonify({
             'success': True,
@@ -59,9 +84,18 @@ def upload_image():
 @patient_bp.route('/image/<filename>', methods=['GET'])
 def get_image(filename):
     try:
+        if IMAGE_PROXY_MODE == 'proxy':
+            width = image_cache.variant_width(request.args.get('w', type=int))
+            # The client is only taken when the image is not cached yet
+            path, etag, mimetype = image_cache.get_image(get_admin_client, filename, width)
+            response = send_file(path, mimetype=mimetype, etag=etag, conditional=True, max_age=IMAGE_MAX_AGE)
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+            return response
+        
         supabase = get_admin_client()
         if not supabase:
-            return jsonify({'error': 'Supabase client not available'}), 500
+            return jsonify({'error': 'Supabase client not available'}), 503
         
         # Get public URL from Supabase Storage
         public_url = supabase.storage.from_(SUPABASE_BUCKET).get_public_url(filename)
@@ -70,8 +104,95 @@ def get_image(filename):
         from flask import redirect
         return redirect(public_url)
         
-    except Exception as e:
+    except image_cache.ImageNotFound:
         return jsonify({'error': 'Image not found'}), 404
+    except image_cache.ImageStorageUnavailable as e:
+        logging.warning(f'get_image {filename}: {e}')
+        return jsonify({'error': str(e)}), 503
+    except image_cache.ImageStorageError as e:
+        if isinstance(e.__cause__, CONNECTION_ERRORS):
+            mark_admin_client_failed()
+        logging.exception(f'get_image {filename}: storage error')
+        return jsonify({'error': 'Image storage unavailable'}), 502
+    except Exception:
+        logging.exception(f'get_image {filename} error')
+        return jsonify({'error': 'Image could not be served'}), 500
+
+@patient_bp.route('/search', methods=['GET'])
+def search_patients():
+    """Ranked patient search from the in-memory index.
+
+    Query params: q (partial name), phone (any run of digits), sex,
+    limit (default 10, max 100), offset
+    """
+    try:
+        if not _get_user_from_header(request):
+            return jsonify({'error': 'Unauthorized'}), 401
+        
+        results, total, truncated = patient_index.search(
+            name=request.args.get('q', ''),
+            phone=request.args.get('phone', ''),
+            sex=request.args.get('sex') or None,
+            limit=request.args.get('limit', patient_index.DEFAULT_LIMIT, type=int),
+            offset=request.args.get('offset', 0, type=int),
+        )
+        return jsonify({'results': results, 'total': total, 'truncated': truncated}), 200
+        
+    except Exception as e:
+        logging.exception('search_patients error')
+        return jsonify({'error': str(e)}), 500
+
+@patient_bp.route('/<int:patient_id>/reindex', methods=['POST'])
+def reindex_patient(patient_id):
+    """Refresh one patient in the search index and card cache after it was added, edited or deleted."""
+    try:
+        if not _get_user_from_header(request):
+            return jsonify({'error': 'Unauthorized'}), 401
+        
+        if not get_admin_client():
+            return jsonify({'error': 'Supabase client not available'}), 500
+        
+        row = patient_index.reindex(patient_id)
+        patient_card.invalidate(patient_id)
+        return jsonify({'success': True, 'indexed': row is not None}), 200
+        
+    except Exception as e:
+        logging.exception('reindex_patient error')
+        return jsonify({'error': str(e)}), 500
+
+@patient_bp.route('/<int:patient_id>/card', methods=['GET', 'DELETE'])
+def get_patient_card(patient_id):
+    """Patient, visits with prescriptions, medicine purchases and totals in one document.
+
+    Query params: fields (comma-separated: patient, visits, prescriptions,
+    medicines, stats; default all), fresh=1 to bypass the cache.
+    DELETE drops the cached card after a visit, medicine or prescription write.
+    """
+    try:
+        if not _get_user_from_header(request):
+            return jsonify({'error': 'Unauthorized'}), 401
+        
+        if request.method == 'DELETE':
+            patient_card.invalidate(patient_id)
+            return jsonify({'success': True}), 200
+        
+        try:
+            fields = patient_card.parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        client = get_admin_client()
+        if not client:
+            return jsonify({'error': 'Supabase client not available'}), 500
+        
+        card = patient_card.get(client, patient_id, fresh=request.args.get('fresh') == '1')
+        return jsonify(patient_card.project(card, fields)), 200
+        
+    except patient_card.PatientNotFound:
+        return jsonify({'error': 'Patient not found'}), 404
+    except Exception as e:
+        logging.exception('get_patient_card error')
+        return jsonify({'error': str(e)}), 500
 
 @patient_bp.route('/update/<int:patient_id>', methods=['PUT'])
 def update_patient(patient_id):
@@ -0,0 +1,141 @@
+from flask import Blueprint, request, jsonify, make_response
+import logging
+from datetime import datetime
+from supabase_client import get_admin_client
+from api.routes import _get_user_from_header
+from services import prescription_pdf, prescription_save
+
+prescription_bp = Blueprint('prescriptions', __name__)
+
+
+def _pdf_response(data, etag, filename, mimetype='application/pdf', download=False):
+    etag = f'"{etag}"'
+    if etag in [c.strip() for c in request.headers.get('If-None-Match', '').split(',')]:
+        response = make_response('', 304)
+    else:
+        response = make_response(data)
+        response.mimetype = mimetype
+        disposition = 'attachment' if download else 'inline'
+        response.headers['Content-Disposition'] = f'{disposition}; filename="{filename}"'
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@prescription_bp.route('/<int:prescription_id>/pdf', methods=['GET', 'OPTIONS'])
+def prescription_pdf_view(prescription_id):
+    """Render one prescription as a PDF (?instructions= adds the print-only instructions)."""
+    if request.method == 'OPTIONS':
+        return ('', 200)
+
+    try:
+        user_id = _get_user_from_header(request)
+        if not user_id:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        if not prescription_pdf.available():
+            return jsonify({"error": "PDF rendering is not available (install fpdf2)"}), 503
+
+        client = get_admin_client()
+        if not client:
+            return jsonify({"error": "Database unavailable"}), 503
+
+        doc = prescription_pdf.load_document(client, prescription_id, request.args.get('instructions'))
+        data, etag = prescription_pdf.render_cached([doc])
+        return _pdf_response(data, etag, prescription_pdf.file_name(doc),
+                             download=request.args.get('download') == '1')
+
+    except prescription_pdf.PrescriptionNotFound:
+        return jsonify({"error": "Prescription not found"}), 404
+    except Exception as e:
+        logging.exception('prescription_pdf error')
+        return jsonify({"error": str(e)}), 500
+
+
+@prescription_bp.route('/batch', methods=['GET', 'OPTIONS'])
+def prescription_batch():
+    """All prescriptions whose visit date is in [from, to] as one PDF or a ZIP of PDFs.
+
+    Query params: from, to (YYYY-MM-DD, to defaults to from), format=pdf|zip
+    """
+    if request.method == 'OPTIONS':
+        return ('', 200)
+
+    try:
+        user_id = _get_user_from_header(request)
+        if not user_id:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        if not prescription_pdf.available():
+            return jsonify({"error": "PDF rendering is not available (install fpdf2)"}), 503
+
+        date_from = request.args.get('from')
+        date_to = request.args.get('to') or date_from
+        output = request.args.get('format', 'pdf')
+        if output not in ('pdf', 'zip'):
+            return jsonify({"error": "format must be pdf or zip"}), 400
+        try:
+            datetime.strptime(date_from or '', '%Y-%m-%d')
+            datetime.strptime(date_to, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({"error": "from and to must be dates (YYYY-MM-DD)"}), 400
+
+        client = get_admin_client()
+        if not client:
+            return jsonify({"error": "Database unavailable"}), 503
+
+        try:
+            docs = prescription_pdf.load_documents_for_range(client, date_from, date_to)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not docs:
+            return jsonify({"error": "No prescriptions in this date range"}), 404
+
+        name = f"prescriptions_{date_from.replace('-', '')}_{date_to.replace('-', '')}"
+        if output == 'zip':
+            rendered = prescription_pdf.render_each_cached(docs)
+            data = prescription_pdf.build_zip(rendered)
+            etag = prescription_pdf.content_hash(docs)
+            return _pdf_response(data, etag, f'{name}.zip', mimetype='application/zip', download=True)
+
+        data, etag = prescription_pdf.render_combined(docs)
+        return _pdf_response(data, etag, f'{name}.pdf', download=request.args.get('download') == '1')
+
+    except Exception as e:
+        logging.exception('prescription_batch error')
+        return jsonify({"error": str(e)}), 500
+
+
+@prescription_bp.route('/save', methods=['POST', 'OPTIONS'])
+def save_prescription():
+    """Create or update a visit's prescription and its medicines in one transaction.
+
+    Body: {visit_id, symptoms, findings, diagnosis, procedures,
+    medicines: [{medicine_id?, medicine_name, quantity, time, areasite, duration}], log_action?}
+    Medicines with the medicine_id of a stored row update it; the rest are added,
+    and stored medicines left out of the list are removed.
+    """
+    if request.method == 'OPTIONS':
+        return ('', 200)
+
+    try:
+        user_id = _get_user_from_header(request)
+        if not user_id:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        try:
+            save_request = prescription_save.parse(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        client = get_admin_client()
+        if not client:
+            return jsonify({"error": "Database unavailable"}), 503
+
+        return jsonify(prescription_save.save(client, user_id, save_request)), 200
+
+    except prescription_save.VisitNotFound:
+        return jsonify({"error": "Visit not found"}), 404
+    except Exception as e:
+        logging.exception('save_prescription error')
+        return jsonify({"error": str(e)}), 500
@@ -1,7 +1,15 @@
 from flask import Blueprint, jsonify, request
+import base64
+import json
 import logging
+from datetime import datetime
 
-from supabase_client import get_admin_client, get_user_from_access_token
+from supabase_client import get_admin_client, get_client_pool, get_user_from_access_token
+import user_directory
+import async_supabase
+from response_cache import cached_response
+from services import financial_rollup, activity_log
+from services import financial_summary as financial_summary_service
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -38,19 +46,16 @@ def auth_me():
         if not user_id:
             return jsonify({"error": "Unauthorized"}), 401
         
-        client = get_admin_client()
-        if not client:
+        # Served from the in-memory users directory: no pooled client is taken for the request
+        if not get_client_pool():
             return jsonify({"error": "Database unavailable"}), 503
         
-        # Fetch user from Supabase users table
-        res = client.table('users').select('*').eq('uuid', user_id).execute()
-        users = res.data if hasattr(res, 'data') else []
+        user_data = user_directory.get_user(user_id)
         
-        if not users:
+        if not user_data:
             return jsonify({"error": "User not found"}), 404
         
-        user_data = users[0]
-        logging.info(f'✅ [auth/me] User found: email={user_data.get("email")}, role={user_data.get("role")}')
+        logging.debug('auth/me: role=%s', user_data.get('role'))
         return jsonify(user_data), 200
         
     except Exception as e:
@@ -71,8 +76,8 @@ def auth_create_user():
         email = payload.get('email')
         screenname = payload.get('screenname') or (email.split('@')[0] if isinstance(email, str) and '@' in email else None)
         
-        logging.info(f'auth_create_user called with email: {email}')
-        logging.info(f'Authorization header present: {bool(request.headers.get("Authorization"))}')
+        logging.debug('auth_create_user called, authorization header present: %s',
+                      bool(request.headers.get('Authorization')))
         
         uid = _get_user_from_header(request)
         if not uid:
@@ -83,24 +88,15 @@ def auth_create_user():
         if not client:
             return jsonify({'error': 'supabase client missing'}), 500
         
-        # Check if user already exists by uuid
-        try:
-            rc = client.table('users').select('uuid,email').eq('uuid', uid).limit(1).execute()
-            rows = rc.data if hasattr(rc, 'data') else (rc.get('data') if isinstance(rc, dict) else None)
-            if rows and len(rows) > 0:
-                return jsonify({'success': True, 'uuid': uid, 'was_inaugural_login': False}), 200
-        except Exception:
-            pass
-        
-        # Check if user exists by email
+        # Look the user up by uuid and by email at the same time
+        lookups = [lambda c: c.table('users').select('uuid,email').eq('uuid', uid).limit(1)]
         if email:
-            try:
-                rc2 = client.table('users').select('uuid,email').eq('email', email).limit(1).execute()
-                r2 = rc2.data if hasattr(rc2, 'data') else (rc2.get('data') if isinstance(rc2, dict) else None)
-                if r2 and len(r2) > 0:
-                    return jsonify({'success': True, 'uuid': r2[0].get('uuid'), 'was_inaugural_login': False}), 200
-            except Exception:
-                pass
+            lookups.append(lambda c: c.table('users').select('uuid,email').eq('email', email).limit(1))
+        by_uuid, *by_email = async_supabase.query_all(*lookups)
+        if isinstance(by_uuid, list) and by_uuid:
+            return jsonify({'success': True, 'uuid': uid, 'was_inaugural_login': False}), 200
+        if by_email and isinstance(by_email[0], list) and by_email[0]:
+            return jsonify({'success': True, 'uuid': by_email[0][0].get('uuid'), 'was_inaugural_login': False}), 200
         
         # Insert new user
         resolved_screen = screenname or (email.split('@')[0] if email and '@' in email else str(uid))
@@ -114,6 +110,7 @@ def auth_create_user():
         
         try:
             ins = client.table('users').insert(insert_payload).execute()
+            user_directory.invalidate()
             return jsonify({'success': True, 'uuid': uid, 'was_inaugural_login': True}), 200
         except Exception as e:
             logging.exception('auth_create_user insert error')
@@ -186,6 +183,7 @@ def auth_upsert_user():
                 }
                 client.table('users').insert(insert_payload).execute()
             
+            user_directory.invalidate()
             return jsonify({'success': True, 'uuid': uuid}), 200
         except Exception as e:
             logging.exception('auth_upsert_user error')
@@ -195,6 +193,28 @@ def auth_upsert_user():
         return jsonify({'error': str(exc)}), 500
 
 
+@api_bp.route('/users', methods=['GET', 'OPTIONS'])
+def list_users():
+    """Staff list (uuid, screenname, email, role, approved) from the users directory."""
+    if request.method == 'OPTIONS':
+        return ('', 200)
+    
+    try:
+        user_id = _get_user_from_header(request)
+        if not user_id:
+            return jsonify({"error": "Unauthorized"}), 401
+        
+        # Served from the users directory: no pooled client is taken for the request
+        if get_client_pool() is None:
+            return jsonify({"error": "Database unavailable"}), 503
+        
+        return jsonify({'users': user_directory.list_users()}), 200
+        
+    except Exception as e:
+        logging.exception('list_users error')
+        return jsonify({"error": str(e)}), 500
+
+
 # ============= PLACEHOLDER ROUTES =============
 
 @api_bp.route('/home', methods=['GET', 'OPTIONS'])
@@ -234,137 +254,96 @@ def dashboard():
 # ============= FINANCIAL STATS ROUTES =============
 
 @api_bp.route('/financials/monthly-stats', methods=['GET', 'OPTIONS'])
+@cached_response(ttl=60, tags=('financials',))
 def monthly_stats():
-    """Get monthly breakdown statistics - SIMPLE AND CLEAN."""
+    """Get monthly breakdown statistics from the persisted monthly rollup."""
     if request.method == 'OPTIONS':
         return ('', 200)
     
     try:
-        from datetime import datetime
-        import calendar
-        
         client = get_admin_client()
         if not client:
             return jsonify({"error": "Database unavailable"}), 503
         
-        # Fetch ALL visits - you set limit to 50000 so just pull everything
-        visits_response = client.table('visits').select('date, consultation_fee, drug_fee, Procedure_Fee, new_old, referral').execute()
-        visits_data = visits_response.data if hasattr(visits_response, 'data') else []
-        logging.info(f'Fetched {len(visits_data)} total visits')
+        result = financial_rollup.read_monthly_stats(client)
+        if result is None:
+            # Rollup not built yet - aggregate from the source tables
+            logging.warning('monthly_stats: rollup empty, computing from visits/medicines')
+            result = financial_rollup.format_monthly_stats(financial_rollup.compute_months(client))
         
-        # Fetch ALL medicines
-        medicines_response = client.table('medicines').select('date, drug_fee').execute()
-        medicines_data = medicines_response.data if hasattr(medicines_response, 'data') else []
-        logging.info(f'Fetched {len(medicines_data)} total medicine records')
+        # Pick up rows changed since the last refresh without blocking this request
+        financial_rollup.refresh_if_stale()
         
-        # Group by month
-        monthly_map = {}
+        return jsonify(result), 200
         
-        # Process visits - COUNT visits and SUM fees
-        for visit in visits_data:
-            date_str = visit.get('date')
-            if not date_str:
-                continue
-            
-            # Parse date
-            try:
-                if 'T' in date_str:
-                    date_obj = datetime.fromisoformat(date_str.replace('Z', '').replace('+00:00', ''))
-                else:
-                    date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-            except:
-                continue
-            
-            month_key = f"{date_obj.year}-{date_obj.month:02d}"
-            
-            # Initialize month if not exists
-            if month_key not in monthly_map:
-                monthly_map[month_key] = {
-                    'month': month_key,
-                    'totalVisits': 0,
-                    'drugVisits': 0,
-                    'totalRevenue': 0,
-                    'newPatients': 0,
-                    'googleReferrals': 0,
-                }
-            
-            # COUNT visits
-            monthly_map[month_key]['totalVisits'] += 1
-            
-            # SUM revenue from visits table: consultation_fee + drug_fee + Procedure_Fee
-            consultation_fee = float(visit.get('consultation_fee') or 0)
-            drug_fee = float(visit.get('drug_fee') or 0)
-            procedure_fee = float(visit.get('Procedure_Fee') or 0)
-            monthly_map[month_key]['totalRevenue'] += consultation_fee + drug_fee + procedure_fee
-            
-            # COUNT new patients where new_old = 'N'
-            new_old_val = str(visit.get('new_old') or '').strip().upper()
-            if new_old_val == 'N':
-                monthly_map[month_key]['newPatients'] += 1
-            
-            # COUNT Google referrals (case insensitive)
-            referral = str(visit.get('referral') or '').lower()
-            if 'google' in referral:
-                monthly_map[month_key]['googleReferrals'] += 1
-        
-        # Process medicines - COUNT drug visits and SUM drug_fee
-        for medicine in medicines_data:
-            date_str = medicine.get('date')
-            if not date_str:
-                continue
-            
-            # Parse date
-            try:
-                if 'T' in date_str:
-                    date_obj = datetime.fromisoformat(date_str.replace('Z', '').replace('+00:00', ''))
-                else:
-                    date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-            except:
-                continue
-            
-            month_key = f"{date_obj.year}-{date_obj.month:02d}"
-            
-            # Initialize month if not exists
-            if month_key not in monthly_map:
-                monthly_map[month_key] = {
-                    'month': month_key,
-                    'totalVisits': 0,
-                    'drugVisits': 0,
-                    'totalRevenue': 0,
-                    'newPatients': 0,
-                    'googleReferrals': 0,
-                }
-            
-            # COUNT drug visits
-            monthly_map[month_key]['drugVisits'] += 1
-            
-            # SUM revenue from medicines table: drug_fee
-            drug_fee = float(medicine.get('drug_fee') or 0)
-            monthly_map[month_key]['totalRevenue'] += drug_fee
+    except Exception as e:
+        logging.exception('monthly_stats error')
+        return jsonify({"error": str(e)}), 500
+
+
+@api_bp.route('/financials/summary', methods=['GET', 'OPTIONS'])
+@cached_response(ttl=60, tags=('financials',), user=_get_user_from_header)
+def financial_summary():
+    """Revenue by fee type and payment method, plus patient counts, per day/week/month."""
+    if request.method == 'OPTIONS':
+        return ('', 200)
+    
+    try:
+        user_id = _get_user_from_header(request)
+        if not user_id:
+            return jsonify({"error": "Unauthorized"}), 401
         
-        # Calculate avg daily revenue for each month
-        result = []
-        for month_key, stats in monthly_map.items():
-            year, month = map(int, month_key.split('-'))
-            days_in_month = calendar.monthrange(year, month)[1]
-            stats['avgDailyRevenue'] = stats['totalRevenue'] / days_in_month
-            result.append(stats)
+        granularity = request.args.get('granularity', 'day')
+        date_from = request.args.get('from')
+        date_to = request.args.get('to')
+        for value in (date_from, date_to):
+            if value:
+                try:
+                    datetime.strptime(value, '%Y-%m-%d')
+                except ValueError:
+                    return jsonify({"error": "from/to must be YYYY-MM-DD"}), 400
         
-        # Sort by month descending (most recent first)
-        result.sort(key=lambda x: x['month'], reverse=True)
+        client = get_admin_client()
+        if not client:
+            return jsonify({"error": "Database unavailable"}), 503
         
-        logging.info(f"Returning {len(result)} months of data")
+        try:
+            summary = financial_summary_service.build_summary(client, granularity, date_from, date_to)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        return jsonify(result), 200
+        return jsonify(summary), 200
         
     except Exception as e:
-        logging.exception('monthly_stats error')
+        logging.exception('financial_summary error')
         return jsonify({"error": str(e)}), 500
 
 
 # ============= ACTIVITY LOGS ROUTES =============
 
+ACTIVITY_LOG_MAX_PER_PAGE = 100
+COUNT_METHODS = ('exact', 'planned', 'estimated')
+
+
+def _encode_cursor(log):
+    """Opaque cursor for the (created_at, log_id) position of a log row."""
+    raw = json.dumps({'c': log.get('created_at'), 'i': log.get('log_id')}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor):
+    """(created_at, log_id) of a cursor; created_at is re-serialized so only a timestamp reaches the filter."""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    if not isinstance(data, dict) or not isinstance(data.get('c'), str) \
+            or not isinstance(data.get('i'), int) or isinstance(data.get('i'), bool):
+        raise ValueError('invalid cursor')
+    created_at = datetime.fromisoformat(data['c'])
+    return created_at.isoformat(), data['i']
+
+
 @api_bp.route('/activity-logs', methods=['GET', 'OPTIONS'])
+@cached_response(ttl=15, tags=('activity_logs',), user=_get_user_from_header)
 def get_activity_logs():
     """Get paginated activity logs with user details and filters."""
     if request.method == 'OPTIONS':
@@ -379,11 +358,27 @@ def get_activity_logs():
         if not client:
             return jsonify({"error": "Database unavailable"}), 503
         
-        # Get pagination params
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
-        from_idx = (page - 1) * per_page
-        to_idx = from_idx + per_page - 1
+        # Get pagination params: cursor (keyset) or legacy page/per_page
+        try:
+            page = int(request.args.get('page', 1))
+            per_page = min(max(int(request.args.get('per_page', 20)), 1), ACTIVITY_LOG_MAX_PER_PAGE)
+        except ValueError:
+            return jsonify({"error": "page and per_page must be integers"}), 400
+        cursor = request.args.get('cursor')
+        position = None
+        if cursor:
+            try:
+                position = _decode_cursor(cursor)
+            except Exception:
+                return jsonify({"error": "Invalid cursor"}), 400
+        
+        # Counting scans the filtered table, so it is opt-in; legacy page
+        # requests get the cheap planner estimate to keep their 'total'
+        count_method = request.args.get('count') or (None if cursor or 'page' not in request.args else 'estimated')
+        if count_method in ('none', ''):
+            count_method = None
+        if count_method is not None and count_method not in COUNT_METHODS:
+            return jsonify({"error": f"count must be one of {', '.join(COUNT_METHODS)}"}), 400
         
         # Get filter params
         date_from = request.args.get('date_from')
@@ -391,7 +386,10 @@ def get_activity_logs():
         user_uuid = request.args.get('user_uuid')
         
         # Build query
-        query = client.table('activity_logs').select('*', count='exact')
+        if count_method:
+            query = client.table('activity_logs').select('*', count=count_method)
+        else:
+            query = client.table('activity_logs').select('*')
         
         # Apply filters
         if date_from:
@@ -401,42 +399,45 @@ def get_activity_logs():
         if user_uuid:
             query = query.eq('user_uuid', user_uuid)
         
-        # Fetch logs with count
-        logs_response = query.order('created_at', desc=True).range(from_idx, to_idx).execute()
+        # Seek past the cursor position on (created_at, log_id), newest first
+        if position:
+            created_at, log_id = position
+            query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",log_id.lt.{log_id})')
+        query = query.order('created_at', desc=True).order('log_id', desc=True)
+        
+        # Fetch one extra row to know whether another page exists
+        if position or page <= 1:
+            logs_response = query.limit(per_page + 1).execute()
+        else:
+            from_idx = (page - 1) * per_page
+            logs_response = query.range(from_idx, from_idx + per_page).execute()
         logs_data = logs_response.data if hasattr(logs_response, 'data') else []
-        total_count = logs_response.count if hasattr(logs_response, 'count') else 0
+        total_count = logs_response.count if count_method and hasattr(logs_response, 'count') else None
+        has_more = len(logs_data) > per_page
+        logs_data = logs_data[:per_page]
+        next_cursor = _encode_cursor(logs_data[-1]) if has_more and logs_data else None
         
         # Get unique user UUIDs
         user_uuids = list(set([log.get('user_uuid') for log in logs_data if log.get('user_uuid')]))
         
-        # Fetch user details
-        users_map = {}
-        if user_uuids:
-            users_response = client.table('users').select('uuid, screenname, email').in_('uuid', user_uuids).execute()
-            users_data = users_response.data if hasattr(users_response, 'data') else []
-            for user in users_data:
-                users_map[user['uuid']] = {
-                    'screenname': user.get('screenname'),
-                    'email': user.get('email')
-                }
-        
-        # Enrich logs with user info
+        # Enrich logs with user info from the in-memory users directory
+        users_map = user_directory.get_users(user_uuids) if user_uuids else {}
         enriched_logs = []
         for log in logs_data:
-            user_uuid = log.get('user_uuid')
-            user_info = users_map.get(user_uuid, {})
             enriched_logs.append({
                 'log_id': log.get('log_id'),
                 'action': log.get('action'),
                 'created_at': log.get('created_at'),
-                'user_name': user_info.get('screenname') or user_info.get('email') or 'Unknown User'
+                'user_name': user_directory.display_name(users_map.get(log.get('user_uuid')))
             })
         
         return jsonify({
             'logs': enriched_logs,
             'total': total_count,
             'page': page,
-            'per_page': per_page
+            'per_page': per_page,
+            'has_more': has_more,
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -444,3 +445,27 @@ def get_activity_logs():
         return jsonify({"error": str(e)}), 500
 
 
+@api_bp.route('/activity-logs', methods=['POST'])
+def post_activity_log():
+    """Queue an activity log entry for the signed-in user; it is written in the next batch."""
+    try:
+        user_id = _get_user_from_header(request)
+        if not user_id:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        body = request.get_json(silent=True) or {}
+        action = body.get('action')
+        if not isinstance(action, str) or not action.strip():
+            return jsonify({"error": "action is required"}), 400
+        if len(action) > activity_log.MAX_ACTION_LENGTH:
+            return jsonify({"error": f"action is limited to {activity_log.MAX_ACTION_LENGTH} characters"}), 400
+
+        if not activity_log.record(user_id, action):
+            response = jsonify({"error": "Activity log queue is full, retry shortly"})
+            response.headers['Retry-After'] = str(max(1, int(activity_log.ACTIVITY_LOG_FLUSH_INTERVAL)))
+            return response, 503
+        return jsonify({"queued": True}), 202
+
+    except Exception as e:
+        logging.exception('post_activity_log error')
+        return jsonify({"error": str(e)}), 500
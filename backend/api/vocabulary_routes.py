@@ -0,0 +1,127 @@
+from flask import Blueprint, request, jsonify
+import logging
+from supabase_client import get_admin_client
+from api.routes import _get_user_from_header
+from response_cache import cached_response, invalidate
+import cache_versions
+from services import vocabularies, medicine_index
+
+vocabulary_bp = Blueprint('vocabularies', __name__)
+
+
+def _changed(kind, item_id, value=None):
+    """Drop every cached copy of the vocabularies after a write."""
+    vocabularies.invalidate()
+    invalidate('vocabularies')
+    if kind == 'medicines':
+        if value is None:
+            medicine_index.remove(item_id)
+        else:
+            medicine_index.add(item_id, value)
+
+
+def _value_from_body():
+    return str((request.get_json(silent=True) or {}).get('value') or '').strip()
+
+
+@vocabulary_bp.route('', methods=['GET', 'OPTIONS'])
+@cached_response(ttl=vocabularies.VOCABULARY_TTL, tags=('vocabularies',), user=_get_user_from_header,
+                 max_age=0, version=lambda: cache_versions.get('vocabularies'))
+def get_vocabularies():
+    """All prescription dropdown vocabularies in one payload.
+
+    Returns {version, medicines, quantities, times, areasites, durations,
+    instructions} as value lists, or {id, value} items with ?detail=1.
+    """
+    if request.method == 'OPTIONS':
+        return ('', 200)
+
+    try:
+        user_id = _get_user_from_header(request)
+        if not user_id:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        client = get_admin_client()
+        if not client:
+            return jsonify({"error": "Database unavailable"}), 503
+
+        detail = request.args.get('detail') == '1'
+        return jsonify(vocabularies.payload(client, detail=detail)), 200
+
+    except Exception as e:
+        logging.exception('get_vocabularies error')
+        return jsonify({"error": str(e)}), 500
+
+
+@vocabulary_bp.route('/<kind>', methods=['POST', 'OPTIONS'])
+def create_vocabulary_item(kind):
+    """Add a value ({value}) to one vocabulary."""
+    if request.method == 'OPTIONS':
+        return ('', 200)
+
+    try:
+        user_id = _get_user_from_header(request)
+        if not user_id:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        if kind not in vocabularies.VOCABULARIES:
+            return jsonify({"error": f"Unknown vocabulary: {kind}"}), 404
+        value = _value_from_body()
+        if not value:
+            return jsonify({"error": "value is required"}), 400
+
+        client = get_admin_client()
+        if not client:
+            return jsonify({"error": "Database unavailable"}), 503
+
+        table, column = vocabularies.VOCABULARIES[kind]
+        res = client.table(table).insert({column: value}).execute()
+        rows = res.data if hasattr(res, 'data') else []
+        if not rows:
+            return jsonify({"error": "Insert failed"}), 500
+        _changed(kind, rows[0]['id'], rows[0][column])
+        return jsonify({'id': rows[0]['id'], 'value': rows[0][column]}), 201
+
+    except Exception as e:
+        logging.exception('create_vocabulary_item error')
+        return jsonify({"error": str(e)}), 500
+
+
+@vocabulary_bp.route('/<kind>/<int:item_id>', methods=['PUT', 'DELETE', 'OPTIONS'])
+def update_vocabulary_item(kind, item_id):
+    """Rename (PUT {value}) or delete one vocabulary value."""
+    if request.method == 'OPTIONS':
+        return ('', 200)
+
+    try:
+        user_id = _get_user_from_header(request)
+        if not user_id:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        if kind not in vocabularies.VOCABULARIES:
+            return jsonify({"error": f"Unknown vocabulary: {kind}"}), 404
+
+        client = get_admin_client()
+        if not client:
+            return jsonify({"error": "Database unavailable"}), 503
+
+        table, column = vocabularies.VOCABULARIES[kind]
+        if request.method == 'DELETE':
+            client.table(table).delete().eq('id', item_id).execute()
+            _changed(kind, item_id)
+            return jsonify({'success': True}), 200
+
+        value = _value_from_body()
+        if not value:
+            return jsonify({"error": "value is required"}), 400
+
+        res = client.table(table).update({column: value}).eq('id', item_id).execute()
+        rows = res.data if hasattr(res, 'data') else []
+        if not rows:
+            return jsonify({"error": "Item not found"}), 404
+        _changed(kind, item_id, rows[0][column])
+        return jsonify({'id': item_id, 'value': rows[0][column]}), 200
+
+    except Exception as e:
+        logging.exception('update_vocabulary_item error')
+        return jsonify({"error": str(e)}), 500
@@ -1,5 +1,5 @@
 import os
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, Response, jsonify, send_from_directory
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -21,8 +21,10 @@ def create_app():
                 "Authorization", 
                 "X-User-Email", 
                 "X-User-Name", 
-                "X-User-Role"
+                "X-User-Role",
+                "If-None-Match"
             ],
+            "expose_headers": ["ETag", "Content-Disposition", "Server-Timing"],
             "supports_credentials": True
         },
         r"/static_images/*": {
@@ -33,11 +35,49 @@ def create_app():
         }
     })
 
+    # Return pooled Supabase clients at the end of every request
+    from supabase_client import release_admin_client, get_pool_stats
+    from jwt_verifier import get_verifier_stats
+    from response_cache import get_cache_stats
+    import user_directory
+    import cache_versions
+    from services import image_cache, prescription_pdf, medicine_index, patient_index, patient_card, activity_log
+    from database import sql_enabled
+    import async_supabase
+    import metrics
+    import warmup
+    app.teardown_appcontext(release_admin_client)
+
+    # Route latency, Supabase call and JSON timings for /metrics and Server-Timing
+    metrics.init_app(app)
+
     # Register API blueprints
     from api.routes import api_bp
     from api.patient_routes import patient_bp
+    from api.asset_routes import asset_bp
+    from api.prescription_routes import prescription_bp
+    from api.medicine_routes import medicine_bp
+    from api.vocabulary_routes import vocabulary_bp
+    from api.export_routes import export_bp
     app.register_blueprint(api_bp)
     app.register_blueprint(patient_bp, url_prefix='/api/patients')
+    app.register_blueprint(asset_bp, url_prefix='/api/assets')
+    app.register_blueprint(prescription_bp, url_prefix='/api/prescriptions')
+    app.register_blueprint(medicine_bp, url_prefix='/api/medicines')
+    app.register_blueprint(vocabulary_bp, url_prefix='/api/vocabularies')
+    app.register_blueprint(export_bp, url_prefix='/api/export')
+
+    # Resize and encode the letterhead logo once, before the first print
+    from services import letterhead
+    try:
+        letterhead.load()
+    except Exception:
+        app.logger.exception('Letterhead assets could not be built')
+
+    # Open clients and load the users directory and search indexes in the background so startup
+    # is not blocked. A preloaded gunicorn master leaves this to each worker (gunicorn.conf.py)
+    if not warmup.WARMUP_ON_FORK:
+        warmup.start()
 
     # Static images endpoint
     @app.route('/static_images/<path:filename>')
@@ -45,10 +85,45 @@ def create_app():
         static_images_path = os.path.join(os.path.dirname(__file__), 'static_images')
         return send_from_directory(static_images_path, filename)
 
+    def _sql_stats():
+        if not sql_enabled():
+            return {'enabled': False}
+        # Only imported when configured; it loads SQLAlchemy
+        from database import sql
+        return sql.get_stats()
+
     # Health check endpoint
     @app.route('/health', methods=['GET'])
     def health():
-        return jsonify({"status": "ok", "message": "Medicare Clinic API is running"})
+        return jsonify({
+            "status": "ok",
+            "message": "Medicare Clinic API is running",
+            "supabase_pool": get_pool_stats(),
+            "auth": get_verifier_stats(),
+            "response_cache": get_cache_stats(),
+            "user_directory": user_directory.get_stats(),
+            "cache_versions": cache_versions.get_stats(),
+            "image_cache": image_cache.get_stats(),
+            "prescription_pdf": prescription_pdf.get_stats(),
+            "medicine_index": medicine_index.get_stats(),
+            "patient_index": patient_index.get_stats(),
+            "patient_card": patient_card.get_stats(),
+            "sql": _sql_stats(),
+            "activity_log": activity_log.get_stats(),
+            "async_io": async_supabase.get_stats(),
+            "metrics": metrics.get_stats(),
+        })
+
+    # Readiness: 200 once this worker has warmed its clients and caches
+    @app.route('/ready', methods=['GET'])
+    def ready():
+        status = warmup.get_status()
+        return jsonify(status), 200 if status['ready'] else 503
+
+    # Prometheus scrape endpoint (per worker process)
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
     return app
 
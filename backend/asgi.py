@@ -0,0 +1,26 @@
+"""
+ASGI entry point: serve the API under uvicorn.
+
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker -w 4 --bind 0.0.0.0:4000
+
+(`uvicorn asgi:app --port 4000` runs a single process for development.)
+
+Supabase reads issued through async_supabase run on the async client here
+(SUPABASE_ASYNC defaults to true), and Flask views run on a thread pool of
+ASGI_THREADS per worker, so a view waiting on the database holds neither
+the event loop nor another request.
+"""
+
+import os
+
+os.environ.setdefault('SUPABASE_ASYNC', 'true')
+
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 8))
+# Views run on these threads, not gunicorn's: size the Supabase pool for them (read on import of app)
+os.environ['WORKER_THREADS'] = str(ASGI_THREADS)
+
+from a2wsgi import WSGIMiddleware
+
+from app import app as flask_app
+
+app = WSGIMiddleware(flask_app, workers=ASGI_THREADS)
@@ -0,0 +1,146 @@
+"""
+Concurrent Supabase I/O for request handlers.
+
+Routes that need several independent reads hand them to query_all(), which
+issues them at the same time instead of one after another:
+
+- With SUPABASE_ASYNC=true (the default under asgi.py) the queries run on
+  the async Supabase client, owned by one event loop thread per process, so
+  every request thread shares one connection pool and waiting costs no thread.
+- Otherwise they run on the request's sync client from a small thread pool.
+
+in_parallel() runs blocking callables (paged scans, NumPy aggregation)
+side by side on the same thread pool, off the event loop.
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+from supabase_client import (
+    get_admin_client,
+    SUPABASE_URL,
+    SUPABASE_SERVICE_ROLE_KEY,
+    SUPABASE_HTTP_TIMEOUT,
+    SUPABASE_POOL_SIZE,
+)
+
+try:
+    from supabase import acreate_client, AsyncClientOptions
+except Exception:
+    acreate_client = None
+    AsyncClientOptions = None
+
+SUPABASE_ASYNC = os.getenv('SUPABASE_ASYNC', 'false').lower() in ('1', 'true', 'yes')
+# Seconds to wait for one batch of concurrent queries
+QUERY_TIMEOUT = SUPABASE_HTTP_TIMEOUT * 2
+
+_lock = threading.Lock()
+_pid = None
+_loop = None
+_client = None
+_client_lock = None
+_executor = None
+stats = {'batches': 0, 'queries': 0, 'async_batches': 0}
+
+
+def enabled():
+    return SUPABASE_ASYNC and acreate_client is not None and bool(SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY)
+
+
+def _check_fork():
+    """Start this process's loop thread and executor (again in a forked worker)."""
+    global _pid, _loop, _client, _client_lock, _executor
+    if _pid == os.getpid():
+        return
+    with _lock:
+        if _pid == os.getpid():
+            return
+        _executor = ThreadPoolExecutor(max_workers=SUPABASE_POOL_SIZE, thread_name_prefix='supabase-io')
+        _loop = None
+        _client = None
+        _client_lock = None
+        if enabled():
+            _loop = asyncio.new_event_loop()
+            _client_lock = asyncio.Lock()
+            threading.Thread(target=_loop.run_forever, name='supabase-async-loop', daemon=True).start()
+        _pid = os.getpid()
+
+
+async def _get_client():
+    global _client
+    if _client is None:
+        async with _client_lock:
+            if _client is None:
+                options = AsyncClientOptions(
+                    postgrest_client_timeout=SUPABASE_HTTP_TIMEOUT,
+                    storage_client_timeout=int(SUPABASE_HTTP_TIMEOUT),
+                    auto_refresh_token=False,
+                    persist_session=False,
+                )
+                _client = await acreate_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, options)
+                logging.info('Async Supabase client created')
+    return _client
+
+
+def run(coro, timeout=QUERY_TIMEOUT):
+    """Run a coroutine on the process's event loop and wait for its result."""
+    _check_fork()
+    return asyncio.run_coroutine_threadsafe(metrics.carry(coro), _loop).result(timeout)
+
+
+async def _query_all_async(queries):
+    client = await _get_client()
+    return await asyncio.gather(*(q(client).execute() for q in queries), return_exceptions=True)
+
+
+def _execute(query, client):
+    try:
+        return query(client).execute()
+    except Exception as e:
+        return e
+
+
+def query_all(*queries):
+    """Run independent queries concurrently; returns their .data lists in order.
+
+    Each query is a callable taking a client and returning an unexecuted
+    PostgREST builder, e.g. lambda c: c.table('users').select('uuid').eq('uuid', uid).
+    A failed query yields its exception in place of the rows.
+    """
+    _check_fork()
+    stats['batches'] += 1
+    stats['queries'] += len(queries)
+    if _loop is not None:
+        stats['async_batches'] += 1
+        results = run(_query_all_async(queries))
+    else:
+        client = get_admin_client()
+        if not client:
+            raise RuntimeError('Supabase client unavailable')
+        futures = [_executor.submit(metrics.bind(_execute), q, client) for q in queries]
+        results = [f.result(QUERY_TIMEOUT) for f in futures]
+    return [r if isinstance(r, BaseException) else (r.data if hasattr(r, 'data') else []) for r in results]
+
+
+def in_parallel(*calls):
+    """Run blocking zero-argument callables side by side; returns results in order, raising the first error."""
+    _check_fork()
+    futures = [_executor.submit(metrics.bind(call)) for call in calls]
+    return [f.result() for f in futures]
+
+
+def warm():
+    """Create the async client and its event loop now, when async I/O is on."""
+    _check_fork()
+    if _loop is not None:
+        run(_get_client())
+    return True
+
+
+def get_stats():
+    return {**stats, 'mode': 'async' if _loop is not None else 'threads', 'enabled': enabled()}
@@ -0,0 +1,228 @@
+"""
+Load test: the hot API routes against a local Supabase stand-in, with baselines.
+
+Starts the fake Supabase (benchmarks/fake_postgrest.py) seeded with 100k
+visits and medicines, thousands of patients and activity logs, builds the
+monthly rollup against it, runs the API under gunicorn and drives each
+scenario at a fixed concurrency:
+
+- auth_me: GET /api/auth/me
+- monthly_stats: GET /api/financials/monthly-stats (from the rollup)
+- activity_logs_list: GET /api/activity-logs, first page
+- activity_logs_post: POST /api/activity-logs (batched writes included)
+- upload_image: POST /api/patients/upload-image with a 1600x1200 JPEG
+
+For every scenario it reports throughput, p50/p95/p99 latency and the
+Supabase calls made per request (PostgREST, Auth and Storage, counted by
+the fake, background writes included). Results can be saved as a baseline
+and later runs compared against it; a run that is slower or makes more
+calls than the baseline by more than --tolerance exits with status 1.
+
+Run from the backend folder (needs gunicorn and Pillow; uvicorn and
+a2wsgi for --server async; --server production uses gunicorn.conf.py):
+    python -m benchmarks.bench_api --save-baseline
+    python -m benchmarks.bench_api [--scenarios auth_me,monthly_stats] [--server async]
+
+Baselines are only comparable on the same machine with the same options;
+the run configuration is stored with them and a mismatch is reported.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+
+import httpx
+
+from benchmarks.fake_postgrest import bench_uuid
+from benchmarks.load import BACKEND, token, app_env, server_command, wait_until_up, start, stop, run_load, percentile
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'api.json')
+# Seconds to wait after a run for background writes (batched logs) to reach the fake
+SETTLE = {'activity_logs_post': 3.0}
+# Extra calls per request tolerated before a call count counts as a regression
+CALLS_SLACK = 0.5
+
+
+def sample_jpeg(width=1600, height=1200, seed=5):
+    """A photo-sized JPEG: a gradient with noise, so it compresses like a real picture."""
+    from PIL import Image, ImageFilter
+
+    rng = random.Random(seed)
+    image = Image.merge('RGB', [
+        Image.linear_gradient('L').resize((width, height)),
+        Image.effect_noise((width, height), 30 + rng.randrange(20)).filter(ImageFilter.GaussianBlur(1)),
+        Image.linear_gradient('L').rotate(90).resize((width, height)),
+    ])
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=88)
+    return out.getvalue()
+
+
+def scenarios():
+    auth = {'Authorization': f"Bearer {token(bench_uuid(1), 'staff1@clinic.test')}"}
+    image = sample_jpeg()
+
+    def auth_me(i):
+        return ('GET', '/api/auth/me', {'headers': auth})
+
+    def monthly_stats(i):
+        return ('GET', '/api/financials/monthly-stats', {'headers': auth})
+
+    def activity_logs_list(i):
+        return ('GET', '/api/activity-logs', {'headers': auth, 'params': {'per_page': 20}})
+
+    def activity_logs_post(i):
+        return ('POST', '/api/activity-logs', {'headers': auth, 'json': {'action': f'Viewed patient {i % 5000}'}})
+
+    def upload_image(i):
+        return ('POST', '/api/patients/upload-image', {
+            'headers': auth,
+            'files': {'image': (f'photo_{i}.jpg', image, 'image/jpeg')},
+            'data': {'filename': f'bench_patient_{i}.jpg'},
+        })
+
+    return {
+        'auth_me': auth_me,
+        'monthly_stats': monthly_stats,
+        'activity_logs_list': activity_logs_list,
+        'activity_logs_post': activity_logs_post,
+        'upload_image': upload_image,
+    }
+
+
+def fake_stats(fake_url):
+    return httpx.get(f'{fake_url}/_fake/stats', timeout=10).json()
+
+
+def calls_between(before, after, requests):
+    """Supabase calls per request, in total and by API."""
+    by_api = {api: (n - before['by_api'].get(api, 0)) / requests for api, n in after['by_api'].items()}
+    return (after['calls'] - before['calls']) / requests, {api: round(n, 2) for api, n in by_api.items() if n}
+
+
+def measure(base, fake_url, name, make_request, args):
+    # Warm-up: connections, clients, caches and the users directory
+    run_load(base, make_request, args.concurrency, args.concurrency)
+    time.sleep(SETTLE.get(name, 0))
+    before = fake_stats(fake_url)
+    seconds, latencies, errors = run_load(base, make_request, args.requests, args.concurrency)
+    time.sleep(SETTLE.get(name, 0))
+    calls, by_api = calls_between(before, fake_stats(fake_url), args.requests)
+    return {
+        'rps': round(args.requests / seconds, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'db_calls': round(calls, 2),
+        'db_calls_by_api': by_api,
+        'errors': errors,
+    }
+
+
+def regressions(result, baseline, tolerance):
+    """Ways a scenario result is worse than its baseline."""
+    found = []
+    if result['rps'] < baseline['rps'] * (1 - tolerance):
+        found.append(f"throughput {result['rps']:.1f} < {baseline['rps']:.1f} req/s")
+    if result['p95_ms'] > baseline['p95_ms'] * (1 + tolerance):
+        found.append(f"p95 {result['p95_ms']:.1f} > {baseline['p95_ms']:.1f} ms")
+    if result['db_calls'] > baseline['db_calls'] + CALLS_SLACK:
+        found.append(f"db calls {result['db_calls']:.2f} > {baseline['db_calls']:.2f} per request")
+    if result['errors'] > baseline['errors']:
+        found.append(f"errors {result['errors']} > {baseline['errors']}")
+    return found
+
+
+def main(argv):
+    all_scenarios = scenarios()
+    parser = argparse.ArgumentParser(description='API load test against a local Supabase stand-in')
+    parser.add_argument('--scenarios', default=','.join(all_scenarios), help='comma separated')
+    parser.add_argument('--server', choices=('sync', 'async', 'production'), default='sync')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=500, help='per scenario')
+    parser.add_argument('--latency', type=float, default=5.0, help='ms per fake Supabase call')
+    parser.add_argument('--visits', type=int, default=100000)
+    parser.add_argument('--medicines', type=int, default=100000)
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--activity-logs', type=int, default=5000)
+    parser.add_argument('--jwt-verify', choices=('local', 'remote'), default='local',
+                        help='remote sends token checks to the fake Auth API')
+    parser.add_argument('--port', type=int, default=4100)
+    parser.add_argument('--fake-port', type=int, default=54321)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='write this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed fraction worse than baseline')
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args(argv)
+
+    names = [n.strip() for n in args.scenarios.split(',') if n.strip()]
+    unknown = [n for n in names if n not in all_scenarios]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    config = {key: getattr(args, key) for key in (
+        'server', 'workers', 'concurrency', 'requests', 'latency', 'visits', 'medicines', 'patients',
+        'activity_logs', 'jwt_verify')}
+
+    fake_url = f'http://127.0.0.1:{args.fake_port}'
+    fake = start([sys.executable, '-m', 'benchmarks.fake_postgrest', '--port', str(args.fake_port),
+                  '--latency', str(args.latency), '--visits', str(args.visits), '--medicines', str(args.medicines),
+                  '--patients', str(args.patients), '--activity-logs', str(args.activity_logs)])
+    env = app_env(args.fake_port, JWT_VERIFY_MODE=args.jwt_verify,
+                  SUPABASE_ASYNC='true' if args.server == 'async' else 'false')
+    results = {}
+    try:
+        wait_until_up(f'{fake_url}/_fake/stats', timeout=300)
+        if 'monthly_stats' in names:
+            subprocess.run([sys.executable, '-m', 'services.financial_rollup', '--backfill'], cwd=BACKEND, env=env,
+                           check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        bind = f'127.0.0.1:{args.port}'
+        server = start(server_command(args.server, args.workers, bind), env)
+        try:
+            base = f'http://{bind}'
+            wait_until_up(f'{base}/health')
+            for name in names:
+                results[name] = measure(base, fake_url, name, all_scenarios[name], args)
+        finally:
+            stop(server)
+    finally:
+        stop(fake)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        changed = {k: (baseline['config'].get(k), v) for k, v in config.items() if baseline['config'].get(k) != v}
+        if changed:
+            print(f'warning: baseline was recorded with different options: {changed}')
+
+    print(' '.join(f'{k}={v}' for k, v in config.items()))
+    print(f"{'scenario':<20} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'calls/req':>10} {'errors':>7}  vs baseline")
+    failed = False
+    for name, r in results.items():
+        verdict = ''
+        if baseline and name in baseline['results']:
+            found = regressions(r, baseline['results'][name], args.tolerance)
+            failed = failed or bool(found)
+            verdict = 'REGRESSION: ' + '; '.join(found) if found else 'ok'
+        print(f"{name:<20} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+              f"{r['db_calls']:>10.2f} {r['errors']:>7}  {verdict}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({'config': config, 'results': results}, f, indent=2)
+        print(f'baseline saved to {args.baseline}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'config': config, 'results': results}, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
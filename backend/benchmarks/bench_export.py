@@ -0,0 +1,127 @@
+"""
+Benchmark: streaming exports (/api/export/<table>) against the fake Supabase.
+
+Runs the API in the production profile (one worker) and downloads each
+export over the full seeded history. For each export it reports:
+- time to first byte and total time
+- rows per second and response size
+- the worker's peak memory growth during the export
+
+For comparison it also loads the same visits with db_repo.fetch_all_records,
+which builds the whole table in memory, in a separate process.
+
+Run from the backend folder (needs gunicorn):
+    python -m benchmarks.bench_export [--visits 100000] [--latency 20]
+"""
+
+import sys
+import time
+import argparse
+import subprocess
+
+import httpx
+
+from benchmarks.fake_postgrest import bench_uuid
+from benchmarks.load import BACKEND, token, app_env, server_command, wait_until_up, start, stop
+
+EXPORTS = (
+    ('visits', 'csv', False),
+    ('visits', 'csv', True),
+    ('visits', 'ndjson', False),
+    ('visits', 'xlsx', False),
+    ('medicines', 'csv', False),
+    ('prescriptions', 'csv', False),
+    ('prescriptions', 'ndjson', True),
+)
+
+IN_MEMORY = """
+import resource
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+from database import db_repo
+rows = db_repo.fetch_all_records('visits')
+print(len(rows), (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024)
+"""
+
+
+def _memory_kb(pid, field):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    return 0
+
+
+def _worker_pid(master):
+    with open(f'/proc/{master}/task/{master}/children') as f:
+        return int(f.read().split()[0])
+
+
+def _reset_peak(pid):
+    """Start the peak-RSS counter (VmHWM) again from the current RSS."""
+    try:
+        with open(f'/proc/{pid}/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='streaming export benchmark')
+    parser.add_argument('--visits', type=int, default=100000)
+    parser.add_argument('--medicines', type=int, default=50000)
+    parser.add_argument('--prescriptions', type=int, default=20000)
+    parser.add_argument('--latency', type=float, default=20.0, help='ms per fake Supabase call')
+    parser.add_argument('--port', type=int, default=4100)
+    parser.add_argument('--fake-port', type=int, default=54321)
+    args = parser.parse_args(argv)
+
+    fake = start([sys.executable, '-m', 'benchmarks.fake_postgrest', '--port', str(args.fake_port),
+                  '--latency', str(args.latency), '--visits', str(args.visits),
+                  '--medicines', str(args.medicines), '--prescriptions', str(args.prescriptions)])
+    bind = f'127.0.0.1:{args.port}'
+    server = None
+    headers = {'Authorization': f"Bearer {token(bench_uuid(1), 'staff1@clinic.test')}"}
+    try:
+        wait_until_up(f'http://127.0.0.1:{args.fake_port}/_fake/stats', timeout=120)
+        server = start(server_command('production', 1, bind), app_env(args.fake_port))
+        wait_until_up(f'http://{bind}/ready', timeout=120)
+        worker = _worker_pid(server.pid)
+
+        print(f'visits={args.visits} medicines={args.medicines} prescriptions={args.prescriptions} '
+              f'latency={args.latency}ms')
+        print(f"{'export':<26} {'first byte ms':>14} {'total s':>8} {'rows/s':>9} {'MB':>7} {'peak +MB':>9}")
+        with httpx.Client(base_url=f'http://{bind}', timeout=600) as client:
+            for table, output, gzip in EXPORTS:
+                params = {'format': output}
+                if gzip:
+                    params['gzip'] = '1'
+                resettable = _reset_peak(worker)
+                rss = _memory_kb(worker, 'VmRSS')
+                size = lines = 0
+                first = None
+                t = time.perf_counter()
+                with client.stream('GET', f'/api/export/{table}', params=params, headers=headers) as r:
+                    r.raise_for_status()
+                    for chunk in r.iter_raw():
+                        first = first or time.perf_counter() - t
+                        size += len(chunk)
+                        lines += chunk.count(b'\n')
+                total = time.perf_counter() - t
+                peak = (_memory_kb(worker, 'VmHWM') - rss) / 1024 if resettable else float('nan')
+                # Line counts are only rows for uncompressed text formats
+                rate = f'{(lines - (output == "csv")) / total:>9.0f}' if output != 'xlsx' and not gzip else f"{'-':>9}"
+                name = f"{table} {output}{' gzip' if gzip else ''}"
+                print(f'{name:<26} {first * 1000:>14.0f} {total:>8.2f} {rate} {size / 1e6:>7.1f} {peak:>9.1f}')
+
+        out = subprocess.run([sys.executable, '-c', IN_MEMORY], cwd=BACKEND, env=app_env(args.fake_port),
+                             capture_output=True, text=True, check=True).stdout.split()
+        print(f'fetch_all_records(visits): {out[0]} rows, peak +{float(out[1]):.1f} MB')
+    finally:
+        if server is not None:
+            stop(server)
+        stop(fake)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
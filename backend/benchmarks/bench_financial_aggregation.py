@@ -0,0 +1,122 @@
+"""
+Benchmark: per-row Python loop vs NumPy aggregation for monthly financial stats.
+
+Run from the backend folder:
+    python -m benchmarks.bench_financial_aggregation [--sizes 10000,100000,1000000]
+"""
+
+import sys
+import time
+import random
+from datetime import date, datetime, timedelta
+
+from services import financial_aggregation
+
+
+def loop_aggregate_monthly(visits, medicines):
+    """The original monthly_stats loop, kept here as the baseline."""
+    monthly_map = {}
+
+    def month_of(date_str):
+        try:
+            if 'T' in date_str:
+                date_obj = datetime.fromisoformat(date_str.replace('Z', '').replace('+00:00', ''))
+            else:
+                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+        except Exception:
+            return None
+        return f"{date_obj.year}-{date_obj.month:02d}"
+
+    for visit in visits:
+        date_str = visit.get('date')
+        if not date_str:
+            continue
+        key = month_of(date_str)
+        if not key:
+            continue
+        if key not in monthly_map:
+            monthly_map[key] = {'month': key, 'totalVisits': 0, 'drugVisits': 0,
+                                'totalRevenue': 0, 'newPatients': 0, 'googleReferrals': 0}
+        stats = monthly_map[key]
+        stats['totalVisits'] += 1
+        stats['totalRevenue'] += (float(visit.get('consultation_fee') or 0)
+                                  + float(visit.get('drug_fee') or 0)
+                                  + float(visit.get('Procedure_Fee') or 0))
+        if str(visit.get('new_old') or '').strip().upper() == 'N':
+            stats['newPatients'] += 1
+        if 'google' in str(visit.get('referral') or '').lower():
+            stats['googleReferrals'] += 1
+
+    for medicine in medicines:
+        date_str = medicine.get('date')
+        if not date_str:
+            continue
+        key = month_of(date_str)
+        if not key:
+            continue
+        if key not in monthly_map:
+            monthly_map[key] = {'month': key, 'totalVisits': 0, 'drugVisits': 0,
+                                'totalRevenue': 0, 'newPatients': 0, 'googleReferrals': 0}
+        monthly_map[key]['drugVisits'] += 1
+        monthly_map[key]['totalRevenue'] += float(medicine.get('drug_fee') or 0)
+
+    return monthly_map
+
+
+def make_rows(n, seed=42):
+    """Synthetic visits and medicines shaped like the Supabase rows (n rows each)."""
+    rng = random.Random(seed)
+    start = date(2019, 1, 1)
+    visits = []
+    medicines = []
+    for _ in range(n):
+        day = (start + timedelta(days=rng.randint(0, 6 * 365))).isoformat()
+        visits.append({
+            'date': day,
+            'consultation_fee': rng.choice([300, 500, 700, None]),
+            'drug_fee': rng.randint(0, 1500),
+            'Procedure_Fee': rng.choice([0, 0, 0, 1000, 2500]),
+            'paymentmethod': rng.choice(['Cash', 'Card', 'GPay']),
+            'new_old': rng.choice(['N', 'O', 'O ']),
+            'referral': rng.choice(['Google', 'friend', None, 'google maps']),
+        })
+        medicines.append({
+            'date': (start + timedelta(days=rng.randint(0, 6 * 365))).isoformat(),
+            'drug_fee': rng.randint(0, 1500),
+            'payment_method': rng.choice(['cash', 'card', 'gpay']),
+        })
+    return visits, medicines
+
+
+def _time(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def _same(a, b):
+    if a.keys() != b.keys():
+        return False
+    for key in a:
+        x, y = a[key], b[key]
+        if abs(x['totalRevenue'] - y['totalRevenue']) > 1e-6 * max(1.0, abs(x['totalRevenue'])):
+            return False
+        if any(x[k] != y[k] for k in ('totalVisits', 'drugVisits', 'newPatients', 'googleReferrals')):
+            return False
+    return True
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'loop (s)':>10} {'numpy (s)':>10} {'speedup':>8}  match")
+    for n in sizes:
+        visits, medicines = make_rows(n)
+        loop_time, expected = _time(loop_aggregate_monthly, visits, medicines)
+        numpy_time, actual = _time(financial_aggregation.aggregate_monthly, visits, medicines)
+        print(f"{n:>10} {loop_time:>10.3f} {numpy_time:>10.3f} {loop_time / numpy_time:>7.1f}x  {_same(expected, actual)}")
+
+
+if __name__ == '__main__':
+    sizes = [10_000, 100_000, 1_000_000]
+    if '--sizes' in sys.argv:
+        sizes = [int(s) for s in sys.argv[sys.argv.index('--sizes') + 1].split(',')]
+    main(sizes)
@@ -0,0 +1,94 @@
+"""
+Benchmark: keystroke-rate medicine suggestions, index vs linear substring filter.
+
+Replays every prefix of randomly chosen names (as typed one key at a time,
+with some typos) against the in-memory medicine index and against the
+substring filter the dropdown used to run over the full list.
+
+Run from the backend folder:
+    python -m benchmarks.bench_medicine_suggest [--sizes 1000,10000,50000]
+"""
+
+import sys
+import time
+import random
+import string
+
+from services.medicine_index import MedicineIndex
+
+BRANDS = ['ALBOL', 'ANDROFOL', 'ALONAC', 'ATACK', 'AZICARE', 'BLOTRUST', 'CARTIPRED', 'CHICKWIN',
+          'LEOFINE', 'RETOL', 'HEXIZINE', 'ACNOVATE', 'CALACROSS', 'DERMIFORD', 'FUNGIKIL']
+GENERICS = ['Albendazole', 'Paracetamol', 'Cefpodoxime Proxetil', 'Azithromycin', 'Bilastine',
+            'Methylprednisolone', 'Hydroxychloroquine Sulphate', 'Levocetirizine Hydrochloride',
+            'Hydroxyzine Hydrochloride', 'Adapalene and Benzoyl Peroxide', 'Calamine and Aloe Vera',
+            'Terbinafine', 'Itraconazole', 'Biotin', 'Minoxidil']
+FORMS = ['Tablet', 'Capsule', 'Cream', 'Lotion', 'Syrup', 'Gel']
+
+
+def make_names(n, seed=7):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < n:
+        brand = rng.choice(BRANDS) + ''.join(rng.choices(string.ascii_uppercase, k=rng.randint(0, 3)))
+        dose = rng.choice(['', f' {rng.choice([5, 10, 20, 200, 250, 400, 500, 650])} MG'])
+        names.add(f'{brand}{dose} ({rng.choice(GENERICS)}{dose.title()} {rng.choice(FORMS)})')
+    return sorted(names)
+
+
+def make_queries(names, count, seed=11):
+    """Successive prefixes of random names; one in five words gets a typo."""
+    rng = random.Random(seed)
+    queries = []
+    while len(queries) < count:
+        word = rng.choice(names).split('(')[rng.randint(0, 1)].strip(' )').split()[0].lower()
+        if rng.random() < 0.2 and len(word) > 4:
+            i = rng.randrange(1, len(word) - 1)
+            word = word[:i] + word[i + 1:]
+        queries.extend(word[:i] for i in range(1, len(word) + 1))
+    return queries[:count]
+
+
+def linear_filter(names, query, limit=10):
+    """The old client-side dropdown filter."""
+    query = query.lower()
+    return [name for name in names if query in name.lower()][:limit]
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+    return pick(0.50), pick(0.95), pick(0.99)
+
+
+def _run(fn, queries):
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - started)
+    return _percentiles(samples)
+
+
+def main(sizes, query_count=5000):
+    print(f"{'names':>8} {'build (s)':>10} {'index p50/p95/p99 (ms)':>26} {'linear p50/p95/p99 (ms)':>26}")
+    for n in sizes:
+        names = make_names(n)
+        queries = make_queries(names, query_count)
+
+        started = time.perf_counter()
+        index = MedicineIndex()
+        for i, name in enumerate(names):
+            index.add(i, name)
+        build = time.perf_counter() - started
+
+        indexed = _run(index.search, queries)
+        linear = _run(lambda q: linear_filter(names, q), queries)
+        print(f"{n:>8} {build:>10.2f} {'/'.join(f'{v:.3f}' for v in indexed):>26} "
+              f"{'/'.join(f'{v:.3f}' for v in linear):>26}")
+
+
+if __name__ == '__main__':
+    sizes = [1_000, 10_000, 50_000]
+    if '--sizes' in sys.argv:
+        sizes = [int(s) for s in sys.argv[sys.argv.index('--sizes') + 1].split(',')]
+    main(sizes)
@@ -0,0 +1,92 @@
+"""
+Benchmark: patient search, index vs the old '%term%' filter.
+
+Replays every prefix of randomly chosen names and phone numbers (as typed
+one key at a time) against the in-memory patient index and against a
+contains filter over all patients, the in-process equivalent of the
+leading-wildcard ilike scan.
+
+Run from the backend folder:
+    python -m benchmarks.bench_patient_search [--sizes 1000,10000,100000]
+"""
+
+import sys
+import time
+import random
+
+from services.patient_index import PatientIndex
+
+FIRST = ['Lakshmi', 'Laxmi', 'Mohammed', 'Muhammad', 'Ramesh', 'Suresh', 'Sunita', 'Sunitha', 'Priya',
+         'Anil', 'Sanjay', 'Kavitha', 'Abdul', 'Fatima', 'Venkatesh', 'Deepa', 'Rajesh', 'Geetha']
+LAST = ['Kumar', 'Devi', 'Rao', 'Reddy', 'Sharma', 'Patel', 'Nair', 'Iyer', 'Khan', 'Singh', 'Das']
+
+
+def make_patients(n, seed=7):
+    rng = random.Random(seed)
+    return [{
+        'patient_id': i,
+        'name': f'{rng.choice(FIRST)} {rng.choice(LAST)}' + (f' {rng.choice(FIRST)}' if rng.random() < 0.3 else ''),
+        'sex': rng.choice(['Male', 'Female']),
+        'phone_no': f'9{rng.randrange(10 ** 9):09d}',
+    } for i in range(1, n + 1)]
+
+
+def make_queries(patients, count, seed=11):
+    """Successive prefixes of names and of phone numbers (name, phone) pairs."""
+    rng = random.Random(seed)
+    queries = []
+    while len(queries) < count:
+        patient = rng.choice(patients)
+        if rng.random() < 0.7:
+            name = patient['name'].lower()
+            queries.extend((name[:i], '') for i in range(1, len(name) + 1))
+        else:
+            phone = patient['phone_no']
+            queries.extend(('', phone[:i]) for i in range(1, len(phone) + 1))
+    return queries[:count]
+
+
+def linear_filter(patients, name, phone, limit=10):
+    """The old '%term%' filter, counting every match like count: 'exact'."""
+    name = name.lower()
+    found = [p for p in patients if name in p['name'].lower() and phone in p['phone_no']]
+    return found[:limit], len(found)
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+    return pick(0.50), pick(0.95), pick(0.99)
+
+
+def _run(fn, queries):
+    samples = []
+    for name, phone in queries:
+        started = time.perf_counter()
+        fn(name, phone)
+        samples.append(time.perf_counter() - started)
+    return _percentiles(samples)
+
+
+def main(sizes, query_count=3000):
+    print(f"{'patients':>8} {'build (s)':>10} {'index p50/p95/p99 (ms)':>26} {'linear p50/p95/p99 (ms)':>26}")
+    for n in sizes:
+        patients = make_patients(n)
+        queries = make_queries(patients, query_count)
+
+        started = time.perf_counter()
+        index = PatientIndex()
+        index.add_many(patients)
+        build = time.perf_counter() - started
+
+        indexed = _run(lambda name, phone: index.search(name, phone), queries)
+        linear = _run(lambda name, phone: linear_filter(patients, name, phone), queries)
+        print(f"{n:>8} {build:>10.2f} {'/'.join(f'{v:.3f}' for v in indexed):>26} "
+              f"{'/'.join(f'{v:.3f}' for v in linear):>26}")
+
+
+if __name__ == '__main__':
+    sizes = [1_000, 10_000, 100_000]
+    if '--sizes' in sys.argv:
+        sizes = [int(s) for s in sys.argv[sys.argv.index('--sizes') + 1].split(',')]
+    main(sizes)
@@ -0,0 +1,99 @@
+"""
+Benchmark: sync vs async (asgi.py) serving at equal worker count.
+
+Starts the fake PostgREST (benchmarks/fake_postgrest.py) with a fixed
+per-call latency, then runs the API once under `gunicorn app:app` with
+sync workers and once as `gunicorn asgi:app` with uvicorn workers and
+SUPABASE_ASYNC=true, and drives each with the same closed-loop load:
+
+- create_user: POST /api/auth/create_user for a staff member found by email
+  (uuid and email lookups)
+- monthly_stats: GET /api/financials/monthly-stats with no rollup built, so
+  both source tables are scanned (response cache disabled)
+- auth_me: GET /api/auth/me, served from the in-memory users directory
+
+Run from the backend folder (needs gunicorn, uvicorn and a2wsgi):
+    python -m benchmarks.bench_serving [--workers 2] [--concurrency 32] [--requests 400] [--latency 20]
+"""
+
+import sys
+import json
+import argparse
+
+from benchmarks.fake_postgrest import bench_uuid
+from benchmarks.load import token, app_env, server_command, wait_until_up, start, stop, run_load, percentile
+
+
+def scenarios():
+    known = token(bench_uuid(1), 'staff1@clinic.test')
+
+    def create_user(i):
+        # A uuid the users table does not have, with a known email: both lookups run
+        n = 2 + i % 15
+        uid = f'11111111-0000-4000-8000-{i:012d}'
+        return ('POST', '/api/auth/create_user', {'headers': {'Authorization': f'Bearer {token(uid, "")}'},
+                                                  'json': {'email': f'staff{n}@clinic.test'}})
+
+    def monthly_stats(i):
+        return ('GET', '/api/financials/monthly-stats', {'headers': {'Authorization': f'Bearer {known}'}})
+
+    def auth_me(i):
+        return ('GET', '/api/auth/me', {'headers': {'Authorization': f'Bearer {known}'}})
+
+    return {'create_user': create_user, 'monthly_stats': monthly_stats, 'auth_me': auth_me}
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='sync vs async serving benchmark')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--latency', type=float, default=20.0, help='ms per fake PostgREST call')
+    parser.add_argument('--visits', type=int, default=5000)
+    parser.add_argument('--port', type=int, default=4100)
+    parser.add_argument('--fake-port', type=int, default=54321)
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args(argv)
+
+    fake = start([sys.executable, '-m', 'benchmarks.fake_postgrest', '--port', str(args.fake_port),
+                  '--latency', str(args.latency), '--visits', str(args.visits), '--medicines', str(args.visits // 2)])
+    bind = f'127.0.0.1:{args.port}'
+    modes = {
+        'sync (gunicorn sync workers)': (server_command('sync', args.workers, bind), {'SUPABASE_ASYNC': 'false'}),
+        'async (uvicorn workers)': (server_command('async', args.workers, bind), {'SUPABASE_ASYNC': 'true'}),
+    }
+
+    results = []
+    try:
+        wait_until_up(f'http://127.0.0.1:{args.fake_port}/rest/v1/users?limit=1')
+        for mode, (cmd, extra_env) in modes.items():
+            server = start(cmd, app_env(args.fake_port, **extra_env))
+            try:
+                base = f'http://{bind}'
+                wait_until_up(f'{base}/health')
+                for name, make_request in scenarios().items():
+                    # Warm-up: connections, clients and the users directory
+                    run_load(base, make_request, args.concurrency, args.concurrency)
+                    seconds, latencies, errors = run_load(base, make_request, args.requests, args.concurrency)
+                    results.append({
+                        'mode': mode, 'scenario': name, 'rps': args.requests / seconds,
+                        'p50_ms': percentile(latencies, 0.50) * 1000, 'p95_ms': percentile(latencies, 0.95) * 1000,
+                        'errors': errors,
+                    })
+            finally:
+                stop(server)
+    finally:
+        stop(fake)
+
+    print(f'workers={args.workers} concurrency={args.concurrency} requests={args.requests} '
+          f'latency={args.latency}ms visits={args.visits}')
+    print(f"{'scenario':<14} {'mode':<30} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for r in sorted(results, key=lambda r: r['scenario']):
+        print(f"{r['scenario']:<14} {r['mode']:<30} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['errors']:>7}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,99 @@
+"""
+Benchmark: worker startup and first-request latency, before and after the
+production serving profile.
+
+For each mode it starts the API against the fake Supabase
+(benchmarks/fake_postgrest.py) and measures two things. First, the time
+until /health answers. Then the latency of the first request to each of a
+few routes that depend on clients or caches built at startup. Modes:
+
+- sync: `gunicorn app:app` with default sync workers, without gunicorn.conf.py
+- production: `gunicorn wsgi:app` with gunicorn.conf.py (preloaded app,
+  warm-up in post_fork, gthread workers)
+
+Run from the backend folder (needs gunicorn):
+    python -m benchmarks.bench_startup [--runs 3] [--workers 1] [--latency 20]
+"""
+
+import sys
+import time
+import argparse
+import statistics
+
+import httpx
+
+from benchmarks.fake_postgrest import bench_uuid
+from benchmarks.load import token, app_env, server_command, wait_until_up, start, stop
+
+FIRST_REQUESTS = (
+    ('auth_me', '/api/auth/me'),
+    ('patient_search', '/api/patients/search?name=ra'),
+    ('medicine_suggest', '/api/medicines/suggest?q=al'),
+    ('vocabularies', '/api/vocabularies'),
+    ('activity_logs', '/api/activity-logs'),
+)
+
+
+def measure_once(mode, args, headers):
+    bind = f'127.0.0.1:{args.port}'
+    base = f'http://{bind}'
+    started = time.perf_counter()
+    server = start(server_command(mode, args.workers, bind), app_env(args.fake_port))
+    try:
+        while True:
+            try:
+                if httpx.get(f'{base}/health', timeout=5).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.perf_counter() - started > 120:
+                raise RuntimeError(f'{mode} did not come up')
+            time.sleep(0.01)
+        result = {'listening_s': time.perf_counter() - started}
+        with httpx.Client(base_url=base, timeout=60) as client:
+            for name, path in FIRST_REQUESTS:
+                t = time.perf_counter()
+                r = client.get(path, headers=headers)
+                result[name] = (time.perf_counter() - t) * 1000
+                if r.status_code >= 400:
+                    result[f'{name}_status'] = r.status_code
+        return result
+    finally:
+        stop(server)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='startup and first-request latency benchmark')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=20.0, help='ms per fake Supabase call')
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--port', type=int, default=4100)
+    parser.add_argument('--fake-port', type=int, default=54321)
+    args = parser.parse_args(argv)
+
+    fake = start([sys.executable, '-m', 'benchmarks.fake_postgrest', '--port', str(args.fake_port),
+                  '--latency', str(args.latency), '--patients', str(args.patients),
+                  '--visits', '1000', '--medicines', '1000', '--activity-logs', '1000'])
+    headers = {'Authorization': f"Bearer {token(bench_uuid(1), 'staff1@clinic.test')}"}
+    results = {}
+    try:
+        wait_until_up(f'http://127.0.0.1:{args.fake_port}/_fake/stats')
+        for mode in ('sync', 'production'):
+            results[mode] = [measure_once(mode, args, headers) for _ in range(args.runs)]
+    finally:
+        stop(fake)
+
+    print(f'workers={args.workers} runs={args.runs} latency={args.latency}ms patients={args.patients} (medians)')
+    columns = ['listening_s'] + [name for name, _ in FIRST_REQUESTS]
+    print(f"{'mode':<12} {'listening s':>12} " + ' '.join(f'{name + " ms":>18}' for name, _ in FIRST_REQUESTS))
+    for mode, runs in results.items():
+        medians = [statistics.median(run[c] for run in runs) for c in columns]
+        print(f'{mode:<12} {medians[0]:>12.2f} ' + ' '.join(f'{m:>18.1f}' for m in medians[1:]))
+        errors = {k: v for run in runs for k, v in run.items() if k.endswith('_status')}
+        if errors:
+            print(f'  errors: {errors}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
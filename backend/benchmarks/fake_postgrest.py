@@ -0,0 +1,390 @@
+"""
+In-memory stand-in for Supabase (PostgREST, Auth and Storage), for benchmarks.
+
+Serves the subset of the Supabase APIs the backend uses from seeded
+synthetic tables, and sleeps --latency ms per call to stand in for the network:
+
+- /rest/v1/<table>: select, eq/neq/gt/gte/lt/lte/in/like/ilike/is filters,
+  order, limit, offset, count=exact, insert/upsert/update/delete
+- /auth/v1/user: the user named by the bearer token (signature not checked)
+- /storage/v1/object/<bucket>/<path>: upload and download, kept in memory
+
+GET /_fake/stats returns call counters by API and table, without latency,
+so a benchmark can attribute database calls to the requests it sent.
+
+    python -m benchmarks.fake_postgrest --port 54321 --latency 20 --visits 100000
+"""
+
+import re
+import sys
+import json
+import base64
+import bisect
+import random
+import asyncio
+import argparse
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import parse_qsl, unquote
+
+PRIMARY_KEYS = {
+    'visits': 'visit_id',
+    'medicines': 'med_id',
+    'patients': 'patient_id',
+    'prescriptions': 'prescription_id',
+    'prescription_medicines': 'medicine_id',
+    'activity_logs': 'log_id',
+    'users': 'uuid',
+}
+
+FIRST = ['Lakshmi', 'Mohammed', 'Ramesh', 'Suresh', 'Sunita', 'Priya', 'Anil', 'Kavitha', 'Abdul', 'Deepa']
+LAST = ['Kumar', 'Devi', 'Rao', 'Reddy', 'Sharma', 'Patel', 'Nair', 'Khan', 'Singh', 'Das']
+PAYMENTS = ['Cash', 'Card', 'GPay']
+ACTIONS = ['Viewed patient', 'Added visit', 'Edited prescription', 'Uploaded image', 'Updated fees']
+
+
+def bench_uuid(i):
+    return f'00000000-0000-4000-8000-{i:012d}'
+
+
+def seed(visits=20000, medicines=10000, patients=2000, users=20, activity_logs=0, prescriptions=0, seed=3):
+    """Synthetic tables with the columns the backend reads, each in primary key order."""
+    rng = random.Random(seed)
+    start = date(2021, 1, 1)
+
+    def day():
+        return (start + timedelta(days=rng.randrange(1500))).isoformat()
+
+    tables = {name: [] for name in PRIMARY_KEYS}
+    tables['users'] = [{
+        'uuid': bench_uuid(i), 'email': f'staff{i}@clinic.test', 'screenname': f'staff{i}',
+        'role': 'DOCTOR' if i == 1 else 'STAFF', 'approved': True,
+    } for i in range(1, users + 1)]
+    tables['patients'] = [{
+        'patient_id': i, 'name': f'{rng.choice(FIRST)} {rng.choice(LAST)}', 'sex': rng.choice(['M', 'F']),
+        'phone_no': f'9{rng.randrange(10 ** 9):09d}', 'year_of_birth': rng.randrange(1940, 2020),
+        'hometown': 'Town', 'pic_filename': None, 'updated_at': '2024-01-01T00:00:00+00:00',
+    } for i in range(1, patients + 1)]
+    tables['visits'] = [{
+        'visit_id': i, 'patient_id': rng.randrange(1, patients + 1), 'date': day(),
+        'consultation_fee': rng.choice([0, 300, 500]), 'drug_fee': rng.choice([0, 150, 400]),
+        'Procedure_Fee': rng.choice([0, 0, 1000]), 'paymentmethod': rng.choice(PAYMENTS),
+        'new_old': rng.choice(['N', 'O', 'O']), 'referral': rng.choice(['Google', 'Friend', None]),
+    } for i in range(1, visits + 1)]
+    tables['medicines'] = [{
+        'med_id': i, 'patient_id': rng.randrange(1, patients + 1), 'date': day(),
+        'drug_fee': rng.choice([100, 250, 600]), 'payment_method': rng.choice(PAYMENTS),
+    } for i in range(1, medicines + 1)]
+    for row in tables['visits'] + tables['medicines']:
+        # Written on the day of the visit, so the rollup's high-water mark only re-reads the last day
+        row['updated_at'] = f"{row['date']}T18:00:00+00:00"
+    # One prescription each for the first visits, with one to three medicines
+    for i in range(1, min(prescriptions, visits) + 1):
+        tables['prescriptions'].append({
+            'prescription_id': i, 'visit_id': i, 'symptoms': 'Fever, cough', 'findings': 'Chest clear',
+            'diagnosis': rng.choice(['URTI', 'Viral fever', 'Gastritis']), 'procedures': None,
+        })
+        for _ in range(rng.randrange(1, 4)):
+            tables['prescription_medicines'].append({
+                'medicine_id': len(tables['prescription_medicines']) + 1, 'prescription_id': i,
+                'medicine_name': rng.choice(['Paracetamol 500', 'Azithromycin 250', 'Pantoprazole 40']),
+                'quantity': '1', 'time': 'After food', 'areasite': None, 'duration': '5 days',
+            })
+    logged_from = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    tables['activity_logs'] = [{
+        'log_id': i, 'user_uuid': bench_uuid(rng.randrange(1, users + 1)), 'action': rng.choice(ACTIONS),
+        # Increasing with log_id, as rows written by the app are
+        'created_at': (logged_from + timedelta(minutes=7 * i)).isoformat(),
+    } for i in range(1, activity_logs + 1)]
+    return tables
+
+
+# ============= QUERY EVALUATION =============
+
+def _coerce(value, sample):
+    if isinstance(sample, bool):
+        return value == 'true'
+    if isinstance(sample, int):
+        try:
+            return int(value)
+        except ValueError:
+            return value
+    if isinstance(sample, float):
+        return float(value)
+    return value
+
+
+def _like(pattern, flags=0):
+    return re.compile('^' + '.*'.join(re.escape(p) for p in pattern.replace('%', '*').split('*')) + '$', flags)
+
+
+def _predicate(column, expr):
+    negate = expr.startswith('not.')
+    if negate:
+        expr = expr[4:]
+    op, _, raw = expr.partition('.')
+    if op == 'in':
+        items = [v.strip().strip('"') for v in raw.strip('()').split(',')]
+        # Coerced once per value type, not per row
+        members = {}
+
+    def check(row):
+        value = row.get(column)
+        if op == 'is':
+            return value is None if raw == 'null' else value is (raw == 'true')
+        if value is None:
+            return False
+        if op == 'in':
+            kind = type(value)
+            if kind not in members:
+                members[kind] = {_coerce(v, value) for v in items}
+            return value in members[kind]
+        if op in ('like', 'ilike'):
+            return bool(_like(raw, re.I if op == 'ilike' else 0).match(str(value)))
+        target = _coerce(raw, value)
+        return {
+            'eq': value == target, 'neq': value != target, 'gt': value > target,
+            'gte': value >= target, 'lt': value < target, 'lte': value <= target,
+        }[op]
+
+    return (lambda row: not check(row)) if negate else check
+
+
+def _seek(rows, sorted_by, params):
+    """Start index of a keyset page: skip rows at or below a gt/gte bound on the sort key."""
+    for key, value in params:
+        op, _, raw = value.partition('.')
+        if key == sorted_by and op in ('gt', 'gte') and rows:
+            target = _coerce(raw, rows[0].get(sorted_by))
+            find = bisect.bisect_right if op == 'gt' else bisect.bisect_left
+            return find(rows, target, key=lambda r: r.get(sorted_by))
+    return 0
+
+
+def select_rows(rows, params, sorted_by=None, count=True):
+    """Apply PostgREST query params to rows; returns (page, total before limit).
+
+    sorted_by names a column rows are already in ascending order of; pages
+    ordered by it are then sought and cut without scanning the whole table.
+    Without count the total is None.
+    """
+    predicates = []
+    order, limit, offset, columns = None, None, 0, '*'
+    for key, value in params:
+        if key == 'select':
+            columns = value
+        elif key == 'order':
+            order = value
+        elif key == 'limit':
+            limit = int(value)
+        elif key == 'offset':
+            offset = int(value)
+        elif key not in ('on_conflict', 'columns'):
+            predicates.append(_predicate(key, value))
+
+    presorted = sorted_by is not None and order in (sorted_by, f'{sorted_by}.asc')
+    if presorted and not count:
+        # Keyset page on the key rows are stored by: stop once the page is full
+        result = []
+        wanted = offset + limit if limit is not None else None
+        for i in range(_seek(rows, sorted_by, params), len(rows)):
+            if all(p(rows[i]) for p in predicates):
+                result.append(rows[i])
+                if wanted is not None and len(result) >= wanted:
+                    break
+        total = None
+    else:
+        result = [row for row in rows if all(p(row) for p in predicates)]
+        if order and not presorted:
+            for part in reversed(order.split(',')):
+                column, _, direction = part.partition('.')
+                # Nulls sort last, as in Postgres; the '' stand-in is only compared with other nulls
+                result.sort(key=lambda r: (r.get(column) is None, r.get(column) if r.get(column) is not None else ''),
+                            reverse=direction.startswith('desc'))
+        total = len(result) if count else None
+    result = result[offset:offset + limit if limit is not None else None]
+    if columns.strip() != '*':
+        names = [c.strip() for c in columns.split(',') if c.strip() and '(' not in c]
+        result = [{name: row.get(name) for name in names} for row in result]
+    return result, total
+
+
+# ============= ASGI APP =============
+
+def _bearer_claims(headers):
+    """Claims of the bearer token, read without checking the signature."""
+    token = headers.get('authorization', '').partition(' ')[2]
+    try:
+        payload = token.split('.')[1]
+        return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except (IndexError, ValueError):
+        return None
+
+
+def _multipart_file(body, content_type):
+    """(bytes, content type) of the first file part of a multipart/form-data body."""
+    boundary = content_type.partition('boundary=')[2].strip('"').encode()
+    for part in body.split(b'--' + boundary):
+        head, _, data = part.partition(b'\r\n\r\n')
+        if b'filename=' in head:
+            match = re.search(rb'content-type:\s*([^\r\n]+)', head, re.I)
+            return data.rstrip(b'\r\n'), (match.group(1).decode() if match else 'application/octet-stream')
+    return body, content_type
+
+
+class FakePostgrest:
+    def __init__(self, tables, latency_ms=0.0):
+        self.tables = tables
+        self.latency = latency_ms / 1000.0
+        self.calls = Counter()
+        self.objects = {}
+        self._next_ids = {name: len(rows) + 1 for name, rows in tables.items()}
+        # Tables whose rows are still in primary key order (seeded, or appended with new ids)
+        self._in_key_order = set(tables)
+
+    def _insert(self, table, body, upsert, key=None):
+        rows = self.tables.setdefault(table, [])
+        primary = PRIMARY_KEYS.get(table, 'id')
+        key = key or primary
+        items = body if isinstance(body, list) else [body]
+        saved = []
+        for item in items:
+            item = dict(item)
+            if key not in item:
+                item[key] = self._next_ids.get(table, 1)
+                self._next_ids[table] = item[key] + 1
+            existing = next((r for r in rows if r.get(key) == item[key]), None) if upsert else None
+            if existing is not None:
+                existing.update(item)
+                saved.append(existing)
+            else:
+                if rows and not (isinstance(item.get(primary), int) and item[primary] > rows[-1].get(primary, 0)):
+                    self._in_key_order.discard(table)
+                rows.append(item)
+                saved.append(item)
+        return saved
+
+    def handle(self, method, table, params, headers, body):
+        rows = self.tables.setdefault(table, [])
+        if method in ('GET', 'HEAD'):
+            sorted_by = PRIMARY_KEYS.get(table) if table in self._in_key_order else None
+            page, total = select_rows(rows, params, sorted_by, count='count=' in headers.get('prefer', ''))
+            return 200, page, total
+        if method == 'POST':
+            upsert = 'merge-duplicates' in headers.get('prefer', '')
+            conflict = dict(params).get('on_conflict')
+            return 201, self._insert(table, json.loads(body or b'[]'), upsert, conflict), None
+        matched, _ = select_rows(rows, [p for p in params if p[0] != 'select'], count=False)
+        if method == 'PATCH':
+            changes = json.loads(body or b'{}')
+            for row in matched:
+                row.update(changes)
+            return 200, matched, None
+        if method == 'DELETE':
+            ids = {id(row) for row in matched}
+            self.tables[table] = [row for row in rows if id(row) not in ids]
+            return 200, matched, None
+        return 405, {'message': 'method not allowed'}, None
+
+    def auth_user(self, headers):
+        claims = _bearer_claims(headers)
+        if not claims or not claims.get('sub'):
+            return 401, {'code': 401, 'msg': 'invalid JWT'}
+        return 200, {
+            'id': claims['sub'], 'aud': claims.get('aud', 'authenticated'), 'role': claims.get('role', ''),
+            'email': claims.get('email'), 'app_metadata': {}, 'user_metadata': {},
+            'created_at': '2024-01-01T00:00:00+00:00',
+        }
+
+    def storage(self, method, path, headers, body):
+        """Objects keyed by bucket/path; returns (status, payload, content type)."""
+        if method in ('POST', 'PUT'):
+            if method == 'POST' and path in self.objects and headers.get('x-upsert') != 'true':
+                return 400, {'statusCode': '409', 'error': 'Duplicate', 'message': 'The resource already exists'}, None
+            content_type = headers.get('content-type', '')
+            if content_type.startswith('multipart/form-data'):
+                self.objects[path] = _multipart_file(body, content_type)
+            else:
+                self.objects[path] = (body, content_type or 'application/octet-stream')
+            return 200, {'Key': path, 'Id': path}, None
+        if method == 'GET' and path in self.objects:
+            data, content_type = self.objects[path]
+            return 200, data, content_type
+        return 404, {'statusCode': '404', 'error': 'not_found', 'message': 'Object not found'}, None
+
+    def stats(self):
+        return {
+            'calls': sum(n for (api, _), n in self.calls.items()),
+            'by_api': {api: sum(n for (a, _), n in self.calls.items() if a == api) for api, _ in self.calls},
+            'by_table': {name: n for (api, name), n in self.calls.items() if api == 'rest'},
+            'objects': len(self.objects),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        path = scope['path']
+        method = scope['method']
+        headers = {k.decode().lower(): v.decode() for k, v in scope['headers']}
+        content_type, total = 'application/json', None
+        if path == '/_fake/stats':
+            status, payload = 200, self.stats()
+        elif path.startswith('/rest/v1/'):
+            table = path[len('/rest/v1/'):]
+            self.calls['rest', table] += 1
+            await self._delay()
+            params = parse_qsl(scope['query_string'].decode(), keep_blank_values=True)
+            status, payload, total = self.handle(method, table, params, headers, body)
+        elif path == '/auth/v1/user':
+            self.calls['auth', 'user'] += 1
+            await self._delay()
+            status, payload = self.auth_user(headers)
+        elif path.startswith('/storage/v1/object/'):
+            self.calls['storage', method] += 1
+            await self._delay()
+            status, payload, stored_type = self.storage(method, unquote(path[len('/storage/v1/object/'):]), headers, body)
+            content_type = stored_type or content_type
+        else:
+            status, payload = 404, {'message': f'{path} not served by the fake'}
+
+        if isinstance(payload, list) and 'vnd.pgrst.object' in headers.get('accept', ''):
+            payload = payload[0] if payload else None
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        response_headers = [(b'content-type', content_type.encode())]
+        if total is not None:
+            response_headers.append((b'content-range', f'0-{max(0, total - 1)}/{total}'.encode()))
+        await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+        await send({'type': 'http.response.body', 'body': data})
+
+    async def _delay(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--latency', type=float, default=20.0, help='milliseconds added to every call')
+    parser.add_argument('--visits', type=int, default=20000)
+    parser.add_argument('--medicines', type=int, default=10000)
+    parser.add_argument('--patients', type=int, default=2000)
+    parser.add_argument('--activity-logs', type=int, default=0)
+    parser.add_argument('--prescriptions', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    tables = seed(args.visits, args.medicines, args.patients, activity_logs=args.activity_logs,
+                  prescriptions=args.prescriptions)
+    app = FakePostgrest(tables, args.latency)
+    uvicorn.run(app, host='127.0.0.1', port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,115 @@
+"""
+Shared pieces of the HTTP load benchmarks: signed test tokens, starting and
+stopping the fake Supabase and the API under gunicorn, and a closed-loop
+load driver.
+"""
+
+import os
+import sys
+import time
+import signal
+import asyncio
+import subprocess
+
+import httpx
+import jwt
+
+JWT_SECRET = 'bench-jwt-secret-0123456789abcdef0123'
+# Shaped like a Supabase key; the fake server does not check it
+SERVICE_KEY = jwt.encode({'role': 'service_role'}, 'unused-signing-secret-0123456789abcdef')
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def token(uuid, email):
+    return jwt.encode({'sub': uuid, 'email': email, 'aud': 'authenticated', 'role': 'authenticated',
+                       'exp': int(time.time()) + 3600}, JWT_SECRET, algorithm='HS256')
+
+
+def app_env(fake_port, **overrides):
+    """Environment for the API (or a backend script) pointed at the fake server."""
+    return {
+        **os.environ,
+        'SUPABASE_URL': f'http://127.0.0.1:{fake_port}',
+        'SUPABASE_SERVICE_ROLE_KEY': SERVICE_KEY,
+        'SUPABASE_JWT_SECRET': JWT_SECRET,
+        'JWT_VERIFY_MODE': 'local',
+        'DATA_BACKEND': 'postgrest',
+        'RESPONSE_CACHE_ENABLED': 'false',
+        'ROLLUP_REFRESH_INTERVAL': '3600',
+        **overrides,
+    }
+
+
+def server_command(mode, workers, bind):
+    """gunicorn command line for one serving mode.
+
+    'sync' is plain sync workers (app:app) and 'async' is asgi:app on uvicorn
+    workers, both without gunicorn.conf.py. 'production' is wsgi:app with
+    gunicorn.conf.py (preloaded app, warm-up after fork, gthread workers).
+    """
+    if mode == 'production':
+        return [sys.executable, '-m', 'gunicorn', 'wsgi:app', '-c', 'gunicorn.conf.py', '-w', str(workers), '-b', bind]
+    # An empty config file keeps gunicorn from picking up gunicorn.conf.py
+    cmd = [sys.executable, '-m', 'gunicorn', 'asgi:app' if mode == 'async' else 'app:app', '-c', os.devnull,
+           '-w', str(workers), '-b', bind, '--timeout', '120']
+    if mode == 'async':
+        cmd[4:4] = ['-k', 'uvicorn.workers.UvicornWorker']
+    return cmd
+
+
+def wait_until_up(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError(f'{url} did not come up')
+
+
+def start(cmd, env=None):
+    return subprocess.Popen(cmd, cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=True)
+
+
+def stop(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(15)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(proc.pid, signal.SIGKILL)
+
+
+async def drive(base, make_request, total, concurrency):
+    """Closed loop: concurrency clients issue total requests; returns (seconds, latencies, errors).
+
+    make_request(i) returns (method, path, httpx request keyword arguments).
+    """
+    latencies, errors = [], 0
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, timeout=120, limits=limits) as client:
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                method, path, kwargs = make_request(i)
+                t = time.perf_counter()
+                r = await client.request(method, path, **kwargs)
+                latencies.append(time.perf_counter() - t)
+                if r.status_code >= 400:
+                    errors += 1
+
+        t = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - t, latencies, errors
+
+
+def run_load(base, make_request, total, concurrency):
+    return asyncio.run(drive(base, make_request, total, concurrency))
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
@@ -0,0 +1,70 @@
+"""
+Cache versions shared by all worker processes.
+
+In-memory caches (vocabularies, the users directory, patient cards) live
+in each worker, so invalidate() in one worker never reaches the others.
+Triggers on the cached tables bump a row per cache in cache_versions
+(create_cache_versions.sql). Each worker reads those rows at most every
+CACHE_VERSION_INTERVAL seconds and reloads a cache whose version moved.
+Without the table get() returns None and the caches fall back to their TTLs.
+"""
+
+import os
+import time
+import logging
+import threading
+
+from supabase_client import get_shared_client
+
+CACHE_VERSION_INTERVAL = float(os.getenv('CACHE_VERSION_INTERVAL', 2))
+# Gap before trying again when the table could not be read
+RETRY_INTERVAL = 60.0
+
+_lock = threading.Lock()
+_versions = None
+_checked_at = 0.0
+_checking = False
+stats = {'checks': 0, 'failures': 0}
+
+
+def _read():
+    # The shared client, so a version check never takes a request's pooled client
+    client = get_shared_client()
+    if not client:
+        raise RuntimeError('Supabase client unavailable')
+    res = client.table('cache_versions').select('name, version').execute()
+    return {row['name']: row['version'] for row in (res.data or [])}
+
+
+def get(name):
+    """Latest version of a cache, or None when it is not tracked.
+
+    One thread re-reads the table once the last read is older than
+    CACHE_VERSION_INTERVAL; the others keep using the previous versions.
+    """
+    global _versions, _checked_at, _checking
+    with _lock:
+        interval = CACHE_VERSION_INTERVAL if _versions is not None else RETRY_INTERVAL
+        due = not _checking and (not _checked_at or time.time() - _checked_at > interval)
+        if due:
+            _checking = True
+    if due:
+        try:
+            versions = _read()
+        except Exception as e:
+            versions = None
+            logging.warning('cache_versions unavailable, caches fall back to their TTLs: %s', e)
+        with _lock:
+            if versions is None:
+                stats['failures'] += 1
+            _versions = versions
+            _checked_at = time.time()
+            _checking = False
+            stats['checks'] += 1
+    versions = _versions
+    return versions.get(name) if versions is not None else None
+
+
+def get_stats():
+    return {**stats, 'versions': _versions,
+            'age_seconds': round(time.time() - _checked_at, 1) if _checked_at else None}
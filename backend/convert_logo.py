@@ -1,5 +1,5 @@
-import base64
+# Print the letterhead logo as a data URI (the same asset the backend serves
+# from /api/assets/letterhead). Run from the backend folder.
+from services import letterhead
 
-with open('static_images/logo.jpeg', 'rb') as f:
-    logo_data = base64.b64encode(f.read()).decode()
-    print('data:image/jpeg;base64,' + logo_data)
+print(letterhead.data_uri())
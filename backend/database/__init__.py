@@ -1 +1,11 @@
 # Database Package
+import os
+
+# Read here rather than in database.sql, so checking the backend does not import SQLAlchemy
+DATA_BACKEND = os.getenv('DATA_BACKEND', 'postgrest').lower()
+DATABASE_URL = os.getenv('DATABASE_URL')
+
+
+def sql_enabled():
+    """True when reads should go through database.sql (DATA_BACKEND=sql with a DATABASE_URL)."""
+    return DATA_BACKEND == 'sql' and bool(DATABASE_URL)
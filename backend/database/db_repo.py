@@ -1,24 +1,116 @@
-from supabase_client import get_admin_client
-
-
-def get_client():
-    """Get Supabase admin client."""
-    return get_admin_client()
-
-
-# Example helper function
-def fetch_all_records(table_name: str):
-    """Fetch all records from a table."""
-    client = get_client()
-    if not client:
-        return []
-    
-    try:
-        res = client.table(table_name).select('*').execute()
-        return res.data if hasattr(res, 'data') else []
-    except Exception as e:
-        print(f"Error fetching from {table_name}: {e}")
-        return []
-
-
-# Add more database helper functions here
+import logging
+
+from supabase_client import get_admin_client
+from database import sql_enabled
+
+# Rows requested per round trip (Supabase caps responses at 1000 rows by default)
+DEFAULT_PAGE_SIZE = 1000
+# PostgREST URLs get long quickly; keep in_() filters to this many values
+IN_CHUNK = 200
+
+# Keyset pagination column for each table
+PRIMARY_KEYS = {
+    'visits': 'visit_id',
+    'medicines': 'med_id',
+    'patients': 'patient_id',
+    'prescriptions': 'prescription_id',
+    'prescription_medicines': 'medicine_id',
+    'activity_logs': 'log_id',
+    'users': 'uuid',
+}
+
+# PostgREST filter methods that may be pushed down from callers
+FILTER_OPS = {'eq', 'neq', 'gt', 'gte', 'lt', 'lte', 'in_', 'like', 'ilike', 'is_'}
+
+
+def get_client():
+    """Get Supabase admin client."""
+    return get_admin_client()
+
+
+def apply_filters(query, filters=None):
+    """Apply (op, column, value) filters, e.g. ('gte', 'date', '2024-01-01')."""
+    for op, column, value in filters or ():
+        if op not in FILTER_OPS:
+            raise ValueError(f"Unsupported filter op: {op}")
+        query = getattr(query, op)(column, value)
+    return query
+
+
+def iter_pages(table_name: str, columns: str = '*', filters=None, key: str = None,
+               page_size: int = DEFAULT_PAGE_SIZE, client=None):
+    """Yield a table in pages of at most page_size rows, ordered by its primary key.
+
+    Uses keyset pagination (key > last seen key), so every page costs the same
+    regardless of depth and only one page is held in memory. Iteration stops on
+    an empty page rather than a short one, so a server-side row cap smaller than
+    page_size can never end the scan early. Errors are raised, not swallowed,
+    so callers never mistake a failed read for the end of the table.
+
+    With DATA_BACKEND=sql, mapped tables and columns are read through one
+    streamed SQL query instead (see database/sql.py).
+    """
+    key = key or PRIMARY_KEYS.get(table_name, 'id')
+    if sql_enabled():
+        # Imported here so the default PostgREST setup never loads SQLAlchemy
+        from database import sql
+        if sql.supports(table_name, columns, filters):
+            yield from sql.iter_pages(table_name, columns, filters, key, page_size)
+            return
+
+    client = client or get_client()
+    if not client:
+        raise RuntimeError('Supabase client unavailable')
+
+    select_columns = columns
+    strip_key = False
+    if columns.strip() != '*':
+        requested = [c.strip() for c in columns.split(',')]
+        if key not in requested:
+            select_columns = f"{columns}, {key}"
+            strip_key = True
+
+    last_key = None
+    while True:
+        query = apply_filters(client.table(table_name).select(select_columns), filters)
+        if last_key is not None:
+            query = query.gt(key, last_key)
+        res = query.order(key).limit(page_size).execute()
+        page = res.data if hasattr(res, 'data') else []
+        if not page:
+            return
+        last_key = page[-1][key]
+        if strip_key:
+            for row in page:
+                row.pop(key, None)
+        yield page
+
+
+def iter_records(table_name: str, columns: str = '*', filters=None, key: str = None,
+                 page_size: int = DEFAULT_PAGE_SIZE, client=None):
+    """Yield rows one at a time; see iter_pages."""
+    for page in iter_pages(table_name, columns, filters, key, page_size, client):
+        yield from page
+
+
+def fetch_in(table_name: str, column: str, values, columns: str = '*', client=None):
+    """Rows of a table whose column is in values, in chunks of IN_CHUNK values."""
+    rows = []
+    values = list(dict.fromkeys(v for v in values if v is not None))
+    for i in range(0, len(values), IN_CHUNK):
+        chunk = values[i:i + IN_CHUNK]
+        rows.extend(iter_records(table_name, columns, [('in_', column, chunk)], client=client))
+    return rows
+
+
+# Example helper function
+def fetch_all_records(table_name: str):
+    """Fetch all records from a table; a failed page raises rather than returning a partial list."""
+    try:
+        return list(iter_records(table_name))
+    except Exception:
+        logging.exception(f"Error fetching from {table_name}")
+        raise
+
+
+# Add more database helper functions here
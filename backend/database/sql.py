@@ -0,0 +1,280 @@
+"""
+Optional direct-SQL data access.
+
+By default every read goes through PostgREST. With DATA_BACKEND=sql and a
+DATABASE_URL (the Supabase Postgres connection string, or sqlite:///file.db
+for a local stand-in), db_repo's bulk reads stream from a server-side cursor
+on a pooled SQLAlchemy engine instead, and the financial summary is
+aggregated with GROUP BY in the database rather than in Python.
+
+Rows come back in the shape PostgREST returns: dates and timestamps as ISO
+strings and numerics as floats, so callers do not care which path ran.
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import create_engine, event, select, func, case, cast, Date, String, literal
+
+import metrics
+from database import DATABASE_URL, sql_enabled
+from models.base import Patient, Visit, Medicine, Prescription, PrescriptionMedicine, ActivityLog
+
+SQL_POOL_SIZE = int(os.getenv('SQL_POOL_SIZE', 5))
+SQL_MAX_OVERFLOW = int(os.getenv('SQL_MAX_OVERFLOW', 5))
+SQL_POOL_TIMEOUT = float(os.getenv('SQL_POOL_TIMEOUT', 10))
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv('SQL_STATEMENT_TIMEOUT_MS', 30000))
+
+TABLES = {model.__tablename__: model.__table__
+          for model in (Patient, Visit, Medicine, Prescription, PrescriptionMedicine, ActivityLog)}
+
+_engine = None
+_engine_pid = None
+_engine_lock = threading.Lock()
+
+
+def enabled():
+    return sql_enabled()
+
+
+def supports(table_name, columns='*', filters=None):
+    """True when every selected and filtered column is mapped.
+
+    '*' stays on PostgREST: the models map only the columns the app reads,
+    so a SQL '*' would return fewer fields than callers expect.
+    """
+    table = TABLES.get(table_name)
+    if table is None or columns.strip() == '*':
+        return False
+    names = [name.strip() for name in columns.split(',')] + [column for _, column, _ in filters or ()]
+    return all(name in table.c for name in names)
+
+
+def _create_engine():
+    if DATABASE_URL.startswith('sqlite'):
+        return create_engine(DATABASE_URL)
+    return create_engine(
+        DATABASE_URL,
+        pool_size=SQL_POOL_SIZE,
+        max_overflow=SQL_MAX_OVERFLOW,
+        pool_timeout=SQL_POOL_TIMEOUT,
+        pool_pre_ping=True,
+        # Supabase's pooler drops idle connections; recycle before it does
+        pool_recycle=1800,
+        connect_args={'options': f'-c statement_timeout={SQL_STATEMENT_TIMEOUT_MS}'},
+    )
+
+
+def _time_statements(engine):
+    """Report each statement's execution time to the request metrics."""
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info['statement_started'] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('statement_started', None)
+        if started is not None:
+            metrics.observe_call('sql', 'query', time.perf_counter() - started)
+
+
+def get_engine():
+    """The process's engine; a forked worker builds its own instead of sharing the parent's sockets."""
+    global _engine, _engine_pid
+    if _engine is None or _engine_pid != os.getpid():
+        with _engine_lock:
+            if _engine is None or _engine_pid != os.getpid():
+                if _engine is not None:
+                    _engine.dispose(close=False)
+                _engine = _create_engine()
+                _time_statements(_engine)
+                _engine_pid = os.getpid()
+                logging.info(f'SQL backend: {_engine.dialect.name} engine created')
+    return _engine
+
+
+def _value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _row(mapping):
+    return {key: _value(value) for key, value in mapping.items()}
+
+
+def _condition(column, op, value):
+    """SQL equivalent of a db_repo (op, column, value) PostgREST filter."""
+    if op == 'eq':
+        return column == value
+    if op == 'neq':
+        return column != value
+    if op == 'gt':
+        return column > value
+    if op == 'gte':
+        return column >= value
+    if op == 'lt':
+        return column < value
+    if op == 'lte':
+        return column <= value
+    if op == 'in_':
+        return column.in_(list(value))
+    if op == 'like':
+        return column.like(value.replace('*', '%'))
+    if op == 'ilike':
+        return column.ilike(value.replace('*', '%'))
+    if op == 'is_':
+        return column.is_({'null': None, 'true': True, 'false': False}.get(str(value).lower(), value))
+    raise ValueError(f"Unsupported filter op: {op}")
+
+
+def _columns(table, columns):
+    if columns.strip() == '*':
+        return list(table.columns)
+    return [table.c[name.strip()] for name in columns.split(',')]
+
+
+def iter_pages(table_name, columns='*', filters=None, key=None, page_size=1000):
+    """Yield rows in lists of page_size from one streamed query, ordered by key.
+
+    The query runs once on a server-side cursor (stream_results), so the
+    database sends rows as they are consumed and only one page is in memory.
+    """
+    table = TABLES[table_name]
+    stmt = select(*_columns(table, columns))
+    for op, column, value in filters or ():
+        stmt = stmt.where(_condition(table.c[column], op, value))
+    if key:
+        stmt = stmt.order_by(table.c[key])
+
+    with get_engine().connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=page_size).execute(stmt)
+        for partition in result.mappings().partitions(page_size):
+            yield [_row(mapping) for mapping in partition]
+
+
+# ============= AGGREGATION =============
+
+def _as_date(column, dialect):
+    """Day of a date or ISO timestamp; blank values become NULL and are skipped like NaT."""
+    if dialect == 'sqlite':
+        return func.date(column)
+    return cast(func.nullif(cast(column, String), ''), Date)
+
+
+def _period(day, granularity, dialect):
+    """Text period key matching financial_aggregation: YYYY-MM-DD (day, Monday of week) or YYYY-MM."""
+    if dialect == 'sqlite':
+        if granularity == 'week':
+            return func.date(day, 'weekday 0', '-6 days')
+        return func.strftime('%Y-%m' if granularity == 'month' else '%Y-%m-%d', day)
+    if granularity == 'week':
+        return func.to_char(func.date_trunc('week', day), 'YYYY-MM-DD')
+    return func.to_char(day, 'YYYY-MM' if granularity == 'month' else 'YYYY-MM-DD')
+
+
+def _sum_where(condition, value):
+    return func.sum(case((condition, value), else_=literal(0)))
+
+
+def _zero(column):
+    return func.coalesce(column, 0)
+
+
+def _payment(column):
+    return func.lower(func.trim(func.coalesce(column, '')))
+
+
+def _date_range(stmt, column, date_from, date_to):
+    if date_from:
+        stmt = stmt.where(column >= date_from)
+    if date_to:
+        stmt = stmt.where(column <= date_to)
+    return stmt
+
+
+def _empty_period(period):
+    return {
+        'period': period,
+        'totalVisits': 0, 'drugVisits': 0,
+        'consultationFees': 0.0, 'drugFees': 0.0, 'procedureFees': 0.0, 'totalRevenue': 0.0,
+        'cashPayments': 0.0, 'cardPayments': 0.0, 'gpayPayments': 0.0,
+        'newPatients': 0, 'googleReferrals': 0,
+    }
+
+
+def financial_periods(granularity, date_from=None, date_to=None, new_patient_codes=('N',)):
+    """{period: stats} in the shape of financial_aggregation.aggregate, computed with GROUP BY."""
+    engine = get_engine()
+    dialect = engine.dialect.name
+    v = Visit.__table__.c
+    m = Medicine.__table__.c
+
+    v_day = _as_date(v.date, dialect)
+    v_period = _period(v_day, granularity, dialect).label('period')
+    v_total = _zero(v.consultation_fee) + _zero(v.drug_fee) + _zero(v.Procedure_Fee)
+    v_method = _payment(v.paymentmethod)
+    visits = select(
+        v_period,
+        func.count().label('visits'),
+        func.sum(_zero(v.consultation_fee)).label('consultation'),
+        func.sum(_zero(v.drug_fee)).label('drug'),
+        func.sum(_zero(v.Procedure_Fee)).label('procedure'),
+        _sum_where(v_method == 'cash', v_total).label('cash'),
+        _sum_where(v_method == 'card', v_total).label('card'),
+        _sum_where(v_method == 'gpay', v_total).label('gpay'),
+        _sum_where(func.upper(func.trim(func.coalesce(v.new_old, ''))).in_(new_patient_codes), 1).label('new'),
+        _sum_where(func.lower(func.coalesce(v.referral, '')).like('%google%'), 1).label('google'),
+    ).where(v_day.isnot(None)).group_by(v_period)
+    visits = _date_range(visits, v.date, date_from, date_to)
+
+    m_day = _as_date(m.date, dialect)
+    m_period = _period(m_day, granularity, dialect).label('period')
+    m_method = _payment(m.payment_method)
+    medicines = select(
+        m_period,
+        func.count().label('purchases'),
+        func.sum(_zero(m.drug_fee)).label('drug'),
+        _sum_where(m_method == 'cash', _zero(m.drug_fee)).label('cash'),
+        _sum_where(m_method == 'card', _zero(m.drug_fee)).label('card'),
+        _sum_where(m_method == 'gpay', _zero(m.drug_fee)).label('gpay'),
+    ).where(m_day.isnot(None)).group_by(m_period)
+    medicines = _date_range(medicines, m.date, date_from, date_to)
+
+    periods = {}
+    with engine.connect() as conn:
+        for row in conn.execute(visits).mappings():
+            stats = periods.setdefault(row['period'], _empty_period(row['period']))
+            stats['totalVisits'] += int(row['visits'])
+            stats['consultationFees'] += float(row['consultation'] or 0)
+            stats['drugFees'] += float(row['drug'] or 0)
+            stats['procedureFees'] += float(row['procedure'] or 0)
+            for method in ('cash', 'card', 'gpay'):
+                stats[f'{method}Payments'] += float(row[method] or 0)
+            stats['newPatients'] += int(row['new'] or 0)
+            stats['googleReferrals'] += int(row['google'] or 0)
+        for row in conn.execute(medicines).mappings():
+            stats = periods.setdefault(row['period'], _empty_period(row['period']))
+            stats['drugVisits'] += int(row['purchases'])
+            stats['drugFees'] += float(row['drug'] or 0)
+            for method in ('cash', 'card', 'gpay'):
+                stats[f'{method}Payments'] += float(row[method] or 0)
+
+    for stats in periods.values():
+        stats['totalRevenue'] = stats['consultationFees'] + stats['procedureFees'] + stats['drugFees']
+    return periods
+
+
+def get_stats():
+    """Backend and pool status for /health."""
+    if not enabled():
+        return {'enabled': False}
+    if _engine is None:
+        return {'enabled': True, 'connected': False}
+    return {'enabled': True, 'dialect': _engine.dialect.name, 'pool': _engine.pool.status()}
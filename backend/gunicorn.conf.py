@@ -0,0 +1,48 @@
+"""
+Production gunicorn settings. gunicorn reads this file by itself when
+started from the backend folder:
+
+    gunicorn wsgi:app                                      # threaded workers
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker     # async serving
+
+The app is imported once in the master (preload) and forked, so workers
+share its imported code and start in milliseconds. Each worker then opens
+its Supabase clients and loads its caches in post_fork. It waits for that
+(up to WARMUP_TIMEOUT) before it accepts connections, so no request pays
+for a cold worker. /ready reports whether the answering worker is warm.
+"""
+
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.getenv('PORT', 4000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', min(4, multiprocessing.cpu_count() * 2 + 1)))
+# Threads serve other requests while one waits on Supabase; idle keep-alive
+# connections wait in the worker's poller, not on a thread
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+# Longer than the usual 60 s load balancer idle timeout, so the proxy closes idle connections first
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 75))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+# Recycle workers after this many requests (0: never); warm-up runs again in the new worker
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() != 'false'
+
+# Request threads per worker; the Supabase pool is sized from it. asgi.py replaces
+# it with ASGI_THREADS when the app runs on uvicorn workers
+os.environ.setdefault('WORKER_THREADS', str(threads))
+# Read by warmup when the app is imported: the preloaded master must not start warm-up threads
+os.environ.setdefault('WARMUP_ON_FORK', 'true' if preload_app else 'false')
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        # The app is imported after this hook, and create_app() starts warm-up itself
+        return
+    import warmup
+    warmup.start()
+    # Stay well inside the worker timeout: the master kills workers that do not check in
+    if not warmup.wait(min(warmup.WARMUP_TIMEOUT, timeout / 2)):
+        server.log.warning('Worker %s accepting requests before warm-up finished', worker.pid)
@@ -0,0 +1,250 @@
+"""
+Local verification of Supabase access tokens.
+
+Tokens are checked against the project's JWT secret (HS256) or its JWKS
+(asymmetric signing keys), so most requests never call Supabase Auth.
+Results are cached briefly by token hash. Tokens signed with a key we do
+not know are reported as UNKNOWN so the caller can fall back to the
+remote get_user call.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import urllib.request
+from collections import OrderedDict
+
+try:
+    import jwt
+except Exception:
+    jwt = None
+
+SUPABASE_URL = os.getenv('SUPABASE_URL')
+SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET')
+
+# 'local' verifies signatures in-process, 'remote' always asks Supabase Auth
+JWT_VERIFY_MODE = os.getenv('JWT_VERIFY_MODE', 'local').lower()
+JWT_AUDIENCE = os.getenv('JWT_AUDIENCE', 'authenticated')
+JWT_CACHE_SIZE = int(os.getenv('JWT_CACHE_SIZE', 1024))
+JWT_CACHE_TTL = float(os.getenv('JWT_CACHE_TTL', 60))
+JWT_NEGATIVE_CACHE_TTL = float(os.getenv('JWT_NEGATIVE_CACHE_TTL', 30))
+JWKS_TTL = float(os.getenv('JWKS_TTL', 600))
+JWKS_MIN_REFRESH_INTERVAL = float(os.getenv('JWKS_MIN_REFRESH_INTERVAL', 30))
+
+VALID = 'valid'
+INVALID = 'invalid'
+UNKNOWN = 'unknown'
+
+ASYMMETRIC_ALGORITHMS = ('RS256', 'ES256', 'EdDSA')
+
+
+class TokenCache:
+    """Small LRU of token hash -> (expires_at, user); user None means rejected."""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def put(self, key, user, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.time() + ttl, user)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class JWKSCache:
+    """Signing keys fetched from the Supabase Auth JWKS endpoint."""
+
+    def __init__(self, url, ttl=600.0, min_refresh_interval=30.0):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._attempted_at = 0.0
+        self._lock = threading.Lock()
+        self.refreshes = 0
+
+    def _refresh(self):
+        """Refetch the keys, at most once per min_refresh_interval across all threads.
+
+        The fetch runs outside the lock: other threads keep verifying with
+        the current keys meanwhile and only the swap is locked.
+        """
+        with self._lock:
+            now = time.time()
+            if now - self._attempted_at < self.min_refresh_interval:
+                return
+            self._attempted_at = now
+        try:
+            with urllib.request.urlopen(self.url, timeout=5) as res:
+                payload = json.loads(res.read().decode('utf-8'))
+            keys = {}
+            for jwk in payload.get('keys', []):
+                kid = jwk.get('kid')
+                if kid:
+                    keys[kid] = jwt.PyJWK(jwk)
+        except Exception as e:
+            logging.warning('JWKS refresh failed: %s', e)
+            return
+        with self._lock:
+            self._keys = keys
+            self._fetched_at = now
+            self.refreshes += 1
+
+    def get(self, kid):
+        """Return the key for kid, refetching once on a miss (key rotation)."""
+        if time.time() - self._fetched_at > self.ttl:
+            self._refresh()
+        key = self._keys.get(kid)
+        if key is None:
+            self._refresh()
+            key = self._keys.get(kid)
+        return key
+
+
+_token_cache = TokenCache(JWT_CACHE_SIZE)
+_jwks = JWKSCache(
+    f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json" if SUPABASE_URL else None,
+    ttl=JWKS_TTL,
+    min_refresh_interval=JWKS_MIN_REFRESH_INTERVAL,
+)
+
+
+def _user_from_claims(claims):
+    return {
+        'id': claims.get('sub'),
+        'email': claims.get('email'),
+        'phone': claims.get('phone'),
+        'role': claims.get('role'),
+        'aud': claims.get('aud'),
+        'app_metadata': claims.get('app_metadata') or {},
+        'user_metadata': claims.get('user_metadata') or {},
+    }
+
+
+def _signing_key(header):
+    """Key and algorithm for a token header; the header's alg must be the JWK's own."""
+    alg = header.get('alg')
+    if alg == 'HS256':
+        return SUPABASE_JWT_SECRET, alg
+    if alg in ASYMMETRIC_ALGORITHMS and header.get('kid') and _jwks.url:
+        jwk = _jwks.get(header['kid'])
+        if jwk is None:
+            return None, alg
+        # The header is unverified: never let it pick an algorithm the key was not issued for
+        if jwk.algorithm_name != alg:
+            raise jwt.InvalidAlgorithmError(f'alg {alg} does not match the key ({jwk.algorithm_name})')
+        return jwk.key, alg
+    return None, alg
+
+
+def verify_access_token(token):
+    """Verify a token locally.
+
+    Returns (status, user) where status is VALID, INVALID or UNKNOWN.
+    UNKNOWN means the token could not be checked here and the caller
+    should ask Supabase Auth.
+    """
+    if jwt is None or JWT_VERIFY_MODE != 'local' or not token:
+        return UNKNOWN, None
+
+    cache_key = TokenCache.key(token)
+    cached = _token_cache.get(cache_key)
+    if cached is not None:
+        user = cached[1]
+        return (VALID, user) if user else (INVALID, None)
+
+    try:
+        header = jwt.get_unverified_header(token)
+    except jwt.PyJWTError:
+        _token_cache.put(cache_key, None, JWT_NEGATIVE_CACHE_TTL)
+        return INVALID, None
+
+    try:
+        key, alg = _signing_key(header)
+    except jwt.InvalidAlgorithmError as e:
+        logging.warning('Rejected access token: %s', e)
+        _token_cache.put(cache_key, None, JWT_NEGATIVE_CACHE_TTL)
+        return INVALID, None
+    if key is None:
+        return UNKNOWN, None
+
+    try:
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[alg],
+            audience=JWT_AUDIENCE,
+            options={'require': ['exp', 'sub']},
+        )
+    except jwt.PyJWTError as e:
+        logging.debug('Local JWT verification failed: %s', e)
+        _token_cache.put(cache_key, None, JWT_NEGATIVE_CACHE_TTL)
+        return INVALID, None
+
+    user = _user_from_claims(claims)
+    # Never cache a token past its own expiry
+    _token_cache.put(cache_key, user, min(JWT_CACHE_TTL, claims['exp'] - time.time()))
+    return VALID, user
+
+
+def cache_remote_result(token, user):
+    """Remember a user resolved by the remote fallback."""
+    if jwt is None or not user or not token:
+        return
+    ttl = JWT_CACHE_TTL
+    try:
+        claims = jwt.decode(token, options={'verify_signature': False})
+        if claims.get('exp'):
+            ttl = min(ttl, claims['exp'] - time.time())
+    except jwt.PyJWTError:
+        pass
+    _token_cache.put(TokenCache.key(token), user, ttl)
+
+
+def warm():
+    """Fetch the JWKS now when tokens can only be checked against it (no HS256 secret set)."""
+    if jwt is None or JWT_VERIFY_MODE != 'local' or SUPABASE_JWT_SECRET or not _jwks.url:
+        return True
+    _jwks._refresh()
+    return bool(_jwks._keys)
+
+
+def get_verifier_stats():
+    return {
+        'mode': JWT_VERIFY_MODE,
+        'cache_hits': _token_cache.hits,
+        'cache_misses': _token_cache.misses,
+        'jwks_refreshes': _jwks.refreshes,
+    }
@@ -0,0 +1,379 @@
+"""
+Request metrics, Server-Timing and slow-request profiling.
+
+init_app() times every request by route and collects what it spent on
+Supabase: each PostgREST, Storage and Auth call made through httpx (and
+each statement on the SQL backend) is counted and timed, for the request
+and in process-wide histograms, as is JSON serialization of the response.
+Responses carry a Server-Timing header with the breakdown, and
+/metrics renders the histograms in the Prometheus text format. Metrics are
+per worker process.
+
+With SLOW_REQUEST_PROFILE_MS set, a sampling profiler records the stacks
+of threads serving requests every PROFILE_SAMPLE_INTERVAL_MS, and requests
+slower than the threshold have their hottest stacks logged (and written as
+folded stacks to SLOW_REQUEST_PROFILE_DIR when set). Nothing is sampled
+while it is off.
+"""
+
+import os
+import re
+import sys
+import time
+import bisect
+import logging
+import threading
+import contextvars
+from collections import Counter
+from functools import wraps
+
+from flask import request, g
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() != 'false'
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'true').lower() != 'false'
+SLOW_REQUEST_PROFILE_MS = float(os.getenv('SLOW_REQUEST_PROFILE_MS', 0))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 5))
+SLOW_REQUEST_PROFILE_DIR = os.getenv('SLOW_REQUEST_PROFILE_DIR')
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CALL_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+SERIALIZE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+CALLS_PER_REQUEST_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+# Frames kept per sampled stack, innermost last
+PROFILE_STACK_DEPTH = 40
+# Stacks logged for one slow request
+PROFILE_TOP_STACKS = 5
+
+# Supabase API of a request path, used as the Server-Timing name
+API_PREFIXES = (('/rest/v1/', 'db'), ('/storage/v1/', 'storage'), ('/auth/v1/', 'auth'), ('/functions/v1/', 'functions'))
+
+
+class Histogram:
+    """Bucketed observations per label set, rendered in the Prometheus layout."""
+
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in sorted(self._series.items())]
+        for label_values, counts, total in series:
+            labels = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by route.',
+    ('method', 'route', 'status'), REQUEST_BUCKETS)
+supabase_call_duration = Histogram(
+    'supabase_call_duration_seconds', 'Duration of one Supabase call, by API.',
+    ('api', 'method'), CALL_BUCKETS)
+supabase_calls_per_request = Histogram(
+    'http_request_supabase_calls', 'Supabase calls made while serving one request, by route.',
+    ('route',), CALLS_PER_REQUEST_BUCKETS)
+json_serialization = Histogram(
+    'http_response_json_seconds', 'Time spent serializing JSON responses, by route.',
+    ('route',), SERIALIZE_BUCKETS)
+REGISTRY = (request_duration, supabase_call_duration, supabase_calls_per_request, json_serialization)
+
+stats = {'slow_requests': 0, 'profiled_samples': 0}
+
+
+# ============= PER-REQUEST TIMINGS =============
+
+class RequestTimings:
+    """Supabase calls and serialization time of one request, filled in from any thread."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.calls = Counter()
+        self.seconds = Counter()
+        self.json_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add_call(self, api, seconds):
+        with self._lock:
+            self.calls[api] += 1
+            self.seconds[api] += seconds
+
+    def add_json(self, seconds):
+        with self._lock:
+            self.json_seconds += seconds
+
+    def server_timing(self, total):
+        parts = [f'app;dur={total * 1000:.1f}']
+        for api in sorted(self.calls):
+            n = self.calls[api]
+            parts.append(f'{api};desc="{n} call{"s" if n != 1 else ""}";dur={self.seconds[api] * 1000:.1f}')
+        if self.json_seconds:
+            parts.append(f'json;dur={self.json_seconds * 1000:.1f}')
+        return ', '.join(parts)
+
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+def current():
+    return _current.get()
+
+
+def bind(fn):
+    """Run fn in a copy of this context, so work it does on a pool thread counts toward this request."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def carry(coro):
+    """Wrap a coroutine headed for another thread's event loop so it counts toward this request."""
+    timings = _current.get()
+
+    async def run():
+        _current.set(timings)
+        return await coro
+    return run()
+
+
+def observe_call(api, method, seconds):
+    supabase_call_duration.observe(seconds, api, method)
+    timings = _current.get()
+    if timings is not None:
+        timings.add_call(api, seconds)
+
+
+def api_of(path):
+    for prefix, api in API_PREFIXES:
+        if path.startswith(prefix):
+            return api
+    return 'http'
+
+
+# ============= HTTP CLIENT HOOKS =============
+
+_hooks_installed = False
+
+
+def install_http_hooks():
+    """Time every call made through httpx, which the Supabase clients (sync and async) use."""
+    global _hooks_installed
+    if _hooks_installed or httpx is None:
+        return
+    _hooks_installed = True
+    sync_send = httpx.Client.send
+    async_send = httpx.AsyncClient.send
+
+    @wraps(sync_send)
+    def send(self, req, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return sync_send(self, req, *args, **kwargs)
+        finally:
+            observe_call(api_of(req.url.path), req.method, time.perf_counter() - start)
+
+    @wraps(async_send)
+    async def send_async(self, req, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await async_send(self, req, *args, **kwargs)
+        finally:
+            observe_call(api_of(req.url.path), req.method, time.perf_counter() - start)
+
+    httpx.Client.send = send
+    httpx.AsyncClient.send = send_async
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, timing each serialization for the current request."""
+
+    def dumps(self, obj, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            timings = _current.get()
+            if timings is not None:
+                timings.add_json(time.perf_counter() - start)
+
+
+# ============= SLOW REQUEST PROFILER =============
+
+class SlowRequestProfiler:
+    """Samples the stacks of threads serving requests from one background thread."""
+
+    def __init__(self, threshold_ms, interval_ms, out_dir=None):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.out_dir = out_dir
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_thread(self):
+        # A forked worker needs its own sampler
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._active = {}
+            self._thread = threading.Thread(target=self._run, name='slow-request-profiler', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def begin(self):
+        self._ensure_thread()
+        samples = Counter()
+        with self._lock:
+            self._active[threading.get_ident()] = samples
+        return samples
+
+    def end(self):
+        with self._lock:
+            return self._active.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[_stack(frame)] += 1
+                        stats['profiled_samples'] += 1
+
+    def report(self, route, seconds, samples):
+        stats['slow_requests'] += 1
+        top = samples.most_common(PROFILE_TOP_STACKS)
+        total = sum(samples.values()) or 1
+        logging.warning('Slow request %s took %.0f ms (%d samples); hottest stacks:\n%s',
+                        route, seconds * 1000, total,
+                        '\n'.join(f"  {n * 100 / total:.0f}% {' <- '.join(reversed(stack.split(';')[-3:]))}" for stack, n in top))
+        if not self.out_dir:
+            return
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{re.sub(r'[^A-Za-z0-9.-]+', '_', route)}.folded"
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            with open(os.path.join(self.out_dir, name), 'w', encoding='utf-8') as f:
+                f.writelines(f'{stack} {n}\n' for stack, n in samples.items())
+        except OSError:
+            logging.exception('Slow request profile write failed')
+
+
+def _stack(frame):
+    """Folded stack (outermost first, ';' separated) as flame graph tools read it."""
+    names = []
+    while frame is not None and len(names) < PROFILE_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+_profiler = SlowRequestProfiler(SLOW_REQUEST_PROFILE_MS, PROFILE_SAMPLE_INTERVAL_MS, SLOW_REQUEST_PROFILE_DIR) \
+    if SLOW_REQUEST_PROFILE_MS > 0 else None
+
+
+# ============= FLASK HOOKS =============
+
+def _route():
+    # The rule, not the path, so ids do not make a series per patient
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def _before_request():
+    timings = RequestTimings()
+    g._metrics_token = _current.set(timings)
+    if _profiler is not None:
+        g._metrics_samples = _profiler.begin()
+
+
+def _after_request(response):
+    timings = _current.get()
+    if timings is None:
+        return response
+    elapsed = time.perf_counter() - timings.start
+    route = _route()
+    request_duration.observe(elapsed, request.method, route, str(response.status_code))
+    supabase_calls_per_request.observe(sum(timings.calls.values()), route)
+    if timings.json_seconds:
+        json_serialization.observe(timings.json_seconds, route)
+    if SERVER_TIMING_ENABLED:
+        response.headers['Server-Timing'] = timings.server_timing(elapsed)
+    if _profiler is not None:
+        samples = _profiler.end()
+        if samples and elapsed >= _profiler.threshold:
+            _profiler.report(f'{request.method} {route}', elapsed, samples)
+    return response
+
+
+def _teardown_request(exc=None):
+    if _profiler is not None:
+        _profiler.end()
+    token = g.pop('_metrics_token', None)
+    if token is not None:
+        _current.reset(token)
+
+
+def init_app(app):
+    """Instrument the app's requests and outgoing Supabase calls."""
+    if not METRICS_ENABLED:
+        return
+    install_http_hooks()
+    app.json = TimedJSONProvider(app)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+
+def render():
+    """All histograms in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.append('# HELP slow_requests_total Requests slower than SLOW_REQUEST_PROFILE_MS.')
+    lines.append('# TYPE slow_requests_total counter')
+    lines.append(f"slow_requests_total {stats['slow_requests']}")
+    return '\n'.join(lines) + '\n'
+
+
+def get_stats():
+    return {
+        'enabled': METRICS_ENABLED,
+        'server_timing': SERVER_TIMING_ENABLED,
+        'profiler': _profiler is not None,
+        **stats,
+    }
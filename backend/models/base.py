@@ -1,10 +1,10 @@
 """
-SQLAlchemy base models (if needed for direct database access).
-Currently using Supabase SDK for database operations.
+SQLAlchemy models for direct database access (database/sql.py).
+The Supabase SDK stays the default; these are used when DATA_BACKEND=sql.
 """
 
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, Float, Text
 from datetime import datetime
 
 Base = declarative_base()
@@ -13,9 +13,92 @@ Base = declarative_base()
 # Example model (optional - Supabase SDK is primary method)
 class BaseModel(Base):
     __abstract__ = True
-    
+
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
-# Add more models here if needed
+# Clinic tables. Only the columns the app reads are mapped; dates are kept
+# as text here because the SQL layer compares them the way PostgREST does.
+
+class Patient(Base):
+    __tablename__ = 'patients'
+
+    patient_id = Column(Integer, primary_key=True)
+    name = Column(Text)
+    sex = Column(String)
+    phone_no = Column(String)
+    year_of_birth = Column(Integer)
+    pic_filename = Column(Text)
+    hometown = Column(Text)
+    updated_at = Column(DateTime(timezone=True))
+
+
+class Visit(Base):
+    __tablename__ = 'visits'
+
+    visit_id = Column(Integer, primary_key=True)
+    patient_id = Column(Integer, index=True)
+    date = Column(String, index=True)
+    fullname = Column(Text)
+    hometown = Column(Text)
+    age = Column(Integer)
+    phoneno = Column(String)
+    sex = Column(String)
+    consultation_type = Column(String)
+    consultation_fee = Column(Float)
+    drug_fee = Column(Float)
+    Procedure_Fee = Column(Float)
+    extra_procedures = Column(Text)
+    new_old = Column(String)
+    paymentmethod = Column(String)
+    referral = Column(String)
+    weight = Column(String)
+    blood_pressure = Column(String)
+    pulse = Column(String)
+    updated_at = Column(DateTime(timezone=True))
+
+
+class Medicine(Base):
+    __tablename__ = 'medicines'
+
+    med_id = Column(Integer, primary_key=True)
+    patient_id = Column(Integer, index=True)
+    patient_name = Column(Text)
+    date = Column(String, index=True)
+    drug_fee = Column(Float)
+    payment_method = Column(String)
+    updated_at = Column(DateTime(timezone=True))
+
+
+class Prescription(Base):
+    __tablename__ = 'prescriptions'
+
+    prescription_id = Column(Integer, primary_key=True)
+    visit_id = Column(Integer, index=True)
+    symptoms = Column(Text)
+    findings = Column(Text)
+    diagnosis = Column(Text)
+    procedures = Column(Text)
+    created_at = Column(DateTime(timezone=True))
+
+
+class PrescriptionMedicine(Base):
+    __tablename__ = 'prescription_medicines'
+
+    medicine_id = Column(Integer, primary_key=True)
+    prescription_id = Column(Integer, index=True)
+    medicine_name = Column(Text)
+    quantity = Column(String)
+    time = Column(String)
+    areasite = Column(String)
+    duration = Column(String)
+
+
+class ActivityLog(Base):
+    __tablename__ = 'activity_logs'
+
+    log_id = Column(BigInteger, primary_key=True)
+    user_uuid = Column(String, index=True)
+    action = Column(Text)
+    created_at = Column(DateTime(timezone=True))
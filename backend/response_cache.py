@@ -0,0 +1,164 @@
+"""
+In-process cache for read-heavy JSON GET routes.
+
+Responses are stored as serialized bytes keyed by endpoint, query args and
+user, with a TTL and LRU eviction. Every cached response carries a strong
+ETag, so a client polling with If-None-Match gets a 304 without a database
+round trip or JSON serialization. Entries can be dropped by tag when a
+route writes the underlying data.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, make_response
+
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 512))
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 30))
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() != 'false'
+
+
+class ResponseCache:
+    """Thread-safe LRU of key -> (expires_at, etag, body, status, mimetype, tags)."""
+
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._items[key]
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._items[key] = entry
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, *tags):
+        """Drop entries carrying any of the tags (all entries if no tags given)."""
+        with self._lock:
+            if not tags:
+                dropped = len(self._items)
+                self._items.clear()
+            else:
+                stale = [k for k, entry in self._items.items() if entry[5] & set(tags)]
+                for k in stale:
+                    del self._items[k]
+                dropped = len(stale)
+            self.invalidations += dropped
+            return dropped
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': RESPONSE_CACHE_ENABLED,
+                'size': len(self._items),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'invalidations': self.invalidations,
+            }
+
+
+_cache = ResponseCache(RESPONSE_CACHE_SIZE)
+
+
+def _etag_matches(etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    candidates = [c.strip() for c in header.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+def _send(etag, body, status, mimetype, max_age):
+    if _etag_matches(etag):
+        with _cache._lock:
+            _cache.not_modified += 1
+        response = make_response('', 304)
+    else:
+        response = make_response(body, status)
+        response.mimetype = mimetype
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = f'private, max-age={int(max_age)}, must-revalidate'
+    response.headers['Vary'] = 'Authorization'
+    return response
+
+
+def cached_response(ttl=None, tags=(), user=None, max_age=None, version=None):
+    """Cache a GET view's successful JSON response.
+
+    ttl: seconds to keep the response (default RESPONSE_CACHE_TTL).
+    tags: names passed to invalidate() by routes that change the data.
+    user: callable(request) -> user id; when given the cache is per user and
+        requests it cannot resolve go straight to the view (which returns 401).
+    max_age: browser max-age (default ttl); 0 makes clients revalidate every
+        time, for data that must reflect writes immediately.
+    version: callable() -> value that is part of the key, so responses cached
+        before the value changed (e.g. a write in another worker) are not served.
+    """
+    ttl = RESPONSE_CACHE_TTL if ttl is None else ttl
+    max_age = ttl if max_age is None else max_age
+    tag_set = frozenset(tags)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not RESPONSE_CACHE_ENABLED or request.method != 'GET':
+                return view(*args, **kwargs)
+
+            user_id = None
+            if user is not None:
+                user_id = user(request)
+                if not user_id:
+                    return view(*args, **kwargs)
+
+            key = (request.endpoint, tuple(sorted(request.args.items(multi=True))), user_id,
+                   version() if version is not None else None)
+            entry = _cache.get(key)
+            if entry is not None:
+                _, etag, body, status, mimetype, _ = entry
+                return _send(etag, body, status, mimetype, max_age)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or not response.is_json:
+                return response
+
+            body = response.get_data()
+            etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+            _cache.put(key, (time.time() + ttl, etag, body, response.status_code, response.mimetype, tag_set))
+            return _send(etag, body, response.status_code, response.mimetype, max_age)
+
+        return wrapper
+
+    return decorator
+
+
+def invalidate(*tags):
+    """Drop cached responses for the given tags."""
+    return _cache.invalidate(*tags)
+
+
+def get_cache_stats():
+    return _cache.stats()
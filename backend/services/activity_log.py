@@ -0,0 +1,259 @@
+"""
+Buffered activity-log writer.
+
+POST /api/activity-logs puts entries on a bounded in-process queue and
+returns at once. One background thread writes them to activity_logs in
+multi-row inserts: as soon as ACTIVITY_LOG_BATCH entries are waiting, or
+ACTIVITY_LOG_FLUSH_INTERVAL seconds after the first one arrived. When the
+queue is full record() refuses the entry instead of blocking the request.
+
+Batches that cannot be written are appended to ACTIVITY_LOG_SPOOL (JSON
+lines) when it is set and replayed once the database answers again;
+without a spool they are retried and then dropped with an error logged.
+All workers share the spool: appends and the hand-over to a replay take a
+file lock, and only one worker replays at a time (flock, where available).
+Whatever is queued at interpreter exit is flushed before the process ends.
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: one process, nothing to lock against
+    fcntl = None
+
+from supabase_client import get_admin_client, mark_admin_client_failed
+from response_cache import invalidate
+
+ACTIVITY_LOG_QUEUE_SIZE = int(os.getenv('ACTIVITY_LOG_QUEUE_SIZE', 10000))
+ACTIVITY_LOG_BATCH = int(os.getenv('ACTIVITY_LOG_BATCH', 200))
+ACTIVITY_LOG_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_LOG_FLUSH_INTERVAL', 2))
+ACTIVITY_LOG_SPOOL = os.getenv('ACTIVITY_LOG_SPOOL')
+# Seconds the exit handler waits for the last batches to be written
+ACTIVITY_LOG_DRAIN_TIMEOUT = 10
+# Attempts per batch before it is spooled (or dropped)
+WRITE_ATTEMPTS = 3
+# Seconds between attempts to replay the spool while the database is down
+SPOOL_RETRY_INTERVAL = 30
+MAX_ACTION_LENGTH = 1000
+
+_queue = queue.Queue(maxsize=ACTIVITY_LOG_QUEUE_SIZE)
+_stopping = threading.Event()
+_worker = None
+_worker_pid = None
+_worker_lock = threading.Lock()
+_next_replay = 0.0
+stats = {'queued': 0, 'rejected': 0, 'written': 0, 'batches': 0, 'failed_batches': 0,
+         'spooled': 0, 'replayed': 0, 'dropped': 0}
+
+
+def record(user_uuid, action):
+    """Queue one entry; returns False when the queue is full (back-pressure)."""
+    entry = {
+        'user_uuid': user_uuid,
+        'action': action,
+        # Stamped now so entries keep their order and time however late they are written
+        'created_at': datetime.now(timezone.utc).isoformat(),
+    }
+    _ensure_worker()
+    try:
+        _queue.put_nowait(entry)
+    except queue.Full:
+        stats['rejected'] += 1
+        return False
+    stats['queued'] += 1
+    return True
+
+
+def _ensure_worker():
+    """Start the writer thread, again in a forked worker whose parent already had one."""
+    global _worker, _worker_pid
+    if _worker is not None and _worker_pid == os.getpid() and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is not None and _worker_pid == os.getpid() and _worker.is_alive():
+            return
+        _worker = threading.Thread(target=_run, name='activity-log-writer', daemon=True)
+        _worker_pid = os.getpid()
+        _worker.start()
+
+
+def _take_batch():
+    """Block for the first entry, then collect until the batch is full or the interval ends."""
+    try:
+        batch = [_queue.get(timeout=0.1 if _stopping.is_set() else ACTIVITY_LOG_FLUSH_INTERVAL)]
+    except queue.Empty:
+        return []
+    deadline = time.monotonic() + (0 if _stopping.is_set() else ACTIVITY_LOG_FLUSH_INTERVAL)
+    while len(batch) < ACTIVITY_LOG_BATCH:
+        try:
+            batch.append(_queue.get(timeout=max(0, deadline - time.monotonic())))
+        except queue.Empty:
+            break
+    return batch
+
+
+def _insert(rows):
+    client = get_admin_client()
+    if not client:
+        raise RuntimeError('Supabase client unavailable')
+    try:
+        client.table('activity_logs').insert(rows).execute()
+    except Exception:
+        mark_admin_client_failed()
+        raise
+
+
+def _write(batch):
+    """Insert a batch, retrying briefly; returns True once it is stored."""
+    for attempt in range(WRITE_ATTEMPTS):
+        try:
+            _insert(batch)
+            stats['written'] += len(batch)
+            stats['batches'] += 1
+            invalidate('activity_logs')
+            return True
+        except Exception:
+            if attempt == WRITE_ATTEMPTS - 1 or _stopping.is_set():
+                logging.exception('Activity log batch write failed')
+                break
+            time.sleep(0.5 * 2 ** attempt)
+    stats['failed_batches'] += 1
+    if _spool(batch):
+        return False
+    stats['dropped'] += len(batch)
+    return False
+
+
+# ============= SPOOL =============
+
+@contextmanager
+def _file_lock(path, wait=True):
+    """Hold an exclusive lock shared by all workers; yields False if busy and not waiting."""
+    if fcntl is None:
+        yield True
+        return
+    with open(path, 'a') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _spool(batch):
+    if not ACTIVITY_LOG_SPOOL:
+        return False
+    try:
+        # The lock keeps a replay from renaming the file between our open and write
+        with _file_lock(f'{ACTIVITY_LOG_SPOOL}.lock'), open(ACTIVITY_LOG_SPOOL, 'a', encoding='utf-8') as f:
+            for entry in batch:
+                f.write(json.dumps(entry) + '\n')
+    except OSError:
+        logging.exception('Activity log spool write failed')
+        return False
+    stats['spooled'] += len(batch)
+    return True
+
+
+def _replay_spool():
+    """Write spooled entries back to the database; the file is kept until all of them land.
+
+    Only one worker replays at a time; the others skip until the next attempt.
+    """
+    global _next_replay
+    if not ACTIVITY_LOG_SPOOL or time.monotonic() < _next_replay:
+        return
+    replaying = f'{ACTIVITY_LOG_SPOOL}.replay'
+    if not os.path.exists(ACTIVITY_LOG_SPOOL) and not os.path.exists(replaying):
+        return
+    try:
+        with _file_lock(f'{replaying}.lock', wait=False) as acquired:
+            if acquired:
+                _replay(replaying)
+    except OSError:
+        logging.exception('Activity log spool lock failed')
+
+
+def _replay(replaying):
+    global _next_replay
+    try:
+        if not os.path.exists(replaying):
+            with _file_lock(f'{ACTIVITY_LOG_SPOOL}.lock'):
+                if not os.path.exists(ACTIVITY_LOG_SPOOL):
+                    return
+                os.replace(ACTIVITY_LOG_SPOOL, replaying)
+        with open(replaying, encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+    except (OSError, ValueError):
+        logging.exception('Activity log spool read failed')
+        return
+
+    for i in range(0, len(entries), ACTIVITY_LOG_BATCH):
+        batch = entries[i:i + ACTIVITY_LOG_BATCH]
+        try:
+            _insert(batch)
+        except Exception:
+            # Keep the rest for the next attempt; the written part is not repeated
+            rest = entries[i:]
+            with open(replaying, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(entry) + '\n' for entry in rest)
+            _next_replay = time.monotonic() + SPOOL_RETRY_INTERVAL
+            return
+        stats['replayed'] += len(batch)
+    os.remove(replaying)
+    invalidate('activity_logs')
+
+
+# ============= WORKER =============
+
+def _run():
+    global _next_replay
+    while not (_stopping.is_set() and _queue.empty()):
+        batch = _take_batch()
+        if not batch:
+            if not _stopping.is_set():
+                _replay_spool()
+            continue
+        if _write(batch) and not _stopping.is_set():
+            # The database is answering again; replay without waiting out the retry interval
+            _next_replay = 0.0
+            _replay_spool()
+
+
+def drain(timeout=ACTIVITY_LOG_DRAIN_TIMEOUT):
+    """Write out what is queued and stop the writer (runs at exit)."""
+    _stopping.set()
+    worker = _worker
+    if worker is not None and _worker_pid == os.getpid() and worker.is_alive():
+        worker.join(timeout)
+    leftover = []
+    while True:
+        try:
+            leftover.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    if leftover:
+        # The writer did not get to these in time; spool rather than lose them
+        if not _spool(leftover):
+            stats['dropped'] += len(leftover)
+            logging.error(f'{len(leftover)} activity log entries dropped at shutdown')
+
+
+atexit.register(drain)
+
+
+def get_stats():
+    return {**stats, 'pending': _queue.qsize(), 'spool': bool(ACTIVITY_LOG_SPOOL)}
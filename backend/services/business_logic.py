@@ -3,17 +3,72 @@ Business logic layer for the Medicare Clinic application.
 Add your core business logic functions here.
 """
 
+from datetime import datetime
+
 from database.db_repo import get_client
 
 
-# Example business logic function
+def _text(value, default=''):
+    if value is None:
+        return default
+    text = str(value).strip()
+    return text or default
+
+
+def _age(year_of_birth, visit_date):
+    try:
+        year = int(str(visit_date)[:4]) if visit_date else datetime.now().year
+        return str(year - int(year_of_birth))
+    except (TypeError, ValueError):
+        return ''
+
+
 def process_prescription_data(prescription_data: dict):
     """
-    Process and validate prescription data.
-    Add your business logic here.
+    Process and validate prescription data for printing.
+
+    Takes the raw rows {'prescription', 'visit', 'patient', 'medicines',
+    'instructions'} and returns the flat document the prescription PDF is
+    rendered from, with the same defaults the printed page uses.
     """
-    # TODO: Implement prescription processing logic
-    pass
+    prescription = prescription_data.get('prescription') or {}
+    visit = prescription_data.get('visit') or {}
+    patient = prescription_data.get('patient') or {}
+    if not prescription.get('prescription_id'):
+        raise ValueError('prescription_id is required')
+
+    gender = 'Male' if patient.get('sex') == 'M' else 'Female'
+    name = _text(patient.get('name') or visit.get('fullname'))
+    visit_date = _text(visit.get('date'))[:10]
+
+    medicines = []
+    for med in sorted(prescription_data.get('medicines') or [], key=lambda m: m.get('medicine_id') or 0):
+        medicines.append({
+            'name': _text(med.get('medicine_name')),
+            'quantity': _text(med.get('quantity'), 'N/A'),
+            'time': _text(med.get('time')),
+            'areasite': _text(med.get('areasite')),
+            'duration': _text(med.get('duration')),
+        })
+
+    return {
+        'prescription_id': prescription.get('prescription_id'),
+        'visit_id': prescription.get('visit_id'),
+        'patient_id': _text(visit.get('patient_id') or patient.get('patient_id'), 'N/A'),
+        'patient_name': f"{'Mr. ' if gender == 'Male' else 'Ms. '}{name}" if name else 'N/A',
+        'file_name': name or 'Patient',
+        'date': visit_date or 'N/A',
+        'age': _age(patient.get('year_of_birth'), visit_date),
+        'gender': gender if patient else 'N/A',
+        'blood_pressure': _text(visit.get('blood_pressure')),
+        'pulse': _text(visit.get('pulse')),
+        'weight': _text(visit.get('weight')),
+        'symptoms': _text(prescription.get('symptoms'), 'No findings and symptoms recorded'),
+        'diagnosis': _text(prescription.get('diagnosis'), 'No diagnosis recorded'),
+        'procedures': _text(prescription.get('procedures'), 'No procedures recorded'),
+        'medicines': medicines,
+        'instructions': _text(prescription_data.get('instructions')),
+    }
 
 
 # Add more business logic functions here
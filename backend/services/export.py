@@ -0,0 +1,403 @@
+"""
+Streaming exports of visits, medicines and prescriptions by date range.
+
+An export reads its table a page at a time (db_repo.iter_pages) and encodes
+each page as soon as it arrives. The response then sends those bytes as a
+chunked body, so memory stays at about two pages whatever the range. The
+next page is read while the current one is encoded and sent.
+
+Formats:
+- csv
+- ndjson: one JSON object per line; prescriptions carry a nested
+  `medicines` list
+- xlsx: a workbook written row by row into a streamed zip, starting a new
+  sheet every XLSX_MAX_ROWS rows
+
+csv and ndjson can be gzipped. Flat formats give one row per prescription
+medicine, repeating the prescription's columns.
+
+An export holds one pooled Supabase client until it finishes. If a read
+fails mid-stream, the body is cut off before its final chunk, so clients
+see a failed download, never a short file that looks complete.
+"""
+
+import io
+import os
+import re
+import csv
+import json
+import zlib
+import logging
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+
+import async_supabase
+from database import db_repo
+from supabase_client import get_client_pool
+
+EXPORT_PAGE_SIZE = int(os.getenv('EXPORT_PAGE_SIZE', 1000))
+EXPORT_GZIP_LEVEL = int(os.getenv('EXPORT_GZIP_LEVEL', 6))
+# Rows per worksheet, Excel's limit less the header row
+XLSX_MAX_ROWS = 1048575
+
+VISIT_COLUMNS = (
+    'visit_id', 'patient_id', 'date', 'fullname', 'hometown', 'age', 'phoneno', 'sex',
+    'consultation_type', 'consultation_fee', 'drug_fee', 'Procedure_Fee', 'extra_procedures',
+    'new_old', 'paymentmethod', 'referral', 'weight', 'blood_pressure', 'pulse',
+)
+MEDICINE_COLUMNS = ('med_id', 'patient_id', 'patient_name', 'date', 'drug_fee', 'payment_method')
+PRESCRIPTION_COLUMNS = ('prescription_id', 'visit_id', 'date', 'patient_id', 'fullname',
+                        'symptoms', 'findings', 'diagnosis', 'procedures')
+PRESCRIPTION_MEDICINE_COLUMNS = ('medicine_name', 'quantity', 'time', 'areasite', 'duration')
+
+TABLES = ('visits', 'medicines', 'prescriptions')
+
+# format -> (mimetype, file extension)
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+# Strings a spreadsheet would run as a formula; phone numbers like +91 98480 22338 are left alone
+_FORMULA = re.compile(r'[=+\-@\t\r]')
+_NUMBER_LIKE = re.compile(r'[+\-]?[\d\s().\-]+')
+# Characters XML 1.0 does not allow
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def _date_filters(date_from, date_to):
+    filters = []
+    if date_from:
+        filters.append(('gte', 'date', date_from))
+    if date_to:
+        filters.append(('lte', 'date', date_to))
+    return filters
+
+
+# ============= ROW SOURCES =============
+
+def _table_pages(table, columns, date_from, date_to, client):
+    yield from db_repo.iter_pages(table, ', '.join(columns), _date_filters(date_from, date_to),
+                                  page_size=EXPORT_PAGE_SIZE, client=client)
+
+
+def _fetch_in(table, column, values, columns, client):
+    """db_repo.fetch_in with its IN_CHUNK-sized reads issued side by side."""
+    chunks = [values[i:i + db_repo.IN_CHUNK] for i in range(0, len(values), db_repo.IN_CHUNK)]
+    reads = [lambda chunk=chunk: db_repo.fetch_in(table, column, chunk, columns, client=client) for chunk in chunks]
+    return [row for rows in async_supabase.in_parallel(*reads) for row in rows]
+
+
+def _prescription_pages(date_from, date_to, client, with_medicines):
+    """Prescriptions of the visits in range, one page of visits at a time."""
+    visit_columns = 'visit_id, date, patient_id, fullname'
+    for visits in db_repo.iter_pages('visits', visit_columns, _date_filters(date_from, date_to),
+                                     page_size=EXPORT_PAGE_SIZE, client=client):
+        by_visit = {v['visit_id']: v for v in visits}
+        prescriptions = _fetch_in('prescriptions', 'visit_id', list(by_visit),
+                                  'prescription_id, visit_id, symptoms, findings, diagnosis, procedures', client)
+        medicines = {}
+        if with_medicines and prescriptions:
+            rows = _fetch_in('prescription_medicines', 'prescription_id',
+                             [p['prescription_id'] for p in prescriptions],
+                             'prescription_id, ' + ', '.join(PRESCRIPTION_MEDICINE_COLUMNS), client)
+            for row in rows:
+                medicines.setdefault(row.pop('prescription_id'), []).append(row)
+        page = []
+        for p in prescriptions:
+            visit = by_visit[p['visit_id']]
+            record = {column: p.get(column, visit.get(column)) for column in PRESCRIPTION_COLUMNS}
+            if with_medicines:
+                record['medicines'] = medicines.get(p['prescription_id'], [])
+            page.append(record)
+        if page:
+            yield page
+
+
+def _read_ahead(pages):
+    """Iterate pages while the next one is read on another thread."""
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='export-read') as executor:
+        future = executor.submit(next, pages, None)
+        while True:
+            page = future.result()
+            if page is None:
+                return
+            future = executor.submit(next, pages, None)
+            yield page
+
+
+# ============= ENCODERS =============
+
+def _flat(records, columns, nested):
+    """Rows as value lists; a record with nested medicines gives one row per medicine."""
+    for record in records:
+        values = [record.get(column) for column in columns]
+        if nested is None:
+            yield values
+            continue
+        children = record.get('medicines') or [{}]
+        for child in children:
+            yield values + [child.get(column) for column in nested]
+
+
+def _csv_value(value):
+    if isinstance(value, str) and value and _FORMULA.match(value) and not _NUMBER_LIKE.fullmatch(value):
+        return "'" + value
+    return value
+
+
+class _CsvEncoder:
+    def __init__(self, columns, nested):
+        self.columns, self.nested = columns, nested
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def _take(self):
+        data = self._buffer.getvalue().encode('utf-8')
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def begin(self):
+        self._writer.writerow(self.columns + (self.nested or ()))
+        return self._take()
+
+    def page(self, records):
+        self._writer.writerows([_csv_value(v) for v in row] for row in _flat(records, self.columns, self.nested))
+        return self._take()
+
+    def end(self):
+        return b''
+
+
+class _NdjsonEncoder:
+    def __init__(self, columns, nested):
+        pass
+
+    def begin(self):
+        return b''
+
+    def page(self, records):
+        return ''.join(json.dumps(record, default=str) + '\n' for record in records).encode('utf-8')
+
+    def end(self):
+        return b''
+
+
+class _Drain:
+    """Write-only file the zip is written to; take() hands over what has been written."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+class _XlsxEncoder:
+    """Minimal SpreadsheetML writer: inline strings, numbers, no styles."""
+
+    def __init__(self, columns, nested):
+        self.columns, self.nested = columns, nested
+        self.header = columns + (nested or ())
+        self._letters = [_column_letter(i) for i in range(len(self.header))]
+        self._out = _Drain()
+        self._zip = zipfile.ZipFile(self._out, 'w', zipfile.ZIP_DEFLATED)
+        self._sheet = None
+        self._sheets = 0
+        self._row = 0
+
+    def _cells(self, values, row):
+        cells = []
+        for letter, value in zip(self._letters, values):
+            if value is None or value == '':
+                continue
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                cells.append(f'<c r="{letter}{row}"><v>{value}</v></c>')
+            else:
+                text = escape(_XML_ILLEGAL.sub('', str(value)))
+                cells.append(f'<c r="{letter}{row}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+        return f'<row r="{row}">{"".join(cells)}</row>'
+
+    def _close_sheet(self):
+        if self._sheet is not None:
+            self._sheet.write(b'</sheetData></worksheet>')
+            self._sheet.close()
+            self._sheet = None
+
+    def _open_sheet(self):
+        self._close_sheet()
+        self._sheets += 1
+        # force_zip64: the size of a streamed entry is not known up front
+        self._sheet = self._zip.open(f'xl/worksheets/sheet{self._sheets}.xml', 'w', force_zip64=True)
+        self._sheet.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            b'<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" state="frozen"/>'
+            b'</sheetView></sheetViews><sheetData>')
+        self._sheet.write(self._cells(self.header, 1).encode('utf-8'))
+        self._row = 1
+
+    def begin(self):
+        self._open_sheet()
+        return self._out.take()
+
+    def page(self, records):
+        rows = []
+        for values in _flat(records, self.columns, self.nested):
+            if self._row > XLSX_MAX_ROWS:
+                self._sheet.write(''.join(rows).encode('utf-8'))
+                rows = []
+                self._open_sheet()
+            self._row += 1
+            rows.append(self._cells(values, self._row))
+        self._sheet.write(''.join(rows).encode('utf-8'))
+        return self._out.take()
+
+    def end(self):
+        self._close_sheet()
+        sheets = range(1, self._sheets + 1)
+        self._zip.writestr('[Content_Types].xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + ''.join(f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                      'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                      for i in sheets)
+            + '</Types>'))
+        self._zip.writestr('_rels/.rels', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="xl/workbook.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+            '</Relationships>'))
+        self._zip.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + ''.join(f'<sheet name="Sheet{i}" sheetId="{i}" r:id="rId{i}"/>' for i in sheets)
+            + '</sheets></workbook>'))
+        self._zip.writestr('xl/_rels/workbook.xml.rels', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + ''.join(f'<Relationship Id="rId{i}" Target="worksheets/sheet{i}.xml" '
+                      'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+                      for i in sheets)
+            + '</Relationships>'))
+        self._zip.close()
+        return self._out.take()
+
+
+ENCODERS = {'csv': _CsvEncoder, 'ndjson': _NdjsonEncoder, 'xlsx': _XlsxEncoder}
+
+
+# ============= EXPORT =============
+
+class Export:
+    """Response body for one export: iterate it for the encoded chunks.
+
+    The pooled client is taken when the export is created, so an exhausted
+    pool is reported before any byte is sent. It is given back when
+    iteration ends or the server closes the body (client gone).
+    """
+
+    def __init__(self, table, output, date_from=None, date_to=None, gzip=False, with_medicines=True):
+        if table not in TABLES:
+            raise ValueError(f"table must be one of: {', '.join(TABLES)}")
+        if output not in FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+        self.table, self.output = table, output
+        self.date_from, self.date_to = date_from, date_to
+        # xlsx is a zip already
+        self.gzip = gzip and output != 'xlsx'
+        self.with_medicines = with_medicines
+        self._pool = get_client_pool()
+        self._client = self._pool.acquire() if self._pool else None
+        self._failed = False
+        self._iterator = None
+        if self._pool is not None and self._client is None:
+            raise RuntimeError('Supabase client pool exhausted')
+
+    @property
+    def mimetype(self):
+        return 'application/gzip' if self.gzip else FORMATS[self.output][0]
+
+    @property
+    def file_name(self):
+        span = f"{(self.date_from or 'start').replace('-', '')}_{(self.date_to or 'end').replace('-', '')}"
+        return f"{self.table}_{span}.{FORMATS[self.output][1]}" + ('.gz' if self.gzip else '')
+
+    def _source(self):
+        if self.table == 'visits':
+            return VISIT_COLUMNS, None, _table_pages('visits', VISIT_COLUMNS, self.date_from, self.date_to, self._client)
+        if self.table == 'medicines':
+            return (MEDICINE_COLUMNS, None,
+                    _table_pages('medicines', MEDICINE_COLUMNS, self.date_from, self.date_to, self._client))
+        nested = PRESCRIPTION_MEDICINE_COLUMNS if self.with_medicines else None
+        return (PRESCRIPTION_COLUMNS, nested,
+                _prescription_pages(self.date_from, self.date_to, self._client, self.with_medicines))
+
+    def _chunks(self):
+        columns, nested, pages = self._source()
+        encoder = ENCODERS[self.output](columns, nested)
+        yield encoder.begin()
+        for records in _read_ahead(pages):
+            yield encoder.page(records)
+        yield encoder.end()
+
+    def __iter__(self):
+        self._iterator = self._stream()
+        return self._iterator
+
+    def _stream(self):
+        try:
+            # wbits=31: gzip container rather than a raw zlib stream
+            compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if self.gzip else None
+            for chunk in self._chunks():
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+                if chunk:
+                    yield chunk
+            if compressor is not None:
+                yield compressor.flush()
+        except Exception:
+            self._failed = True
+            logging.exception('Export of %s failed mid-stream', self.table)
+            raise
+        finally:
+            self._release()
+
+    def close(self):
+        """Called by the server when the response ends, also when the client disconnects."""
+        if self._iterator is not None:
+            # Stops the read-ahead before the client goes back to the pool
+            self._iterator.close()
+        self._release()
+
+    def _release(self):
+        client, self._client = self._client, None
+        if client is not None:
+            self._pool.release(client, failed=self._failed)
@@ -0,0 +1,311 @@
+"""
+Persisted per-month financial rollup.
+
+monthly_financial_rollup (see create_financial_rollup.sql) holds one row of
+totals per month. It is built once with a backfill and then kept current by
+an incremental refresh that only looks at visits/medicines rows whose
+updated_at is past the stored high-water mark, plus the months that triggers
+marked in financial_rollup_dirty_months because a row was deleted or its
+date moved out of them, recomputing just those months.
+/api/financials/monthly-stats reads the rollup only.
+
+Run from the backend folder:
+    python -m services.financial_rollup --backfill
+    python -m services.financial_rollup --incremental
+"""
+
+import os
+import sys
+import logging
+import calendar
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+if __name__ == '__main__':
+    # Credentials must be in the environment before supabase_client is imported
+    from dotenv import load_dotenv
+    load_dotenv()
+
+import async_supabase
+from database import db_repo
+from database.db_repo import get_client
+from services import financial_aggregation
+
+ROLLUP_TABLE = 'monthly_financial_rollup'
+STATE_TABLE = 'financial_rollup_state'
+STATE_NAME = 'monthly_financial_rollup'
+DIRTY_TABLE = 'financial_rollup_dirty_months'
+
+VISIT_COLUMNS = 'date, consultation_fee, drug_fee, Procedure_Fee, new_old, referral'
+MEDICINE_COLUMNS = 'date, drug_fee'
+
+# Re-read a little before the high-water mark so late commits are not missed
+HWM_OVERLAP = timedelta(minutes=5)
+REFRESH_INTERVAL = float(os.getenv('ROLLUP_REFRESH_INTERVAL', 60))
+
+_refresh_lock = threading.Lock()
+_last_refresh = 0.0
+
+
+def month_key(date_str):
+    """Return 'YYYY-MM' for a date or ISO timestamp string, or None."""
+    if not date_str:
+        return None
+    try:
+        if 'T' in date_str:
+            date_obj = datetime.fromisoformat(date_str.replace('Z', '').replace('+00:00', ''))
+        else:
+            date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+    return f"{date_obj.year}-{date_obj.month:02d}"
+
+
+def empty_month(key):
+    return {
+        'month': key,
+        'totalVisits': 0,
+        'drugVisits': 0,
+        'totalRevenue': 0,
+        'newPatients': 0,
+        'googleReferrals': 0,
+    }
+
+
+def format_monthly_stats(monthly_map):
+    """Return the API list: avgDailyRevenue added, empty months dropped, newest first."""
+    result = []
+    for key, stats in monthly_map.items():
+        if not stats['totalVisits'] and not stats['drugVisits']:
+            continue
+        year, month = map(int, key.split('-'))
+        days_in_month = calendar.monthrange(year, month)[1]
+        stats = dict(stats)
+        stats['avgDailyRevenue'] = stats['totalRevenue'] / days_in_month
+        result.append(stats)
+    result.sort(key=lambda x: x['month'], reverse=True)
+    return result
+
+
+def _parse_timestamp(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _month_bounds(key):
+    year, month = map(int, key.split('-'))
+    start = f"{year}-{month:02d}-01"
+    end = f"{year + 1}-01-01" if month == 12 else f"{year}-{month + 1:02d}-01"
+    return start, end
+
+
+def _merge_months(into, other):
+    for key, stats in other.items():
+        target = into.setdefault(key, empty_month(key))
+        for field in ('totalVisits', 'drugVisits', 'totalRevenue', 'newPatients', 'googleReferrals'):
+            target[field] += stats[field]
+    return into
+
+
+def _aggregate_visits(client, filters):
+    months = {}
+    for page in db_repo.iter_pages('visits', VISIT_COLUMNS, filters, client=client):
+        _merge_months(months, financial_aggregation.aggregate_monthly(page, []))
+    return months
+
+
+def _aggregate_medicines(client, filters):
+    months = {}
+    for page in db_repo.iter_pages('medicines', MEDICINE_COLUMNS, filters, client=client):
+        _merge_months(months, financial_aggregation.aggregate_monthly([], page))
+    return months
+
+
+def _aggregate_stream(client, filters=None, monthly_map=None):
+    """Aggregate visits and medicines one page at a time (bounded memory), both tables at once."""
+    monthly_map = {} if monthly_map is None else monthly_map
+    for months in async_supabase.in_parallel(lambda: _aggregate_visits(client, filters),
+                                             lambda: _aggregate_medicines(client, filters)):
+        _merge_months(monthly_map, months)
+    return monthly_map
+
+
+def compute_months(client, months=None):
+    """Aggregate from the source tables, for all history or only the given months."""
+    if months is None:
+        return _aggregate_stream(client)
+
+    monthly_map = {key: empty_month(key) for key in months}
+    for key in months:
+        start, end = _month_bounds(key)
+        _aggregate_stream(client, (('gte', 'date', start), ('lt', 'date', end)), monthly_map)
+    return monthly_map
+
+
+def _to_row(stats, refreshed_at):
+    return {
+        'month': stats['month'],
+        'total_visits': stats['totalVisits'],
+        'drug_visits': stats['drugVisits'],
+        'total_revenue': round(stats['totalRevenue'], 2),
+        'new_patients': stats['newPatients'],
+        'google_referrals': stats['googleReferrals'],
+        'refreshed_at': refreshed_at,
+    }
+
+
+def _from_row(row):
+    return {
+        'month': row['month'],
+        'totalVisits': row.get('total_visits') or 0,
+        'drugVisits': row.get('drug_visits') or 0,
+        'totalRevenue': float(row.get('total_revenue') or 0),
+        'newPatients': row.get('new_patients') or 0,
+        'googleReferrals': row.get('google_referrals') or 0,
+    }
+
+
+def _write_months(client, monthly_map):
+    if not monthly_map:
+        return
+    refreshed_at = datetime.now(timezone.utc).isoformat()
+    rows = [_to_row(stats, refreshed_at) for stats in monthly_map.values()]
+    client.table(ROLLUP_TABLE).upsert(rows, on_conflict='month').execute()
+
+
+def _get_high_water_mark(client):
+    res = client.table(STATE_TABLE).select('high_water_mark').eq('name', STATE_NAME).limit(1).execute()
+    rows = res.data if hasattr(res, 'data') else []
+    return rows[0].get('high_water_mark') if rows else None
+
+
+def _set_high_water_mark(client, hwm):
+    client.table(STATE_TABLE).upsert({
+        'name': STATE_NAME,
+        'high_water_mark': hwm,
+        'refreshed_at': datetime.now(timezone.utc).isoformat(),
+    }, on_conflict='name').execute()
+
+
+def _latest_updated_at(client, table):
+    res = client.table(table).select('updated_at').order('updated_at', desc=True, nullsfirst=False).limit(1).execute()
+    rows = res.data if hasattr(res, 'data') else []
+    return rows[0].get('updated_at') if rows else None
+
+
+def _get_dirty_months(client):
+    """{month: marked_at} of months that lost rows, or {} when the table is missing."""
+    try:
+        res = client.table(DIRTY_TABLE).select('month, marked_at').execute()
+    except Exception:
+        logging.warning('%s unavailable; deletes in past months wait for a backfill', DIRTY_TABLE,
+                        exc_info=True)
+        return {}
+    rows = res.data if hasattr(res, 'data') else []
+    return {row['month']: row['marked_at'] for row in rows if row.get('month')}
+
+
+def _clear_dirty_months(client, dirty):
+    """Forget months once recomputed, unless they were marked again meanwhile."""
+    for month, marked_at in dirty.items():
+        client.table(DIRTY_TABLE).delete().eq('month', month).lte('marked_at', marked_at).execute()
+
+
+def backfill(client=None):
+    """Rebuild every month from scratch and reset the high-water mark."""
+    client = client or get_client()
+    if not client:
+        raise RuntimeError('Supabase client unavailable')
+
+    # Take the mark first so rows written during the backfill are picked up next time
+    marks = [m for m in (_latest_updated_at(client, 'visits'), _latest_updated_at(client, 'medicines')) if m]
+    hwm = max(marks, key=_parse_timestamp) if marks else None
+    dirty = _get_dirty_months(client)
+    monthly_map = compute_months(client)
+    # Months with no rows left are not in the scan; zero them rather than keep stale totals
+    for key in dirty:
+        monthly_map.setdefault(key, empty_month(key))
+    _write_months(client, monthly_map)
+    _set_high_water_mark(client, hwm)
+    _clear_dirty_months(client, dirty)
+    logging.info('Financial rollup backfill wrote %d months', len(monthly_map))
+    return len(monthly_map)
+
+
+def refresh_incremental(client=None):
+    """Recompute only the months touched by rows changed since the high-water mark.
+
+    Months a row was deleted from or moved out of are recomputed too, from
+    financial_rollup_dirty_months. Without that table only the current month,
+    which is always recomputed, reflects deletes until the next backfill.
+    """
+    client = client or get_client()
+    if not client:
+        raise RuntimeError('Supabase client unavailable')
+
+    hwm = _get_high_water_mark(client)
+    if hwm is None:
+        return backfill(client)
+
+    new_hwm = _parse_timestamp(hwm)
+    since = (new_hwm - HWM_OVERLAP).isoformat()
+    dirty = _get_dirty_months(client)
+    months = {datetime.now().strftime('%Y-%m')} | set(dirty)
+    for table in ('visits', 'medicines'):
+        changed = db_repo.iter_records(table, 'date, updated_at', (('gt', 'updated_at', since),), client=client)
+        for row in changed:
+            key = month_key(row.get('date'))
+            if key:
+                months.add(key)
+            if row.get('updated_at'):
+                new_hwm = max(new_hwm, _parse_timestamp(row['updated_at']))
+
+    _write_months(client, compute_months(client, sorted(months)))
+    _set_high_water_mark(client, new_hwm.isoformat())
+    _clear_dirty_months(client, dirty)
+    return len(months)
+
+
+def read_monthly_stats(client=None):
+    """Return monthly stats from the rollup table, or None if it has not been built."""
+    client = client or get_client()
+    if not client:
+        return None
+    try:
+        res = client.table(ROLLUP_TABLE).select(
+            'month, total_visits, drug_visits, total_revenue, new_patients, google_referrals'
+        ).execute()
+    except Exception:
+        logging.warning('Financial rollup table unavailable', exc_info=True)
+        return None
+    rows = res.data if hasattr(res, 'data') else []
+    if not rows:
+        return None
+    return format_monthly_stats({row['month']: _from_row(row) for row in rows})
+
+
+def refresh_if_stale():
+    """Start an incremental refresh in the background if the last one is old enough."""
+    global _last_refresh
+    now = time.monotonic()
+    if now - _last_refresh < REFRESH_INTERVAL or not _refresh_lock.acquire(blocking=False):
+        return
+    _last_refresh = now
+
+    def run():
+        try:
+            refresh_incremental()
+        except Exception:
+            logging.exception('Financial rollup incremental refresh failed')
+        finally:
+            _refresh_lock.release()
+
+    threading.Thread(target=run, name='financial-rollup-refresh', daemon=True).start()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if '--backfill' in sys.argv:
+        print(f"Backfilled {backfill()} months")
+    else:
+        print(f"Refreshed {refresh_incremental()} months")
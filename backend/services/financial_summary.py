@@ -0,0 +1,97 @@
+"""
+Server-side financial summary for the Financials page.
+
+Streams visits and medicines for a date range page by page, aggregates
+each page with the NumPy engine and merges the per-period totals, so the
+response is one small document no matter how much history is scanned.
+With DATA_BACKEND=sql the per-period totals come from a GROUP BY query
+instead (database/sql.py) and no rows leave the database.
+"""
+
+import async_supabase
+from database import db_repo, sql_enabled
+from services import financial_aggregation
+
+VISIT_COLUMNS = 'date, consultation_fee, drug_fee, Procedure_Fee, paymentmethod, new_old, referral'
+MEDICINE_COLUMNS = 'date, drug_fee, payment_method'
+
+# The Financials page counts both spellings as a new patient
+NEW_PATIENT_CODES = ('N', 'NEW')
+
+SUM_FIELDS = (
+    'totalVisits', 'drugVisits', 'consultationFees', 'drugFees', 'procedureFees',
+    'totalRevenue', 'cashPayments', 'cardPayments', 'gpayPayments', 'newPatients',
+    'googleReferrals',
+)
+
+
+def _merge(into, periods):
+    for key, stats in periods.items():
+        target = into.get(key)
+        if target is None:
+            into[key] = dict(stats)
+            continue
+        for field in SUM_FIELDS:
+            target[field] += stats[field]
+    return into
+
+
+def _date_filters(date_from, date_to):
+    filters = []
+    if date_from:
+        filters.append(('gte', 'date', date_from))
+    if date_to:
+        filters.append(('lte', 'date', date_to))
+    return filters
+
+
+def _visit_periods(client, granularity, filters):
+    empty_medicines = financial_aggregation.medicine_columns([])
+    periods = {}
+    for page in db_repo.iter_pages('visits', VISIT_COLUMNS, filters, client=client):
+        _merge(periods, financial_aggregation.aggregate(
+            financial_aggregation.visit_columns(page), empty_medicines, granularity, NEW_PATIENT_CODES))
+    return periods
+
+
+def _medicine_periods(client, granularity, filters):
+    empty_visits = financial_aggregation.visit_columns([])
+    periods = {}
+    for page in db_repo.iter_pages('medicines', MEDICINE_COLUMNS, filters, client=client):
+        _merge(periods, financial_aggregation.aggregate(
+            empty_visits, financial_aggregation.medicine_columns(page), granularity, NEW_PATIENT_CODES))
+    return periods
+
+
+def _stream_periods(client, granularity, date_from, date_to):
+    """Scan visits and medicines side by side and merge their per-period totals."""
+    filters = _date_filters(date_from, date_to)
+    visits, medicines = async_supabase.in_parallel(
+        lambda: _visit_periods(client, granularity, filters),
+        lambda: _medicine_periods(client, granularity, filters))
+    return _merge(visits, medicines)
+
+
+def build_summary(client, granularity='day', date_from=None, date_to=None):
+    """Return totals and per-period breakdown (newest first) for the date range."""
+    if granularity not in financial_aggregation.GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(financial_aggregation.GRANULARITIES)}")
+
+    if sql_enabled():
+        from database import sql
+        periods = sql.financial_periods(granularity, date_from, date_to, NEW_PATIENT_CODES)
+    else:
+        periods = _stream_periods(client, granularity, date_from, date_to)
+
+    totals = {field: 0 for field in SUM_FIELDS}
+    for stats in periods.values():
+        for field in SUM_FIELDS:
+            totals[field] += stats[field]
+
+    return {
+        'granularity': granularity,
+        'from': date_from,
+        'to': date_to,
+        'totals': totals,
+        'periods': sorted(periods.values(), key=lambda p: p['period'], reverse=True),
+    }
@@ -0,0 +1,309 @@
+"""
+Disk-backed cache for patient images served through the backend.
+
+Originals are downloaded from the patient_images bucket once and kept on
+local disk together with resized width variants (?w=128). The cache is
+bounded by IMAGE_CACHE_MAX_BYTES and evicts least recently used files.
+Concurrent requests for the same object share a single download/resize.
+
+Every worker process shares the directory, so the directory itself is the
+state: a file's mtime is its last use (touched on every hit). A key this
+worker has not seen is looked up by its file name prefix, without a stat
+of every file. Eviction scans the whole directory for the total size and
+the LRU order, but only every EVICTION_SCAN_EVERY writes or once the
+bytes this worker knows of cross IMAGE_CACHE_MAX_BYTES.
+
+Uploaded filenames carry a timestamp and are never reused for different
+content, so cached files are served with long-lived immutable caching and
+an ETag derived from the bytes.
+"""
+
+import os
+import time
+import hashlib
+import mimetypes
+import threading
+
+from services import image_processing
+
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), '.image_cache'))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+# Requested widths are rounded up to one of these so variants stay bounded
+VARIANT_WIDTHS = (64, 128, 256, 512, 1024)
+# Files used this recently are never evicted: another worker may be about to send them
+EVICTION_GRACE = 10.0
+# Writes between full directory scans for eviction (other workers' writes are only counted by a scan)
+EVICTION_SCAN_EVERY = 50
+
+SUPABASE_BUCKET = 'patient_images'
+
+
+class ImageNotFound(Exception):
+    pass
+
+
+class ImageStorageError(Exception):
+    """Storage could not be reached or failed for a reason other than a missing object."""
+
+
+class ImageStorageUnavailable(ImageStorageError):
+    """No Supabase client: not configured, or the pool is exhausted."""
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ImageCache:
+    """Cache files in a directory shared by all workers: key hash -> (path, size, etag).
+
+    _entries only remembers where this worker last saw each key and _bytes
+    is an estimate between scans; the directory is the source of truth for
+    what exists, its size and its LRU order (file mtimes).
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = {}
+        self._bytes = 0
+        self._puts_since_scan = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _lookup(self, keys):
+        """Find the files of the given keys by name alone: {key: (path, size, etag)}."""
+        found = {}
+        try:
+            with os.scandir(self.directory) as items:
+                for item in items:
+                    key, _, etag = item.name.partition('-')
+                    if key not in keys or not etag or item.name.endswith('.tmp'):
+                        continue
+                    try:
+                        found[key] = (item.path, item.stat().st_size, etag)
+                    except OSError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return found
+
+    def _scan(self):
+        """Re-read the directory: [(mtime, key, path, size, etag)], oldest use first."""
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        with os.scandir(self.directory) as entries:
+            for item in entries:
+                key, _, etag = item.name.partition('-')
+                if not etag or item.name.endswith('.tmp'):
+                    continue
+                try:
+                    st = item.stat()
+                except OSError:
+                    continue
+                found.append((st.st_mtime, key, item.path, st.st_size, etag))
+        found.sort()
+        self._entries = {key: (path, size, etag) for _, key, path, size, etag in found}
+        self._bytes = sum(size for _, _, _, size, _ in found)
+        self._puts_since_scan = 0
+        return found
+
+    def _evict(self):
+        """Remove the least recently used files until the directory fits max_bytes."""
+        found = self._scan()
+        cutoff = time.time() - EVICTION_GRACE
+        for mtime, key, path, size, _ in found[:-1]:
+            if self._bytes <= self.max_bytes or mtime > cutoff:
+                break
+            self._remove_file(path)
+            self._entries.pop(key, None)
+            self._bytes -= size
+            self.evictions += 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or not os.path.exists(entry[0]):
+            # Written, replaced or evicted by another worker since we last looked
+            found = self._lookup({key}).get(key)
+            with self._lock:
+                old = self._entries.pop(key, None)
+                self._bytes -= old[1] if old is not None else 0
+                if found is not None:
+                    self._entries[key] = found
+                    self._bytes += found[1]
+            entry = found
+        if entry is None:
+            return None
+        try:
+            os.utime(entry[0])
+        except OSError:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, key, data):
+        etag = hashlib.sha256(data).hexdigest()[:32]
+        path = os.path.join(self.directory, f'{key}-{etag}')
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        os.makedirs(self.directory, exist_ok=True)
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+                if old[0] != path:
+                    self._remove_file(old[0])
+            self._entries[key] = (path, len(data), etag)
+            self._bytes += len(data)
+            self._puts_since_scan += 1
+            self.misses += 1
+            if self._bytes > self.max_bytes or self._puts_since_scan >= EVICTION_SCAN_EVERY:
+                self._evict()
+        return path, len(data), etag
+
+    def drop(self, keys):
+        found = self._lookup(set(keys))
+        with self._lock:
+            for key in keys:
+                for entry in {self._entries.pop(key, None), found.get(key)} - {None}:
+                    self._bytes -= entry[1]
+                    self._remove_file(entry[0])
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def coalesce(self, key, fn):
+        """Run fn() once for concurrent callers of the same key."""
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.event.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'files': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+            }
+
+
+_cache = ImageCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
+
+
+def _key(filename, width):
+    return hashlib.sha256(f'{filename}|{width or 0}'.encode('utf-8')).hexdigest()[:40]
+
+
+def variant_width(requested):
+    """Round a requested width up to a supported variant (None = original)."""
+    if not requested or requested <= 0 or not image_processing.available():
+        return None
+    for width in VARIANT_WIDTHS:
+        if requested <= width:
+            return width
+    return None
+
+
+def mimetype_for(filename, width):
+    if width:
+        return 'image/jpeg'
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def _is_not_found(error):
+    """Whether a storage error is a missing object rather than a failed request."""
+    # storage3 raises StorageException({..., 'statusCode': ...}); the API has sent
+    # missing objects as 404 and as 400 with statusCode '404' / error 'not_found'
+    detail = error.args[0] if error.args and isinstance(error.args[0], dict) else {}
+    response = getattr(error, 'response', None)
+    status = detail.get('statusCode') or getattr(response, 'status_code', None)
+    return str(status) == '404' or str(detail.get('error', '')).lower().replace(' ', '_') == 'not_found'
+
+
+def _download(get_client, filename):
+    client = get_client()
+    if not client:
+        raise ImageStorageUnavailable('Supabase client not available')
+    try:
+        data = client.storage.from_(SUPABASE_BUCKET).download(filename)
+    except Exception as e:
+        if _is_not_found(e):
+            raise ImageNotFound(filename) from e
+        raise ImageStorageError(f'Downloading {filename} failed: {e}') from e
+    if not data:
+        raise ImageNotFound(filename)
+    return data
+
+
+def get_image(get_client, filename, width=None):
+    """Return (path, etag, mimetype) of the cached original or width variant.
+
+    get_client is only called when the object has to be downloaded, so
+    cache hits never take a Supabase client.
+    """
+    key = _key(filename, width)
+    entry = _cache.get(key)
+    if entry is None:
+        def load():
+            found = _cache.get(key)
+            if found is not None:
+                return found
+            if width:
+                original_path, _, _ = get_image(get_client, filename)
+                with open(original_path, 'rb') as f:
+                    data = image_processing.resize_to_width(f, width)
+            else:
+                data = _download(get_client, filename)
+            return _cache.put(key, data)
+        entry = _cache.coalesce(key, load)
+    path, _, etag = entry
+    return path, etag, mimetype_for(filename, width)
+
+
+def invalidate(filename):
+    """Forget the original and all variants of filename (e.g. after an upsert)."""
+    _cache.drop([_key(filename, None)] + [_key(filename, w) for w in VARIANT_WIDTHS])
+
+
+def get_stats():
+    return _cache.stats()
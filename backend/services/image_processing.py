@@ -0,0 +1,110 @@
+"""
+Patient photo processing for uploads.
+
+Phone photos arrive as multi-megabyte JPEGs carrying an EXIF rotation. They
+are decoded (JPEGs at reduced scale via draft mode), turned upright, bounded
+to IMAGE_MAX_DIMENSION and re-encoded as JPEG. Decoding runs in a small
+worker pool so a burst of uploads cannot hold many full-size bitmaps in
+memory at once. Smaller sizes are not stored: the image proxy makes width
+variants (?w=) on demand (see image_cache.py).
+
+Pillow is optional: without it available() is False and uploads are stored
+as sent.
+"""
+
+import os
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow not installed
+    Image = None
+    ImageOps = None
+
+IMAGE_MAX_UPLOAD_BYTES = int(os.getenv('IMAGE_MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+IMAGE_MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', 1600))
+IMAGE_JPEG_QUALITY = int(os.getenv('IMAGE_JPEG_QUALITY', 82))
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+# Seconds an upload waits for its turn in the worker pool plus processing
+IMAGE_PROCESS_TIMEOUT = float(os.getenv('IMAGE_PROCESS_TIMEOUT', 30))
+
+INPUT_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP', 'MPO'}
+
+# Refuse decompression bombs well before Pillow's own limit
+MAX_PIXELS = 50_000_000
+
+_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix='image')
+
+
+class ImageProcessingError(ValueError):
+    """The upload is not an image we can decode."""
+
+
+def available():
+    return Image is not None
+
+
+def jpeg_name(filename):
+    """Storage name for the re-encoded image (extension becomes .jpg)."""
+    return os.path.splitext(filename)[0] + '.jpg'
+
+
+def flatten(image):
+    """Convert to RGB, compositing any transparency onto white."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB') if image.mode != 'RGB' else image
+
+
+def _encode(image, quality):
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def process_image(stream, max_dimension=None, quality=None):
+    """Return the uploaded image upright, within max_dimension, as JPEG bytes."""
+    max_dimension = max_dimension or IMAGE_MAX_DIMENSION
+    quality = quality or IMAGE_JPEG_QUALITY
+
+    try:
+        image = Image.open(stream)
+    except Exception as e:
+        raise ImageProcessingError('Uploaded file is not a valid image') from e
+
+    if image.format not in INPUT_FORMATS:
+        raise ImageProcessingError(f'Unsupported image format: {image.format}')
+    width, height = image.size
+    if width * height > MAX_PIXELS:
+        raise ImageProcessingError('Image dimensions are too large')
+
+    try:
+        # JPEGs can be decoded directly at 1/2, 1/4 or 1/8 scale
+        image.draft('RGB', (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        image = flatten(image)
+    except Exception as e:
+        raise ImageProcessingError('Uploaded image could not be decoded') from e
+
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    return _encode(image, quality)
+
+
+def resize_to_width(stream, width, quality=None):
+    """Return JPEG bytes of the image scaled down to at most width pixels wide."""
+    image = Image.open(stream)
+    image.draft('RGB', (width, width * 4))
+    image = flatten(ImageOps.exif_transpose(image))
+    if image.width > width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+    return _encode(image, quality or IMAGE_JPEG_QUALITY)
+
+
+def process_upload(stream, timeout=None):
+    """Run process_image in the worker pool and wait for the bounded image."""
+    future = _executor.submit(process_image, stream)
+    return future.result(timeout=IMAGE_PROCESS_TIMEOUT if timeout is None else timeout)
@@ -0,0 +1,466 @@
+"""
+In-process autocomplete index for the medicine dropdown.
+
+Names in custom_medicines look like 'ALBOL 400 MG (Albendazole 400 MG Tablet)':
+a brand followed by the generic composition in parentheses. Both halves
+are indexed:
+
+- a prefix trie over whole names and every word, for keystroke-rate prefix
+  matches;
+- trigram postings for fuzzy matches (typos, missing spaces);
+- a substring scan as the last resort before fuzzy.
+
+The fallback tiers only run when the trie tiers leave the page short, and
+both are bounded: the substring scan walks names best-ranked first and stops
+once the page is full, and fuzzy scores at most FUZZY_CANDIDATES names.
+
+Results are ranked by match quality, then by how often the medicine has been
+prescribed (prescription_medicines), then alphabetically. The index is
+updated in place when medicines are added, renamed or deleted through the
+API. That only reaches the worker that handled the write, so every worker
+also reloads in the background when the shared 'vocabularies' cache
+version moves (cache_versions), and every MEDICINE_INDEX_TTL seconds.
+"""
+
+import os
+import re
+import math
+import heapq
+import bisect
+import time
+import logging
+import threading
+from collections import Counter, deque
+from itertools import chain
+
+import cache_versions
+from database import db_repo
+
+MEDICINE_INDEX_TTL = float(os.getenv('MEDICINE_INDEX_TTL', 300))
+# Prescription counts are topped up from new prescription_medicines rows at
+# most this often, and fully recounted every MEDICINE_USAGE_RECOUNT seconds
+MEDICINE_USAGE_REFRESH = 60.0
+MEDICINE_USAGE_RECOUNT = 3600.0
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+FUZZY_THRESHOLD = 0.35
+# Fuzzy matching counts every posting of the query's trigrams while they hold at most
+# FUZZY_SCAN ids; above that it scores at most FUZZY_CANDIDATES names, taken
+# best-ranked from the rarest trigrams
+FUZZY_SCAN = 2000
+FUZZY_CANDIDATES = 300
+# Query latencies kept for the p50/p99 in get_stats()
+LATENCY_SAMPLES = 2048
+
+# Match tiers, best first
+NAME_PREFIX, BRAND_WORD, GENERIC_WORD, SUBSTRING, FUZZY = range(5)
+MATCH_NAMES = ('prefix', 'brand', 'generic', 'substring', 'fuzzy')
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    """Lowercase words separated by single spaces ('ANDROFOL – M' -> 'androfol m')."""
+    return ' '.join(_WORD_RE.findall((text or '').lower()))
+
+
+def split_name(name):
+    """('ALBOL 400 MG', 'Albendazole 400 MG Tablet') from a dropdown name."""
+    name = (name or '').strip()
+    start = name.find('(')
+    if start <= 0:
+        return name, ''
+    end = name.rfind(')')
+    generic = name[start + 1:end if end > start else len(name)]
+    return name[:start].strip(), generic.strip()
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _TrieNode:
+    __slots__ = ('children', 'ids')
+
+    def __init__(self):
+        self.children = {}
+        self.ids = {}   # id -> number of its keys passing through this node
+
+
+class _Trie:
+    """Prefix trie; every node counts the ids of all keys below it.
+
+    Counts rather than sets, because one medicine can have several keys
+    sharing a prefix ('m' and 'mg').
+    """
+
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def add(self, key, item_id):
+        node = self.root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+            node.ids[item_id] = node.ids.get(item_id, 0) + 1
+
+    def remove(self, key, item_id):
+        node = self.root
+        path = []
+        for char in key:
+            child = node.children.get(char)
+            if child is None:
+                return
+            path.append((node, char, child))
+            node = child
+        for parent, char, child in path:
+            count = child.ids.get(item_id, 0) - 1
+            if count > 0:
+                child.ids[item_id] = count
+            else:
+                child.ids.pop(item_id, None)
+            if not child.ids:
+                del parent.children[char]
+                return
+
+    def find(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return {}
+        return node.ids.keys()
+
+
+class MedicineIndex:
+
+    def __init__(self):
+        self.names = {}          # id -> display name
+        self.keys = {}           # id -> (normalized name, brand words, generic words)
+        self.name_trie = _Trie()
+        self.brand_trie = _Trie()
+        self.generic_trie = _Trie()
+        self.grams = {}          # trigram -> ids
+        self.usage = {}          # normalized name -> times prescribed
+        self._order = None
+        self._blob = None
+        self._ranked_grams = {}  # trigram -> its ids in ranking order (large postings only)
+
+    def _reset_order(self):
+        self._order = None
+        self._blob = None
+        self._ranked_grams = {}
+
+    def add(self, item_id, name):
+        if item_id in self.names:
+            self.remove(item_id)
+        self._reset_order()
+        brand, generic = split_name(name)
+        key = normalize(name)
+        brand_words = set(normalize(brand).split())
+        generic_words = set(normalize(generic).split())
+        self.names[item_id] = name
+        self.keys[item_id] = (key, brand_words, generic_words)
+        self.name_trie.add(key, item_id)
+        for word in brand_words:
+            self.brand_trie.add(word, item_id)
+        for word in generic_words:
+            self.generic_trie.add(word, item_id)
+        for gram in trigrams(key):
+            self.grams.setdefault(gram, set()).add(item_id)
+
+    def remove(self, item_id):
+        if item_id not in self.names:
+            return
+        self._reset_order()
+        key, brand_words, generic_words = self.keys.pop(item_id)
+        del self.names[item_id]
+        self.name_trie.remove(key, item_id)
+        for word in brand_words:
+            self.brand_trie.remove(word, item_id)
+        for word in generic_words:
+            self.generic_trie.remove(word, item_id)
+        for gram in trigrams(key):
+            ids = self.grams.get(gram)
+            if ids is not None:
+                ids.discard(item_id)
+                if not ids:
+                    del self.grams[gram]
+
+    def _word_matches(self, trie, words):
+        """Ids where every query word prefixes some indexed word."""
+        found = None
+        for word in words:
+            ids = trie.find(word)
+            found = set(ids) if found is None else found & ids
+            if not found:
+                return set()
+        return found or set()
+
+    def _fuzzy(self, query, exclude):
+        """id -> share of the query's trigrams found in the name, above FUZZY_THRESHOLD.
+
+        Small postings are counted in full. Otherwise, since a name sharing
+        enough trigrams has at least one of the query's rarest len - needed + 1
+        trigrams, candidates come from those postings only, best-ranked first,
+        and at most FUZZY_CANDIDATES of them are scored.
+        """
+        query_grams = trigrams(query)
+        needed = math.ceil(FUZZY_THRESHOLD * len(query_grams))
+        rarest = sorted(((gram, self.grams.get(gram, ())) for gram in query_grams), key=lambda g: len(g[1]))
+        postings = [ids for _, ids in rarest]
+        if sum(map(len, postings)) <= FUZZY_SCAN:
+            counts = Counter(chain.from_iterable(postings))
+            return {item_id: shared / len(query_grams) for item_id, shared in counts.items()
+                    if shared >= needed and item_id not in exclude}
+        candidates = set()
+        for gram, ids in rarest[:len(rarest) - needed + 1]:
+            room = FUZZY_CANDIDATES - len(candidates)
+            if room <= 0:
+                break
+            if len(ids) <= room:
+                candidates.update(i for i in ids if i not in exclude)
+                continue
+            for item_id in self._ranked(gram):
+                if item_id not in candidates and item_id not in exclude:
+                    candidates.add(item_id)
+                    room -= 1
+                    if not room:
+                        break
+        scores = {}
+        for item_id in candidates:
+            shared = sum(item_id in ids for ids in postings)
+            if shared >= needed:
+                scores[item_id] = shared / len(query_grams)
+        return scores
+
+    def _ranked(self, gram):
+        """Ids of a trigram's posting in ranking order, kept until the ranking changes."""
+        ranked = self._ranked_grams.get(gram)
+        if ranked is None:
+            ranked = self._ranked_grams[gram] = sorted(self.grams[gram], key=self._ranking().__getitem__)
+        return ranked
+
+    def _substring(self, query, exclude, limit):
+        """Up to limit ids whose normalized name contains query, best-ranked first.
+
+        Names are scanned as one string laid out in ranking order, so the scan
+        stops as soon as limit new ids are found. A name containing query has
+        all of its trigrams, so the scan is skipped when one has no postings.
+        """
+        if any(query[i:i + 3] not in self.grams for i in range(len(query) - 2)):
+            return []
+        if self._blob is None:
+            order = self._ranking()
+            ids = sorted(self.keys, key=order.__getitem__)
+            starts = []
+            position = 0
+            for item_id in ids:
+                starts.append(position)
+                position += len(self.keys[item_id][0]) + 1
+            self._blob = ('\n'.join(self.keys[i][0] for i in ids), starts, ids)
+        blob, starts, ids = self._blob
+        found = []
+        position = blob.find(query)
+        while position != -1 and len(found) < limit:
+            slot = bisect.bisect_right(starts, position) - 1
+            if ids[slot] not in exclude:
+                found.append(ids[slot])
+            # Continue after this name: it is counted once
+            position = blob.find(query, starts[slot + 1] if slot + 1 < len(starts) else len(blob))
+        return found
+
+    def _ranking(self):
+        """id -> position by prescription count (most used first), then name."""
+        if self._order is None:
+            ids = sorted(self.names, key=lambda i: (-self.usage.get(self.keys[i][0], 0), self.names[i].lower()))
+            self._order = {item_id: position for position, item_id in enumerate(ids)}
+        return self._order
+
+    def add_usage(self, counts):
+        for key, count in counts.items():
+            self.usage[key] = self.usage.get(key, 0) + count
+        self._reset_order()
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        query = normalize(query)
+        if not query:
+            return []
+        words = query.split()
+        order = self._ranking()
+        results = []
+        seen = set()
+
+        def take(ids, tier, key=order.__getitem__):
+            """Add the best remaining ids of a tier; True once limit is reached."""
+            if seen:
+                ids = [i for i in ids if i not in seen]
+            for item_id in heapq.nsmallest(limit - len(results), ids, key=key):
+                seen.add(item_id)
+                results.append((item_id, tier))
+            return len(results) >= limit
+
+        # Tiers run best first and stop as soon as the page is full, so short
+        # prefixes matching thousands of names never reach the slower tiers
+        done = (take(self.name_trie.find(query), NAME_PREFIX)
+                or take(self._word_matches(self.brand_trie, words), BRAND_WORD)
+                or take(self._word_matches(self.generic_trie, words), GENERIC_WORD)
+                or take(self._substring(query, seen, limit - len(results)), SUBSTRING))
+        if not done and len(query) >= 3:
+            fuzzy = self._fuzzy(query, seen)
+            take(fuzzy, FUZZY, key=lambda i: (-fuzzy[i], order[i]))
+
+        return [{
+            'id': item_id,
+            'name': self.names[item_id],
+            'uses': self.usage.get(self.keys[item_id][0], 0),
+            'match': MATCH_NAMES[tier],
+        } for item_id, tier in results]
+
+
+# ============= MODULE STATE =============
+
+_lock = threading.RLock()
+_index = MedicineIndex()
+_loaded_at = 0.0
+_usage_counted_at = 0.0
+_usage_updated_at = 0.0
+_usage_watermark = None
+_version = None
+_refreshing = False
+_latencies = deque(maxlen=LATENCY_SAMPLES)
+stats = {'loads': 0, 'queries': 0, 'inserts': 0, 'deletes': 0}
+
+
+def _count_usage(client=None, after=None):
+    """{normalized name: count} of prescription_medicines rows (after an id, if given)."""
+    counts = {}
+    last_id = after
+    filters = [('gt', 'medicine_id', after)] if after is not None else None
+    for row in db_repo.iter_records('prescription_medicines', 'medicine_id, medicine_name', filters,
+                                    client=client):
+        key = normalize(row.get('medicine_name'))
+        if key:
+            counts[key] = counts.get(key, 0) + 1
+        last_id = row['medicine_id']
+    return counts, last_id
+
+
+def load(client=None):
+    """Rebuild the index and usage counts from the database."""
+    global _index, _loaded_at, _usage_counted_at, _usage_updated_at, _usage_watermark, _version
+    # Read before the table, so a write during the load triggers another one
+    version = cache_versions.get('vocabularies')
+    index = MedicineIndex()
+    for row in db_repo.iter_records('custom_medicines', 'id, medicine_name', key='id', client=client):
+        if row.get('medicine_name'):
+            index.add(row['id'], row['medicine_name'])
+    counts, watermark = _count_usage(client)
+    index.add_usage(counts)
+    now = time.time()
+    with _lock:
+        _index = index
+        _loaded_at = now
+        _usage_counted_at = now
+        _usage_updated_at = now
+        _usage_watermark = watermark
+        _version = version
+        stats['loads'] += 1
+
+
+def _top_up_usage():
+    global _usage_updated_at, _usage_watermark
+    counts, watermark = _count_usage(after=_usage_watermark)
+    with _lock:
+        _index.add_usage(counts)
+        _usage_watermark = watermark
+        _usage_updated_at = time.time()
+
+
+def _refresh_in_background(full):
+    global _refreshing
+    with _lock:
+        if _refreshing:
+            return
+        _refreshing = True
+
+    def run():
+        global _refreshing
+        try:
+            if full:
+                load()
+            else:
+                _top_up_usage()
+        except Exception:
+            logging.exception('Medicine index refresh failed')
+        finally:
+            with _lock:
+                _refreshing = False
+
+    threading.Thread(target=run, name='medicine-index-refresh', daemon=True).start()
+
+
+def warm():
+    """Build the index now (startup); returns whether it loaded."""
+    try:
+        load()
+        return True
+    except Exception:
+        logging.exception('Medicine index warm-up failed')
+        return False
+
+
+def _ensure_fresh():
+    if not _loaded_at:
+        load()
+        return
+    now = time.time()
+    shared = cache_versions.get('vocabularies')
+    if ((shared is not None and shared != _version)
+            or now - _loaded_at > MEDICINE_INDEX_TTL or now - _usage_counted_at > MEDICINE_USAGE_RECOUNT):
+        _refresh_in_background(full=True)
+    elif now - _usage_updated_at > MEDICINE_USAGE_REFRESH:
+        _refresh_in_background(full=False)
+
+
+def suggest(query, limit=DEFAULT_LIMIT):
+    """Ranked suggestions for a partial medicine name."""
+    _ensure_fresh()
+    started = time.perf_counter()
+    with _lock:
+        results = _index.search(query, max(1, min(limit, MAX_LIMIT)))
+        _latencies.append(time.perf_counter() - started)
+        stats['queries'] += 1
+    return results
+
+
+def add(item_id, name):
+    """Index a new or renamed custom medicine."""
+    with _lock:
+        _index.add(item_id, name)
+        stats['inserts'] += 1
+
+
+def remove(item_id):
+    with _lock:
+        _index.remove(item_id)
+        stats['deletes'] += 1
+
+
+def _percentile(samples, p):
+    if not samples:
+        return None
+    return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 3)
+
+
+def get_stats():
+    with _lock:
+        samples = sorted(_latencies)
+        return {
+            **stats,
+            'size': len(_index.names),
+            'p50_ms': _percentile(samples, 0.50),
+            'p99_ms': _percentile(samples, 0.99),
+            'age_seconds': round(time.time() - _loaded_at, 1) if _loaded_at else None,
+        }
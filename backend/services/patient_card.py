@@ -0,0 +1,172 @@
+"""
+Patient card document: a patient with their visits, prescriptions and
+medicine purchases in one nested response.
+
+The patient row, the visits chain (visits -> prescriptions ->
+prescription_medicines) and the medicine purchases are read concurrently
+on a small thread pool, prescriptions are joined to their medicines in one
+pass, and the finished document is kept for PATIENT_CARD_TTL seconds.
+Routes that change a patient's data call invalidate(), which only reaches
+the worker that handles it; every worker also drops its cards when the
+shared 'patient_cards' cache version moves, bumped by any write to
+patients, visits, medicines, prescriptions or prescription_medicines
+(create_cache_versions.sql).
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cache_versions
+import metrics
+from database import db_repo
+
+PATIENT_CARD_WORKERS = int(os.getenv('PATIENT_CARD_WORKERS', 4))
+PATIENT_CARD_TTL = float(os.getenv('PATIENT_CARD_TTL', 30))
+PATIENT_CARD_CACHE_SIZE = 256
+# Seconds to wait for the database reads of one card
+PATIENT_CARD_TIMEOUT = 20
+
+SECTIONS = ('patient', 'visits', 'prescriptions', 'medicines', 'stats')
+
+_executor = ThreadPoolExecutor(max_workers=PATIENT_CARD_WORKERS, thread_name_prefix='patient-card')
+
+
+class PatientNotFound(LookupError):
+    pass
+
+
+def _rows(client, table, patient_id):
+    return list(db_repo.iter_records(table, '*', [('eq', 'patient_id', patient_id)], client=client))
+
+
+def _by_date(rows, key):
+    """Newest first, as the card lists them."""
+    return sorted(rows, key=lambda row: (row.get('date') or '', row[key]), reverse=True)
+
+
+def _patient(client, patient_id):
+    rows = _rows(client, 'patients', patient_id)
+    return rows[0] if rows else None
+
+
+def _visits(client, patient_id):
+    """Visits with their prescription (and its medicines) nested under 'prescription'."""
+    visits = _rows(client, 'visits', patient_id)
+    prescriptions = db_repo.fetch_in('prescriptions', 'visit_id', [v['visit_id'] for v in visits], client=client)
+    medicines = db_repo.fetch_in('prescription_medicines', 'prescription_id',
+                                 [p['prescription_id'] for p in prescriptions], client=client)
+
+    medicines_by_prescription = {}
+    for med in medicines:
+        medicines_by_prescription.setdefault(med['prescription_id'], []).append(med)
+    prescription_by_visit = {}
+    for prescription in prescriptions:
+        prescription['medicines'] = medicines_by_prescription.get(prescription['prescription_id'], [])
+        prescription_by_visit[prescription['visit_id']] = prescription
+    for visit in visits:
+        visit['prescription'] = prescription_by_visit.get(visit['visit_id'])
+    return _by_date(visits, 'visit_id')
+
+
+def _medicines(client, patient_id):
+    return _by_date(_rows(client, 'medicines', patient_id), 'med_id')
+
+
+def _stats(visits, medicines):
+    return {
+        'total_visits': len(visits),
+        # Drug fees are charged on visits and on separate medicine purchases
+        'total_drug_fees': sum(v.get('drug_fee') or 0 for v in visits) + sum(m.get('drug_fee') or 0 for m in medicines),
+        'total_consultation_fees': sum(v.get('consultation_fee') or 0 for v in visits),
+        'total_procedure_fees': sum(v.get('Procedure_Fee') or 0 for v in visits),
+        'payment_methods': list(dict.fromkeys(v['paymentmethod'] for v in visits if v.get('paymentmethod'))),
+    }
+
+
+def build(client, patient_id):
+    """Read and assemble the full card; raises PatientNotFound."""
+    # bind() carries the request's metrics context, so these reads count toward its timings
+    patient = _executor.submit(metrics.bind(_patient), client, patient_id)
+    visits = _executor.submit(metrics.bind(_visits), client, patient_id)
+    medicines = _executor.submit(metrics.bind(_medicines), client, patient_id)
+    deadline = time.monotonic() + PATIENT_CARD_TIMEOUT
+    patient, visits, medicines = (f.result(timeout=max(0, deadline - time.monotonic()))
+                                  for f in (patient, visits, medicines))
+    if patient is None:
+        raise PatientNotFound(patient_id)
+    return {
+        'patient': patient,
+        'visits': visits,
+        'medicines': medicines,
+        'stats': _stats(visits, medicines),
+    }
+
+
+def parse_fields(value):
+    """The set of SECTIONS named in a comma-separated fields param (all when empty)."""
+    fields = {f.strip() for f in (value or '').split(',') if f.strip()} or set(SECTIONS)
+    unknown = fields - set(SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))} (choose from {', '.join(SECTIONS)})")
+    return fields
+
+
+def project(card, fields):
+    """The requested sections of a card; 'visits' without 'prescriptions' drops the nesting."""
+    result = {name: card[name] for name in ('patient', 'medicines', 'stats') if name in fields}
+    if 'visits' in fields:
+        if 'prescriptions' in fields:
+            result['visits'] = card['visits']
+        else:
+            result['visits'] = [{k: v for k, v in visit.items() if k != 'prescription'} for visit in card['visits']]
+    elif 'prescriptions' in fields:
+        result['prescriptions'] = [visit['prescription'] for visit in card['visits'] if visit['prescription']]
+    return result
+
+
+# ============= CACHE =============
+
+_lock = threading.Lock()
+_cards = OrderedDict()      # patient_id -> (expires_at, shared version, card)
+_generations = {}           # patient_id -> invalidations so far
+stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def get(client, patient_id, fresh=False):
+    """The card for a patient, from the cache unless stale or fresh is set."""
+    now = time.time()
+    # Read before the tables, so a write during the build leaves the card stale
+    version = cache_versions.get('patient_cards')
+    with _lock:
+        entry = _cards.get(patient_id)
+        if not fresh and entry is not None and entry[0] > now and entry[1] == version:
+            _cards.move_to_end(patient_id)
+            stats['hits'] += 1
+            return entry[2]
+        generation = _generations.get(patient_id, 0)
+    card = build(client, patient_id)
+    with _lock:
+        stats['misses'] += 1
+        # A write that landed while the card was being read makes it stale already
+        if _generations.get(patient_id, 0) != generation:
+            return card
+        _cards[patient_id] = (now + PATIENT_CARD_TTL, version, card)
+        _cards.move_to_end(patient_id)
+        while len(_cards) > PATIENT_CARD_CACHE_SIZE:
+            _cards.popitem(last=False)
+    return card
+
+
+def invalidate(patient_id):
+    with _lock:
+        _generations[patient_id] = _generations.get(patient_id, 0) + 1
+        if _cards.pop(patient_id, None) is not None:
+            stats['invalidations'] += 1
+
+
+def get_stats():
+    with _lock:
+        return {**stats, 'size': len(_cards), 'workers': PATIENT_CARD_WORKERS}
@@ -0,0 +1,478 @@
+"""
+In-process search index for the patients table.
+
+Replaces leading-wildcard ilike scans ('%term%') on name and phone_no:
+
+- names: a sorted list of normalized full names and one of name words, so
+  prefix matches are a bisect plus the first rows of a range; trigram
+  postings for matches inside a word; and a phonetic key per word for
+  common Indian spelling variants (Lakshmi/Laxmi, Mohammed/Muhammad,
+  Sunita/Sunitha);
+- phone numbers: a sorted list of every digit suffix, so any run of digits
+  (the last four, or the first five as typed) is a bisect as well.
+
+Results are ranked by match tier (full-name prefix, word prefix, substring,
+phonetic), then alphabetically, and collection stops at SEARCH_MAX_MATCHES,
+so the cost of a query depends on the page, not on the number of patients.
+
+The index is built at startup. Every PATIENT_INDEX_REFRESH seconds each
+worker re-reads the patients whose updated_at is past its high-water mark
+and drops those recorded in patient_deletions since then (see
+create_patient_index_tracking.sql), so edits made through any worker or
+directly in Supabase show up everywhere. reindex() applies an edit in the
+worker that made it at once. Without the tracking columns only new
+patient_ids are picked up, and a full reload every PATIENT_INDEX_TTL
+seconds catches the rest.
+"""
+
+import os
+import re
+import bisect
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from database import db_repo
+from services.medicine_index import normalize, trigrams
+
+PATIENT_INDEX_TTL = float(os.getenv('PATIENT_INDEX_TTL', 900))
+PATIENT_INDEX_REFRESH = float(os.getenv('PATIENT_INDEX_REFRESH', 15))
+
+PATIENT_COLUMNS = 'patient_id, name, sex, phone_no, year_of_birth, pic_filename, hometown'
+DELETIONS_TABLE = 'patient_deletions'
+# Re-read a little before the high-water mark so late commits are not missed
+HWM_OVERLAP = timedelta(minutes=5)
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+# Matches collected per query; the total reported to clients is capped here
+SEARCH_MAX_MATCHES = 500
+# Candidates a query may examine across all tiers; a query on very common
+# words stops here and reports its total as truncated
+SEARCH_MAX_SCAN = 2000
+# Only the last PHONE_DIGITS digits are indexed, so country codes do not matter
+PHONE_DIGITS = 10
+# Shorter digit runs are matched by scanning instead of through the suffix list
+MIN_PHONE_SUFFIX = 3
+LATENCY_SAMPLES = 2048
+
+NAME_PREFIX, WORD_PREFIX, SUBSTRING, PHONETIC, PHONE = range(5)
+MATCH_NAMES = ('prefix', 'word', 'substring', 'phonetic', 'phone')
+
+_NON_DIGIT_RE = re.compile(r'\D')
+# Applied in order; the digraphs first so 'ksh' is not read as 'k' + 'sh'
+_SOUND_RULES = (('ksh', 'x'), ('ks', 'x'), ('ph', 'f'), ('bh', 'b'), ('dh', 'd'), ('gh', 'g'),
+                ('jh', 'j'), ('kh', 'k'), ('th', 't'), ('sh', 's'), ('ch', 'c'), ('ck', 'k'),
+                ('w', 'v'), ('z', 'j'), ('q', 'k'))
+_SOUND_DROP = set('aeiouyh')
+
+
+def phone_digits(phone):
+    return _NON_DIGIT_RE.sub('', phone or '')[-PHONE_DIGITS:]
+
+
+def sound(word):
+    """Phonetic key: spelling rules, then the first letter and the remaining consonants."""
+    if not word:
+        return ''
+    for old, new in _SOUND_RULES:
+        word = word.replace(old, new)
+    key = [word[0]]
+    for char in word[1:]:
+        if char not in _SOUND_DROP and char != key[-1]:
+            key.append(char)
+    return ''.join(key)
+
+
+class _Scan:
+    """Countdown of candidates one search may still examine."""
+    __slots__ = ('left',)
+
+    def __init__(self, limit):
+        self.left = limit
+
+    def take(self):
+        self.left -= 1
+        return self.left >= 0
+
+
+class PatientIndex:
+
+    def __init__(self):
+        self.patients = {}      # id -> row
+        self.keys = {}          # id -> (normalized name, words, phone digits)
+        self.names = []         # sorted (normalized name, id)
+        self.words = []         # sorted (word, normalized name, id)
+        self.suffixes = []      # sorted (digit suffix, normalized name, id)
+        self.grams = {}         # trigram -> ids
+        self.sounds = {}        # phonetic key -> ids
+
+    def __len__(self):
+        return len(self.patients)
+
+    def add(self, row):
+        self._add(row, bisect.insort)
+
+    def add_many(self, rows):
+        """Bulk load: append everything, then sort the lists once."""
+        for row in rows:
+            self._add(row, list.append)
+        self.names.sort()
+        self.words.sort()
+        self.suffixes.sort()
+
+    def _add(self, row, insert):
+        patient_id = row['patient_id']
+        if patient_id in self.patients:
+            self.remove(patient_id)
+        key = normalize(row.get('name'))
+        words = set(key.split())
+        digits = phone_digits(row.get('phone_no'))
+        self.patients[patient_id] = row
+        self.keys[patient_id] = (key, words, digits)
+        insert(self.names, (key, patient_id))
+        for word in words:
+            insert(self.words, (word, key, patient_id))
+            self.sounds.setdefault(sound(word), set()).add(patient_id)
+        for suffix in self._suffixes(digits):
+            insert(self.suffixes, (suffix, key, patient_id))
+        for gram in trigrams(key):
+            self.grams.setdefault(gram, set()).add(patient_id)
+
+    def remove(self, patient_id):
+        if patient_id not in self.patients:
+            return
+        key, words, digits = self.keys.pop(patient_id)
+        del self.patients[patient_id]
+        self._discard(self.names, (key, patient_id))
+        for word in words:
+            self._discard(self.words, (word, key, patient_id))
+            self._discard_id(self.sounds, sound(word), patient_id)
+        for suffix in self._suffixes(digits):
+            self._discard(self.suffixes, (suffix, key, patient_id))
+        for gram in trigrams(key):
+            self._discard_id(self.grams, gram, patient_id)
+
+    @staticmethod
+    def _suffixes(digits):
+        return [digits[i:] for i in range(len(digits) - MIN_PHONE_SUFFIX + 1)]
+
+    @staticmethod
+    def _discard(entries, entry):
+        i = bisect.bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+
+    @staticmethod
+    def _discard_id(postings, key, patient_id):
+        ids = postings.get(key)
+        if ids is not None:
+            ids.discard(patient_id)
+            if not ids:
+                del postings[key]
+
+    @staticmethod
+    def _prefix_range(entries, prefix):
+        """Entries whose first field starts with prefix, in sorted order."""
+        i = bisect.bisect_left(entries, (prefix,))
+        while i < len(entries) and entries[i][0].startswith(prefix):
+            yield entries[i]
+            i += 1
+
+    # Each tier yields ids best first, skipping ids earlier tiers found, and
+    # stops when the scan budget runs out; search() stops pulling once it has enough
+
+    def _name_prefix(self, query, scan):
+        for _, patient_id in self._prefix_range(self.names, query):
+            if not scan.take():
+                return
+            yield patient_id
+
+    def _range_size(self, entries, prefix):
+        return bisect.bisect_left(entries, (prefix + '\uffff',)) - bisect.bisect_left(entries, (prefix,))
+
+    def _word_prefix(self, words, seen, scan):
+        # Walk the rarest query word's range and check the others per patient
+        driver = min(words, key=lambda word: self._range_size(self.words, word))
+        rest = [word for word in words if word is not driver]
+        for _, _, patient_id in self._prefix_range(self.words, driver):
+            if patient_id in seen:
+                continue
+            if not scan.take():
+                return
+            name_words = self.keys[patient_id][1]
+            if all(any(w.startswith(q) for w in name_words) for q in rest):
+                yield patient_id
+
+    def _substring(self, query, seen, scan):
+        if len(query) < 3:
+            return
+        # Only the query's inner trigrams: its padded edges would require word boundaries
+        grams = {query[i:i + 3] for i in range(len(query) - 2)}
+        postings = sorted((self.grams.get(gram, set()) for gram in grams), key=len)
+        if not postings or not postings[0]:
+            return
+        found = []
+        for patient_id in postings[0].intersection(*postings[1:]) - seen:
+            if not scan.take():
+                break
+            if query in self.keys[patient_id][0]:
+                found.append(patient_id)
+        yield from sorted(found, key=lambda i: self.keys[i][0])
+
+    def _phonetic(self, words, seen, scan):
+        sets = [self.sounds.get(sound(word), set()) for word in words]
+        if not sets or not sets[0]:
+            return
+        found = []
+        for patient_id in sets[0].intersection(*sets[1:]) - seen:
+            if not scan.take():
+                break
+            found.append(patient_id)
+        yield from sorted(found, key=lambda i: self.keys[i][0])
+
+    def _phone(self, digits, scan):
+        if len(digits) >= MIN_PHONE_SUFFIX:
+            # A suffix equal to the query sorts first, so numbers ending in the
+            # typed digits come before numbers merely containing them
+            candidates = (patient_id for _, _, patient_id in self._prefix_range(self.suffixes, digits))
+        else:
+            candidates = (i for i, key in self.keys.items() if digits in key[2])
+        for patient_id in candidates:
+            if not scan.take():
+                return
+            yield patient_id
+
+    def search(self, name='', phone='', sex=None, limit=DEFAULT_LIMIT, offset=0):
+        """(page of {'patient', 'match'}, total matches, truncated)."""
+        query = normalize(name)
+        digits = phone_digits(phone)
+        if not query and not digits:
+            return [], 0, False
+
+        matches = []
+        seen = set()
+        scan = _Scan(SEARCH_MAX_SCAN)
+        if query:
+            words = query.split()
+            tiers = [(NAME_PREFIX, self._name_prefix(query, scan)),
+                     (WORD_PREFIX, self._word_prefix(words, seen, scan)),
+                     (SUBSTRING, self._substring(query, seen, scan)),
+                     (PHONETIC, self._phonetic(words, seen, scan))]
+        else:
+            tiers = [(PHONE, self._phone(digits, scan))]
+
+        def accept(patient_id):
+            if sex and self.patients[patient_id].get('sex') != sex:
+                return False
+            return not (query and digits) or digits in self.keys[patient_id][2]
+
+        truncated = False
+        for tier, ids in tiers:
+            for patient_id in ids:
+                if patient_id in seen:
+                    continue
+                seen.add(patient_id)
+                if accept(patient_id):
+                    if len(matches) == SEARCH_MAX_MATCHES:
+                        truncated = True
+                        break
+                    matches.append((patient_id, tier))
+            if truncated:
+                break
+        truncated = truncated or scan.left < 0
+
+        page = [{'patient': self.patients[patient_id], 'match': MATCH_NAMES[tier]}
+                for patient_id, tier in matches[offset:offset + limit]]
+        return page, len(matches), truncated
+
+
+# ============= MODULE STATE =============
+
+_lock = threading.RLock()
+_index = PatientIndex()
+_loaded_at = 0.0
+_updated_at = 0.0
+# Latest updated_at/deleted_at applied, or the highest patient_id without change tracking
+_watermark = None
+_tracks_changes = True
+_refreshing = False
+_latencies = deque(maxlen=LATENCY_SAMPLES)
+stats = {'loads': 0, 'top_ups': 0, 'queries': 0, 'reindexed': 0}
+
+
+def _parse_timestamp(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _latest(watermark, value):
+    if not value:
+        return watermark
+    value = _parse_timestamp(value)
+    return value if watermark is None else max(watermark, value)
+
+
+def _missing_column(error):
+    """Whether a read failed because a selected column does not exist (42703)."""
+    # PostgREST's APIError carries the Postgres code; SQLAlchemy errors wrap the driver's
+    code = getattr(error, 'code', None) or getattr(getattr(error, 'orig', None), 'pgcode', None)
+    if code == '42703':
+        return True
+    message = str(error).lower()
+    return 'column' in message and ('does not exist' in message or 'no such column' in message)
+
+
+def _read_patients(filters=None, client=None):
+    """(rows, latest updated_at) with change tracking, else (rows, None)."""
+    if not _tracks_changes:
+        return list(db_repo.iter_records('patients', PATIENT_COLUMNS, filters, client=client)), None
+    latest = None
+    rows = list(db_repo.iter_records('patients', f'{PATIENT_COLUMNS}, updated_at', filters, client=client))
+    for row in rows:
+        latest = _latest(latest, row.pop('updated_at', None))
+    return rows, latest
+
+
+def load(client=None):
+    """Rebuild the index from the patients table."""
+    global _index, _loaded_at, _updated_at, _watermark, _tracks_changes
+    try:
+        rows, watermark = _read_patients(client=client)
+    except Exception as e:
+        # Anything but a missing updated_at (timeouts, an exhausted pool) must not switch tracking off for good
+        if not _tracks_changes or not _missing_column(e):
+            raise
+        logging.warning('patients.updated_at unavailable (run create_patient_index_tracking.sql); '
+                        'only new patients are picked up between full reloads', exc_info=True)
+        _tracks_changes = False
+        rows, watermark = _read_patients(client=client)
+    if not _tracks_changes:
+        watermark = max((row['patient_id'] for row in rows), default=None)
+    index = PatientIndex()
+    index.add_many(rows)
+    now = time.time()
+    with _lock:
+        _index = index
+        _loaded_at = now
+        _updated_at = now
+        _watermark = watermark
+        stats['loads'] += 1
+
+
+def _top_up():
+    """Apply patients changed or deleted since the watermark."""
+    global _updated_at, _watermark
+    watermark = _watermark
+    deleted = []
+    if not _tracks_changes:
+        filters = [('gt', 'patient_id', watermark)] if watermark is not None else None
+        rows, _ = _read_patients(filters)
+        if rows:
+            watermark = max(watermark or 0, max(row['patient_id'] for row in rows))
+    else:
+        filters = None
+        if watermark is not None:
+            filters = [('gt', 'updated_at', (watermark - HWM_OVERLAP).isoformat())]
+            deleted = list(db_repo.iter_records(DELETIONS_TABLE, 'patient_id, deleted_at',
+                                                [('gt', 'deleted_at', filters[0][2])], key='patient_id'))
+        rows, latest = _read_patients(filters)
+        for row in deleted:
+            latest = _latest(latest, row['deleted_at'])
+        if latest is not None:
+            watermark = latest if watermark is None else max(watermark, latest)
+    with _lock:
+        # Deletions first: a patient_id that is back in rows was re-created after its delete
+        for row in deleted:
+            _index.remove(row['patient_id'])
+        for row in rows:
+            _index.add(row)
+        _watermark = watermark
+        _updated_at = time.time()
+        stats['top_ups'] += 1
+
+
+def _refresh_in_background(full):
+    global _refreshing
+    with _lock:
+        if _refreshing:
+            return
+        _refreshing = True
+
+    def run():
+        global _refreshing
+        try:
+            if full:
+                load()
+            else:
+                _top_up()
+        except Exception:
+            logging.exception('Patient index refresh failed')
+        finally:
+            with _lock:
+                _refreshing = False
+
+    threading.Thread(target=run, name='patient-index-refresh', daemon=True).start()
+
+
+def warm():
+    """Build the index now (startup); returns whether it loaded."""
+    try:
+        load()
+        return True
+    except Exception:
+        logging.exception('Patient index warm-up failed')
+        return False
+
+
+def _ensure_fresh():
+    if not _loaded_at:
+        load()
+        return
+    now = time.time()
+    if now - _loaded_at > PATIENT_INDEX_TTL:
+        _refresh_in_background(full=True)
+    elif now - _updated_at > PATIENT_INDEX_REFRESH:
+        _refresh_in_background(full=False)
+
+
+def search(name='', phone='', sex=None, limit=DEFAULT_LIMIT, offset=0):
+    """Ranked patients matching a partial name and/or phone number."""
+    _ensure_fresh()
+    started = time.perf_counter()
+    with _lock:
+        result = _index.search(name, phone, sex, max(1, min(limit, MAX_LIMIT)), max(0, offset))
+        _latencies.append(time.perf_counter() - started)
+        stats['queries'] += 1
+    return result
+
+
+def reindex(patient_id, client=None):
+    """Re-read one patient after an edit or delete; returns the row, or None if it is gone."""
+    rows = list(db_repo.iter_records('patients', PATIENT_COLUMNS, [('eq', 'patient_id', patient_id)],
+                                     client=client))
+    with _lock:
+        if rows:
+            _index.add(rows[0])
+        else:
+            _index.remove(patient_id)
+        stats['reindexed'] += 1
+    return rows[0] if rows else None
+
+
+def _percentile(samples, p):
+    if not samples:
+        return None
+    return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 3)
+
+
+def get_stats():
+    with _lock:
+        samples = sorted(_latencies)
+        return {
+            **stats,
+            'size': len(_index),
+            'p50_ms': _percentile(samples, 0.50),
+            'p99_ms': _percentile(samples, 0.99),
+            'age_seconds': round(time.time() - _loaded_at, 1) if _loaded_at else None,
+        }
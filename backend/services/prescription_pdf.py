@@ -0,0 +1,440 @@
+"""
+Server-side prescription PDFs.
+
+Renders the same layout the Prescription page prints (letterhead, patient
+details, findings, diagnosis, procedures, medicines table, signature and
+doctor footer) with fpdf2, one A4 page per prescription. Content that does
+not fit above the signature continues on another page with the same
+letterhead and footer; the signature goes on the last page.
+
+- The page template (static texts, colours, column widths, logo) is built
+  once per process and reused for every document.
+- The built-in Helvetica font needs no parsing; PDF_FONT_PATH switches to a
+  TTF font for full Unicode output.
+- Rendered PDFs are kept in an LRU keyed by a hash of the document content,
+  so reprinting an unchanged prescription costs no rendering. Pages show
+  nothing but that content (no "generated on" time, unlike the browser
+  print), so a cached PDF looks exactly like a fresh render.
+- Batches are rendered in a process pool so they use every core and keep
+  the request threads free.
+"""
+
+import os
+import io
+import json
+import math
+import hashlib
+import multiprocessing
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from fpdf import FPDF, FontFace
+except ImportError:  # pragma: no cover - fpdf2 not installed
+    FPDF = None
+    FontFace = None
+
+from database import db_repo
+from services import letterhead
+from services.business_logic import process_prescription_data
+
+PDF_FONT_PATH = os.getenv('PDF_FONT_PATH')
+PDF_FONT_BOLD_PATH = os.getenv('PDF_FONT_BOLD_PATH')
+PDF_CACHE_SIZE = int(os.getenv('PDF_CACHE_SIZE', 256))
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', min(4, os.cpu_count() or 1)))
+# Batches smaller than this are rendered in the request thread
+PDF_POOL_MIN_BATCH = int(os.getenv('PDF_POOL_MIN_BATCH', 8))
+PDF_BATCH_MAX = int(os.getenv('PDF_BATCH_MAX', 500))
+
+CLINIC_NAME = 'Dr. Karthika Skin Clinic'
+CLINIC_TAGLINE = 'SKIN ✦ HAIR ✦ NAIL'
+DOCTOR_LINES = (
+    ('Dr. Karthika M.B., M.D (Derm)', 13, 'B', (201, 168, 141)),
+    ('Dermatologist & Dermatosurgeon', 10.5, '', (68, 68, 68)),
+    ('Reg. No. 69402', 9, '', (119, 119, 119)),
+    ('Specialities: Hair Transplantation | Cutaneous | LASER Surgery', 9, '', (51, 51, 51)),
+    ('#1113 to 1116, MTP Road, Opp. Central Theatre, Coimbatore – 641002', 9, '', (68, 68, 68)),
+    ('+91 95855 33120  |  +91 90878 78922', 9, '', (51, 51, 51)),
+    ('Consultation Hours: Mon-Sat: 10:00 AM - 3:00 PM | Tue/Thu/Sat: 6:00 PM - 8:00 PM | '
+     'Sun: 10:00 AM - 1:00 PM', 8, '', (34, 34, 34)),
+)
+MEDICINE_COLUMNS = (('Sr.', 8), ('Medicine', 32), ('Qty', 10), ('Time', 10), ('Area/Site', 22), ('Duration', 18))
+
+# Page layout (mm): body content stops above the signature line, which sits above the footer
+PAGE_HEIGHT = 297
+CONTENT_BOTTOM = 226
+SIGNATURE_Y = 230
+FOOTER_Y = 240
+
+ACCENT = (201, 168, 141)
+RULE = (212, 181, 160)
+PANEL = (253, 251, 247)
+
+# Characters outside Latin-1 used by the printed page, for the core font
+LATIN1_REPLACEMENTS = {
+    '✦': '*', '–': '-', '—': '-', '‘': "'", '’': "'",
+    '“': '"', '”': '"', '•': '-', '…': '...',
+}
+
+
+class PdfUnavailable(RuntimeError):
+    """fpdf2 is not installed."""
+
+
+class PrescriptionNotFound(LookupError):
+    pass
+
+
+def available():
+    return FPDF is not None
+
+
+# ============= TEMPLATE =============
+
+_template = None
+_template_lock = threading.Lock()
+
+
+def _template_spec():
+    """Static parts of the page, built once per process."""
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                try:
+                    logo, logo_hash = letterhead.jpeg(), letterhead.load()['hash']
+                except Exception:
+                    logo, logo_hash = None, None
+                _template = {
+                    'logo': logo,
+                    'unicode': bool(PDF_FONT_PATH),
+                    # Part of every cache key: a new logo or font re-renders everything
+                    'version': f"{logo_hash}:{PDF_FONT_PATH or 'helvetica'}",
+                }
+    return _template
+
+
+class _PrescriptionPDF(FPDF if FPDF is not None else object):
+
+    def __init__(self, template):
+        super().__init__(orientation='P', unit='mm', format='A4')
+        self.template = template
+        # Long content breaks onto a new page instead of running into the signature and footer
+        self.set_auto_page_break(True, margin=PAGE_HEIGHT - CONTENT_BOTTOM)
+        self.set_margins(10, 10, 10)
+        if template['unicode']:
+            self.add_font('Body', '', PDF_FONT_PATH)
+            self.add_font('Body', 'B', PDF_FONT_BOLD_PATH or PDF_FONT_PATH)
+            self.family = 'Body'
+        else:
+            self.family = 'helvetica'
+
+    def text_for(self, value):
+        text = str(value)
+        if self.template['unicode']:
+            return text
+        for char, replacement in LATIN1_REPLACEMENTS.items():
+            text = text.replace(char, replacement)
+        return text.encode('latin-1', 'replace').decode('latin-1')
+
+    def font(self, size, style='', color=(34, 34, 34)):
+        self.set_font(self.family, style, size)
+        self.set_text_color(*color)
+
+    def header(self):
+        # Called by fpdf2 on every page, continuation pages included
+        self.header_block()
+
+    def footer(self):
+        self.footer_block()
+
+    def header_block(self):
+        if self.template['logo']:
+            self.image(io.BytesIO(self.template['logo']), x=10, y=10, w=24, h=24, keep_aspect_ratio=True)
+        self.set_xy(10, 13)
+        self.font(24, 'B', ACCENT)
+        self.cell(0, 11, self.text_for(CLINIC_NAME), align='C', new_x='LMARGIN', new_y='NEXT')
+        self.font(13, '', (85, 85, 85))
+        self.cell(0, 7, self.text_for(CLINIC_TAGLINE), align='C', new_x='LMARGIN', new_y='NEXT')
+        self.set_draw_color(*RULE)
+        self.set_line_width(1)
+        self.line(10, 36, 200, 36)
+        self.set_y(40)
+
+    def patient_block(self, doc):
+        def unit(value, suffix):
+            return f'{value} {suffix}' if value else 'N/A'
+
+        fields = (
+            ('Patient ID', doc['patient_id']), ('Patient Name', doc['patient_name']),
+            ('Date', doc['date']), ('Age', unit(doc['age'], 'Years')),
+            ('Blood Pressure', unit(doc['blood_pressure'], 'mmHg')), ('Pulse', unit(doc['pulse'], 'bpm')),
+            ('Gender', doc['gender']), ('Weight', unit(doc['weight'], 'Kg')),
+        )
+        top = self.get_y()
+        self.set_fill_color(*PANEL)
+        self.rect(10, top, 190, 4 * 8 + 4, style='F')
+        for i, (label, value) in enumerate(fields):
+            x = 13 + (i % 2) * 95
+            y = top + 2 + (i // 2) * 8
+            self.set_xy(x, y)
+            self.font(11, 'B', (68, 68, 68))
+            label_text = self.text_for(f'{label}:')
+            self.cell(self.get_string_width(label_text) + 2, 8, label_text)
+            self.font(11)
+            self.cell(92 - self.get_string_width(label_text) - 2, 8, self.text_for(value))
+        self.set_y(top + 4 * 8 + 8)
+
+    def section(self, title, content, size=10):
+        self.font(13, 'B', ACCENT)
+        self.cell(0, 8, self.text_for(title), new_x='LMARGIN', new_y='NEXT')
+        self.font(size)
+        self.set_fill_color(*PANEL)
+        self.multi_cell(0, size * 0.5, self.text_for(content), fill=True, padding=2, new_x='LMARGIN', new_y='NEXT')
+        self.ln(3)
+
+    def medicines_block(self, medicines):
+        count = len(medicines)
+        size = 8 if count >= 16 else 9 if count >= 11 else 10 if count >= 6 else 11
+        self.font(13, 'B', ACCENT)
+        self.cell(0, 8, 'Medicines Prescribed', new_x='LMARGIN', new_y='NEXT')
+        self.set_draw_color(200, 200, 200)
+        self.set_line_width(0.2)
+        self.font(size)
+        with self.table(col_widths=[w for _, w in MEDICINE_COLUMNS], line_height=size * 0.55,
+                        headings_style=FontFace(emphasis='BOLD', fill_color=(255, 255, 255)),
+                        text_align='LEFT') as table:
+            heading = table.row()
+            for label, _ in MEDICINE_COLUMNS:
+                heading.cell(label)
+            for index, med in enumerate(medicines, start=1):
+                row = table.row()
+                for value in (index, med['name'], med['quantity'], med['time'], med['areasite'], med['duration']):
+                    row.cell(self.text_for(value))
+        self.ln(3)
+
+    def signature_block(self):
+        # Fixed just above the footer, like the printed page; content always ends above it
+        self.set_draw_color(85, 85, 85)
+        self.set_line_width(0.4)
+        self.line(140, SIGNATURE_Y, 195, SIGNATURE_Y)
+        self.set_xy(140, SIGNATURE_Y + 1)
+        self.font(11, '', (85, 85, 85))
+        # Below the page break trigger, so drawn with page breaks paused
+        self.set_auto_page_break(False)
+        self.cell(55, 6, "Doctor's Signature", align='C')
+        self.set_auto_page_break(True, margin=PAGE_HEIGHT - CONTENT_BOTTOM)
+
+    def footer_block(self):
+        self.set_draw_color(*RULE)
+        self.set_line_width(0.6)
+        self.line(10, FOOTER_Y, 200, FOOTER_Y)
+        self.set_y(FOOTER_Y + 2)
+        for text, size, style, color in DOCTOR_LINES:
+            self.font(size, style, color)
+            self.multi_cell(0, size * 0.45, self.text_for(text), align='C', new_x='LMARGIN', new_y='NEXT')
+
+    def add_prescription(self, doc):
+        # header() draws the letterhead and footer() the doctor footer of each page
+        self.add_page()
+        self.patient_block(doc)
+        self.section('Findings and Symptoms', doc['symptoms'])
+        self.section('Diagnosis', doc['diagnosis'])
+        self.section('Procedures', doc['procedures'])
+        if doc['medicines']:
+            self.medicines_block(doc['medicines'])
+        if doc['instructions']:
+            self.section('Instructions', doc['instructions'])
+        self.signature_block()
+
+
+def render(docs):
+    """Render processed prescription documents into one PDF (one page each)."""
+    if not available():
+        raise PdfUnavailable('fpdf2 is not installed')
+    pdf = _PrescriptionPDF(_template_spec())
+    pdf.set_title(f"prescription_{docs[0]['prescription_id']}" if len(docs) == 1 else 'prescriptions')
+    for doc in docs:
+        pdf.add_prescription(doc)
+    return bytes(pdf.output())
+
+
+def _render_each(docs):
+    """Process pool task: one PDF per document."""
+    return [render([doc]) for doc in docs]
+
+
+# ============= CACHE AND POOL =============
+
+class PdfCache:
+    """LRU of content hash -> PDF bytes."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._items[key] = data
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._items), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+
+_cache = PdfCache(PDF_CACHE_SIZE)
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Forking a threaded gunicorn worker can copy a lock another thread holds; start
+            # the renderers from a clean forkserver (spawn where there is none) instead
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            context = multiprocessing.get_context(method)
+            if method == 'forkserver':
+                context.set_forkserver_preload(['services.prescription_pdf'])
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=context)
+        return _pool
+
+
+def content_hash(docs):
+    """Hash of the documents and template version; the PDF cache key and ETag."""
+    payload = json.dumps([_template_spec()['version'], docs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+def render_cached(docs):
+    """Return (pdf_bytes, content_hash), rendering only on a cache miss."""
+    key = content_hash(docs)
+    data = _cache.get(key)
+    if data is None:
+        data = render(docs)
+        _cache.put(key, data)
+    return data, key
+
+
+def render_each_cached(docs):
+    """Return [(doc, pdf_bytes)], rendering cache misses in the process pool."""
+    keys = [content_hash([doc]) for doc in docs]
+    results = [_cache.get(key) for key in keys]
+    missing = [i for i, data in enumerate(results) if data is None]
+
+    if len(missing) < PDF_POOL_MIN_BATCH:
+        for i in missing:
+            results[i] = render([docs[i]])
+    else:
+        size = math.ceil(len(missing) / PDF_WORKERS)
+        chunks = [missing[i:i + size] for i in range(0, len(missing), size)]
+        rendered = _get_pool().map(_render_each, [[docs[i] for i in chunk] for chunk in chunks])
+        for chunk, pdfs in zip(chunks, rendered):
+            for i, data in zip(chunk, pdfs):
+                results[i] = data
+
+    for i in missing:
+        _cache.put(keys[i], results[i])
+    return list(zip(docs, results))
+
+
+def render_combined(docs):
+    """Return (pdf_bytes, content_hash) for all documents in one PDF.
+
+    Large batches are rendered in a pool process so the request thread only
+    waits on I/O; one document keeps a single copy of the fonts and logo.
+    """
+    key = content_hash(docs)
+    data = _cache.get(key)
+    if data is None:
+        if len(docs) < PDF_POOL_MIN_BATCH:
+            data = render(docs)
+        else:
+            data = _get_pool().submit(render, docs).result()
+        _cache.put(key, data)
+    return data, key
+
+
+def file_name(doc):
+    safe = ''.join(c if c.isalnum() else '_' for c in doc['file_name'])
+    return f"prescription_{doc['prescription_id']}_{safe}_{doc['date'].replace('-', '')}.pdf"
+
+
+def build_zip(rendered):
+    """ZIP of [(doc, pdf_bytes)]; PDFs are already compressed, so they are stored."""
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_STORED) as archive:
+        for doc, data in rendered:
+            archive.writestr(file_name(doc), data)
+    return out.getvalue()
+
+
+def get_stats():
+    return {**_cache.stats(), 'workers': PDF_WORKERS, 'pool_started': _pool is not None}
+
+
+# ============= DATA LOADING =============
+
+def _documents(client, prescriptions, visits=None, instructions=None):
+    """Join prescriptions with their visits, patients and medicines in bulk."""
+    if visits is None:
+        visits = db_repo.fetch_in('visits', 'visit_id', [p.get('visit_id') for p in prescriptions], client=client)
+    visits_by_id = {v['visit_id']: v for v in visits}
+    patients = db_repo.fetch_in('patients', 'patient_id', [v.get('patient_id') for v in visits], client=client)
+    patients_by_id = {p['patient_id']: p for p in patients}
+
+    medicines_by_prescription = {}
+    for med in db_repo.fetch_in('prescription_medicines', 'prescription_id',
+                                [p['prescription_id'] for p in prescriptions], client=client):
+        medicines_by_prescription.setdefault(med['prescription_id'], []).append(med)
+
+    docs = []
+    for prescription in prescriptions:
+        visit = visits_by_id.get(prescription.get('visit_id')) or {}
+        docs.append(process_prescription_data({
+            'prescription': prescription,
+            'visit': visit,
+            'patient': patients_by_id.get(visit.get('patient_id')),
+            'medicines': medicines_by_prescription.get(prescription['prescription_id'], []),
+            'instructions': instructions,
+        }))
+    return docs
+
+
+def load_document(client, prescription_id, instructions=None):
+    res = client.table('prescriptions').select('*').eq('prescription_id', prescription_id).limit(1).execute()
+    rows = res.data if hasattr(res, 'data') else []
+    if not rows:
+        raise PrescriptionNotFound(prescription_id)
+    return _documents(client, rows, instructions=instructions)[0]
+
+
+def load_documents_for_range(client, date_from, date_to):
+    """Documents for every prescription whose visit date is in [date_from, date_to]."""
+    visits = list(db_repo.iter_records('visits', '*', [('gte', 'date', date_from), ('lte', 'date', date_to)],
+                                       client=client))
+    prescriptions = db_repo.fetch_in('prescriptions', 'visit_id', [v['visit_id'] for v in visits], client=client)
+    if len(prescriptions) > PDF_BATCH_MAX:
+        raise ValueError(f'{len(prescriptions)} prescriptions in range; narrow it to at most {PDF_BATCH_MAX}')
+    docs = _documents(client, prescriptions, visits=visits)
+    docs.sort(key=lambda d: (d['date'], d['prescription_id']))
+    return docs
@@ -0,0 +1,106 @@
+"""
+Transactional prescription save.
+
+A save sends the prescription fields and the full medicine list for a
+visit. The save_prescription Postgres function (create_save_prescription_function.sql)
+diffs the list against the stored rows, touching only medicines that were
+added, changed or removed, and writes the activity log entry, all in one
+transaction behind a single RPC. A save either lands completely or not at all.
+"""
+
+from response_cache import invalidate
+from services import patient_card
+
+PRESCRIPTION_FIELDS = ('symptoms', 'findings', 'diagnosis', 'procedures')
+MEDICINE_FIELDS = ('medicine_name', 'quantity', 'time', 'areasite', 'duration')
+MAX_MEDICINES = 100
+MAX_ACTION_LENGTH = 500
+
+# SQLSTATE raised by save_prescription for an unknown visit
+VISIT_NOT_FOUND = 'P0002'
+
+
+class VisitNotFound(LookupError):
+    pass
+
+
+def _text(value, field):
+    """Blank values are stored as NULL, as the prescription form always has."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise ValueError(f'{field} must be text')
+
+
+def _id(value, field):
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be an integer') from None
+
+
+def _medicines(items):
+    if not isinstance(items, list):
+        raise ValueError('medicines must be a list')
+    if len(items) > MAX_MEDICINES:
+        raise ValueError(f'At most {MAX_MEDICINES} medicines per prescription')
+    medicines = []
+    seen = set()
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError('Each medicine must be an object')
+        medicine_id = _id(item.get('medicine_id'), 'medicine_id')
+        # A repeated id is a copied row; store it as a new medicine
+        if medicine_id in seen:
+            medicine_id = None
+        elif medicine_id is not None:
+            seen.add(medicine_id)
+        medicine = {'medicine_id': medicine_id}
+        for field in MEDICINE_FIELDS:
+            medicine[field] = _text(item.get(field), field)
+        medicines.append(medicine)
+    return medicines
+
+
+def parse(body):
+    """Validate a save request; raises ValueError with a message for the client."""
+    if not isinstance(body, dict):
+        raise ValueError('Request body must be a JSON object')
+    visit_id = _id(body.get('visit_id'), 'visit_id')
+    if visit_id is None:
+        raise ValueError('visit_id is required')
+    action = _text(body.get('log_action'), 'log_action')
+    if action and len(action) > MAX_ACTION_LENGTH:
+        raise ValueError(f'log_action is limited to {MAX_ACTION_LENGTH} characters')
+    return {
+        'visit_id': visit_id,
+        'prescription': {field: _text(body.get(field), field) for field in PRESCRIPTION_FIELDS},
+        'medicines': _medicines(body['medicines'] if body.get('medicines') is not None else []),
+        'action': action,
+    }
+
+
+def save(client, user_id, request):
+    """Apply a parsed save request; returns the saved prescription document."""
+    try:
+        res = client.rpc('save_prescription', {
+            'p_visit_id': request['visit_id'],
+            'p_prescription': request['prescription'],
+            'p_medicines': request['medicines'],
+            'p_user_uuid': user_id if request['action'] else None,
+            'p_action': request['action'],
+        }).execute()
+    except Exception as e:
+        if getattr(e, 'code', None) == VISIT_NOT_FOUND:
+            raise VisitNotFound(request['visit_id']) from None
+        raise
+
+    doc = res.data
+    if doc.get('patient_id') is not None:
+        patient_card.invalidate(doc['patient_id'])
+    if request['action']:
+        invalidate('activity_logs')
+    return doc
@@ -0,0 +1,73 @@
+"""
+Dropdown vocabularies for the prescription screens.
+
+The six custom_* tables are small and change rarely, so they are read
+together into one in-memory snapshot with a content-hash version. Writes
+through the vocabulary API invalidate this worker's snapshot; other workers
+reload when the shared 'vocabularies' cache version moves (cache_versions),
+or after the TTL when that table is missing.
+"""
+
+import os
+import time
+import json
+import hashlib
+import threading
+
+import cache_versions
+from database import db_repo
+
+VOCABULARY_TTL = float(os.getenv('VOCABULARY_TTL', 300))
+
+# kind -> (table, value column)
+VOCABULARIES = {
+    'medicines': ('custom_medicines', 'medicine_name'),
+    'quantities': ('custom_quantities', 'quantity_value'),
+    'times': ('custom_times', 'time_value'),
+    'areasites': ('custom_areasites', 'areasite_value'),
+    'durations': ('custom_durations', 'duration_value'),
+    'instructions': ('custom_instructions', 'instruction_value'),
+}
+
+_lock = threading.Lock()
+_snapshot = None
+_loaded_at = 0.0
+_shared_version = None
+
+
+def _load(client=None):
+    items = {}
+    for kind, (table, column) in VOCABULARIES.items():
+        rows = db_repo.iter_records(table, f'id, {column}', key='id', client=client)
+        values = [{'id': row['id'], 'value': row[column]} for row in rows if row.get(column)]
+        values.sort(key=lambda item: item['value'].lower())
+        items[kind] = values
+    version = hashlib.sha256(json.dumps(items, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    return {'version': version, 'items': items}
+
+
+def snapshot(client=None):
+    """{'version', 'items': {kind: [{'id', 'value'}]}}, loaded when missing or stale."""
+    global _snapshot, _loaded_at, _shared_version
+    shared = cache_versions.get('vocabularies')
+    with _lock:
+        if _snapshot is None or shared != _shared_version or time.time() - _loaded_at > VOCABULARY_TTL:
+            _snapshot = _load(client)
+            _loaded_at = time.time()
+            _shared_version = shared
+        return _snapshot
+
+
+def payload(client=None, detail=False):
+    """Bootstrap document: value lists per kind, or {id, value} items when detail is set."""
+    current = snapshot(client)
+    body = {'version': current['version']}
+    for kind, items in current['items'].items():
+        body[kind] = items if detail else [item['value'] for item in items]
+    return body
+
+
+def invalidate():
+    global _snapshot
+    with _lock:
+        _snapshot = None
@@ -1,43 +1,307 @@
 import os
+import queue
 import logging
+import threading
+
+from flask import g, has_request_context
+
+from jwt_verifier import (
+    verify_access_token,
+    cache_remote_result,
+    VALID as TOKEN_VALID,
+    INVALID as TOKEN_INVALID,
+)
 
 try:
     from supabase import create_client
 except Exception:
     create_client = None
 
+try:
+    from supabase import ClientOptions
+except Exception:
+    ClientOptions = None
+
+try:
+    import httpx
+    CONNECTION_ERRORS = (httpx.TransportError, ConnectionError)
+except Exception:
+    CONNECTION_ERRORS = (ConnectionError,)
+
+try:
+    # supabase-auth wraps transport failures in AuthRetryableError
+    from supabase_auth.errors import AuthRetryableError
+    CONNECTION_ERRORS = CONNECTION_ERRORS + (AuthRetryableError,)
+except Exception:
+    pass
+
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_KEY')
 
+# Pool tuning (per worker process). A request holds one client, so by default there is
+# one per request thread; WORKER_THREADS is set by gunicorn.conf.py and asgi.py
+SUPABASE_POOL_SIZE = int(os.getenv('SUPABASE_POOL_SIZE') or os.getenv('WORKER_THREADS') or 4)
+SUPABASE_POOL_TIMEOUT = float(os.getenv('SUPABASE_POOL_TIMEOUT', 10))
+SUPABASE_HTTP_TIMEOUT = float(os.getenv('SUPABASE_HTTP_TIMEOUT', 10))
 
-def get_admin_client():
-    """Return a Supabase client using the service role key for privileged operations."""
+
+class SupabaseClientPool:
+    """Fixed-size pool of service-role clients owned by one worker process.
+
+    Each client keeps its own keep-alive HTTP session, so reusing clients
+    avoids a TLS handshake per call. Clients are created lazily, checked out
+    for the duration of a request and rebuilt after a connection failure.
+    """
+
+    def __init__(self, url, key, size=4, acquire_timeout=10.0, http_timeout=10.0):
+        self.url = url
+        self.key = key
+        self.size = max(1, size)
+        self.acquire_timeout = acquire_timeout
+        self.http_timeout = http_timeout
+        self._lock = threading.Lock()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._in_use = 0
+        self._shared = None
+        self.hits = 0
+        self.misses = 0
+        self.reconnects = 0
+        self.timeouts = 0
+
+    def _check_fork(self):
+        # Clients inherited across fork() would share sockets with the parent
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset_state()
+
+    def _new_client(self):
+        if ClientOptions is not None:
+            options = ClientOptions(
+                postgrest_client_timeout=self.http_timeout,
+                storage_client_timeout=int(self.http_timeout),
+                auto_refresh_token=False,
+                persist_session=False,
+            )
+            return create_client(self.url, self.key, options)
+        return create_client(self.url, self.key)
+
+    def acquire(self):
+        """Check out a client, waiting up to acquire_timeout if all are busy."""
+        self._check_fork()
+        try:
+            client = self._idle.get_nowait()
+            with self._lock:
+                self.hits += 1
+                self._in_use += 1
+            return client
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+                self.misses += 1
+
+        if can_create:
+            try:
+                client = self._new_client()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            with self._lock:
+                self._in_use += 1
+            return client
+
+        try:
+            client = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            with self._lock:
+                self.timeouts += 1
+            logging.warning('Supabase client pool exhausted (size=%d)', self.size)
+            return None
+        with self._lock:
+            self.hits += 1
+            self._in_use += 1
+        return client
+
+    def release(self, client, failed=False):
+        """Return a client to the pool; failed clients are replaced on next acquire."""
+        if client is None:
+            return
+        self._check_fork()
+        with self._lock:
+            self._in_use = max(0, self._in_use - 1)
+            if failed:
+                self._created = max(0, self._created - 1)
+                self.reconnects += 1
+        if not failed:
+            self._idle.put(client)
+
+    def shared(self):
+        """Return a long-lived client for use outside a request context."""
+        self._check_fork()
+        with self._lock:
+            if self._shared is not None:
+                self.hits += 1
+                return self._shared
+            self.misses += 1
+            self._shared = self._new_client()
+            return self._shared
+
+    def reset_shared(self):
+        with self._lock:
+            if self._shared is not None:
+                self._shared = None
+                self.reconnects += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+                'hits': self.hits,
+                'misses': self.misses,
+                'reconnects': self.reconnects,
+                'timeouts': self.timeouts,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool():
+    """Return the process-wide client pool, or None if Supabase is not configured."""
+    global _pool
     if create_client is None:
         logging.warning('supabase-py not installed; supabase client unavailable')
         return None
     if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
         logging.warning('SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY not set')
         return None
-    return create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SupabaseClientPool(
+                    SUPABASE_URL,
+                    SUPABASE_SERVICE_ROLE_KEY,
+                    size=SUPABASE_POOL_SIZE,
+                    acquire_timeout=SUPABASE_POOL_TIMEOUT,
+                    http_timeout=SUPABASE_HTTP_TIMEOUT,
+                )
+    return _pool
+
+
+def get_admin_client():
+    """Return a Supabase client using the service role key for privileged operations.
+
+    Inside a Flask request the same pooled client is reused for the whole
+    request and handed back by release_admin_client() on teardown.
+    """
+    pool = get_client_pool()
+    if pool is None:
+        return None
+
+    if not has_request_context():
+        return pool.shared()
+
+    client = g.get('_supabase_client')
+    if client is None:
+        client = pool.acquire()
+        g._supabase_client = client
+    return client
+
+
+def get_shared_client():
+    """Return the process's long-lived client, even inside a request.
+
+    For small reads on behalf of in-memory caches (cache versions, the
+    users directory) that must not take a pooled client from the request.
+    """
+    pool = get_client_pool()
+    return pool.shared() if pool is not None else None
+
+
+def mark_admin_client_failed():
+    """Flag the current client as broken so it is rebuilt instead of reused."""
+    if has_request_context():
+        g._supabase_client_failed = True
+    elif _pool is not None:
+        _pool.reset_shared()
+
+
+def release_admin_client(exc=None):
+    """Teardown hook: return the request's client to the pool."""
+    client = g.pop('_supabase_client', None)
+    failed = g.pop('_supabase_client_failed', False) or isinstance(exc, CONNECTION_ERRORS)
+    if client is not None and _pool is not None:
+        _pool.release(client, failed=failed)
+
+
+def warm_pool():
+    """Create every pooled client and open its connection now rather than on the first requests."""
+    pool = get_client_pool()
+    if pool is None:
+        return False
+    clients = []
+    try:
+        for _ in range(pool.size):
+            client = pool.acquire()
+            if client is None:
+                break
+            clients.append(client)
+        for client in clients:
+            # One cheap read per client sets up its keep-alive connection (TLS included)
+            client.table('users').select('uuid').limit(1).execute()
+        return True
+    finally:
+        for client in clients:
+            pool.release(client)
+
+
+def get_pool_stats():
+    """Return pool counters for /health, or None if the pool is not configured."""
+    return _pool.stats() if _pool is not None else None
 
 
 def get_user_from_access_token(access_token: str):
+    """Return user for an access token, verifying locally when possible."""
+    status, user = verify_access_token(access_token)
+    if status == TOKEN_VALID:
+        return user
+    if status == TOKEN_INVALID:
+        return None
+
+    # Signing key unknown locally: ask Supabase Auth
+    user = _get_user_remote(access_token)
+    cache_remote_result(access_token, user)
+    return user
+
+
+def _get_user_remote(access_token: str):
     """Return user dict from access token using admin client."""
     client = get_admin_client()
     if not client:
         logging.error('get_user_from_access_token: admin client is None')
         return None
     try:
-        logging.info(f'Attempting to validate token (first 20 chars): {access_token[:20]}...')
-        
         # Try new SDK method
         if hasattr(client.auth, 'get_user'):
             res = client.auth.get_user(access_token)
-            logging.info(f'get_user response type: {type(res)}')
+            logging.debug('get_user response type: %s', type(res))
             
             # Handle AuthResponse object
             if hasattr(res, 'user'):
-                logging.info(f'Found user attribute on response: {res.user}')
                 return res.user
             
             # Handle dict response
@@ -47,16 +311,16 @@ def get_user_from_access_token(access_token: str):
                 elif res.get('user'):
                     return res.get('user')
                 else:
-                    logging.warning(f'Unexpected dict structure: {res}')
+                    logging.warning('Unexpected dict structure from get_user: keys=%s', list(res))
                     return res
             
-            logging.warning(f'Unexpected response type: {type(res)}')
+            logging.warning('Unexpected get_user response type: %s', type(res))
             return res
         
         # Fallback to old SDK method
         elif hasattr(client.auth, 'api') and hasattr(client.auth.api, 'get_user'):
             res = client.auth.api.get_user(access_token)
-            logging.info(f'api.get_user response: {res}')
+            logging.debug('api.get_user response type: %s', type(res))
             return res
         
         else:
@@ -64,5 +328,7 @@ def get_user_from_access_token(access_token: str):
             return None
             
     except Exception as e:
-        logging.error(f'get_user_from_access_token error: {e}', exc_info=True)
+        if isinstance(e, CONNECTION_ERRORS):
+            mark_admin_client_failed()
+        logging.error('get_user_from_access_token error: %s', e, exc_info=True)
         return None
@@ -0,0 +1,79 @@
+"""
+patient_index.load() falls back to patient_id tracking only when
+patients.updated_at is missing, never on a transient read failure.
+"""
+
+import pytest
+
+from database import db_repo
+from services import patient_index
+
+ROWS = [
+    {'patient_id': 1, 'name': 'Lakshmi Devi', 'phone_no': '9876543210', 'sex': 'F', 'updated_at': '2024-05-01T10:00:00+00:00'},
+    {'patient_id': 2, 'name': 'Ravi Kumar', 'phone_no': '9123456780', 'sex': 'M', 'updated_at': '2024-05-02T10:00:00+00:00'},
+]
+
+
+class APIError(Exception):
+    """Shaped like postgrest's APIError: the Postgres error code is on .code."""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(patient_index, '_tracks_changes', True)
+    monkeypatch.setattr(patient_index, '_index', patient_index.PatientIndex())
+    monkeypatch.setattr(patient_index, '_watermark', None)
+    monkeypatch.setattr(patient_index, '_loaded_at', 0.0)
+
+
+def _reads(monkeypatch, failure):
+    """Fail the first read of patients with failure, then serve ROWS (without updated_at if not selected)."""
+    calls = []
+
+    def iter_records(table, columns='*', filters=None, key=None, page_size=None, client=None):
+        calls.append(columns)
+        if len(calls) == 1:
+            raise failure
+        with_updated_at = 'updated_at' in columns
+        for row in ROWS:
+            yield {k: v for k, v in row.items() if with_updated_at or k != 'updated_at'}
+
+    monkeypatch.setattr(db_repo, 'iter_records', iter_records)
+    return calls
+
+
+@pytest.mark.parametrize('failure', [
+    ConnectionError('connection reset by peer'),
+    TimeoutError('read timed out'),
+    APIError('canceling statement due to statement timeout', '57014'),
+    RuntimeError('Supabase client unavailable'),
+])
+def test_transient_failure_keeps_change_tracking(monkeypatch, failure):
+    calls = _reads(monkeypatch, failure)
+    with pytest.raises(type(failure)):
+        patient_index.load()
+    assert patient_index._tracks_changes
+    assert len(calls) == 1
+
+    # The next load still reads updated_at and keeps a timestamp watermark
+    patient_index.load()
+    assert patient_index._tracks_changes
+    assert 'updated_at' in calls[1]
+    assert patient_index._watermark.isoformat() == '2024-05-02T10:00:00+00:00'
+
+
+@pytest.mark.parametrize('failure', [
+    APIError('column patients.updated_at does not exist', '42703'),
+    Exception('column patients.updated_at does not exist'),
+])
+def test_missing_updated_at_falls_back_to_patient_ids(monkeypatch, failure):
+    calls = _reads(monkeypatch, failure)
+    patient_index.load()
+    assert not patient_index._tracks_changes
+    assert 'updated_at' not in calls[1]
+    assert patient_index._watermark == 2
+    assert sorted(patient_index._index.patients) == [1, 2]
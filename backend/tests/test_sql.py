@@ -0,0 +1,113 @@
+"""
+database.sql against a SQLite stand-in (DATA_BACKEND=sql, DATABASE_URL=sqlite:///...).
+
+The financial summary must come out the same whichever path computed it,
+so financial_periods is checked against the PostgREST path's NumPy
+aggregation of the same rows.
+"""
+
+import pytest
+
+from database import sql
+from models.base import Base
+from services import financial_aggregation
+
+VISITS = [
+    {'visit_id': 1, 'patient_id': 1, 'date': '2024-01-01', 'consultation_fee': 300, 'drug_fee': 150,
+     'Procedure_Fee': None, 'paymentmethod': 'Cash', 'new_old': 'N', 'referral': 'Google search'},
+    {'visit_id': 2, 'patient_id': 2, 'date': '2024-01-03T10:15:00', 'consultation_fee': 300, 'drug_fee': None,
+     'Procedure_Fee': 1000, 'paymentmethod': ' card ', 'new_old': 'o', 'referral': None},
+    {'visit_id': 3, 'patient_id': 1, 'date': '2024-01-08', 'consultation_fee': 200, 'drug_fee': 50,
+     'Procedure_Fee': 0, 'paymentmethod': 'gpay', 'new_old': ' n', 'referral': 'friend'},
+    {'visit_id': 4, 'patient_id': 3, 'date': '2024-02-29', 'consultation_fee': 500, 'drug_fee': 250,
+     'Procedure_Fee': 750, 'paymentmethod': None, 'new_old': None, 'referral': 'GOOGLE maps'},
+    {'visit_id': 5, 'patient_id': 4, 'date': '', 'consultation_fee': 100, 'drug_fee': 0,
+     'Procedure_Fee': 0, 'paymentmethod': 'cash', 'new_old': 'N', 'referral': None},
+    {'visit_id': 6, 'patient_id': 4, 'date': None, 'consultation_fee': 100, 'drug_fee': 0,
+     'Procedure_Fee': 0, 'paymentmethod': 'cash', 'new_old': 'N', 'referral': None},
+]
+
+MEDICINES = [
+    {'med_id': 1, 'patient_id': 1, 'date': '2024-01-01', 'drug_fee': 80, 'payment_method': 'cash'},
+    {'med_id': 2, 'patient_id': 2, 'date': '2024-01-07', 'drug_fee': 120.5, 'payment_method': 'GPay'},
+    {'med_id': 3, 'patient_id': 3, 'date': '2024-03-01', 'drug_fee': None, 'payment_method': 'card'},
+    {'med_id': 4, 'patient_id': 3, 'date': '', 'drug_fee': 40, 'payment_method': 'card'},
+]
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(sql, 'DATABASE_URL', f"sqlite:///{tmp_path / 'clinic.db'}")
+    monkeypatch.setattr(sql, '_engine', None)
+    monkeypatch.setattr(sql, '_engine_pid', None)
+    engine = sql.get_engine()
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(sql.TABLES['visits'].insert(), VISITS)
+        conn.execute(sql.TABLES['medicines'].insert(), MEDICINES)
+    yield engine
+    engine.dispose()
+
+
+def test_supports_only_mapped_tables_and_columns():
+    assert sql.supports('visits', 'visit_id, date', [('gte', 'date', '2024-01-01')])
+    assert not sql.supports('users', 'uuid')
+    assert not sql.supports('visits', 'visit_id, diagnosis')
+    assert not sql.supports('visits', 'visit_id', [('eq', 'unmapped', 1)])
+    # '*' would return fewer fields than PostgREST does
+    assert not sql.supports('visits', '*')
+
+
+def test_iter_pages_splits_into_pages_in_key_order(engine):
+    pages = list(sql.iter_pages('visits', 'visit_id, date', key='visit_id', page_size=4))
+    assert [len(page) for page in pages] == [4, 2]
+    assert [row['visit_id'] for page in pages for row in page] == [1, 2, 3, 4, 5, 6]
+    assert pages[0][0] == {'visit_id': 1, 'date': '2024-01-01'}
+
+
+def test_iter_pages_page_size_one(engine):
+    pages = list(sql.iter_pages('medicines', 'med_id', key='med_id', page_size=1))
+    assert pages == [[{'med_id': 1}], [{'med_id': 2}], [{'med_id': 3}], [{'med_id': 4}]]
+
+
+def test_iter_pages_pushes_range_filters_into_sql(engine):
+    filters = [('gte', 'date', '2024-01-03'), ('lte', 'date', '2024-02-29')]
+    rows = [row for page in sql.iter_pages('visits', 'visit_id', filters, key='visit_id') for row in page]
+    assert [row['visit_id'] for row in rows] == [2, 3, 4]
+
+
+def test_iter_pages_in_and_eq_filters(engine):
+    rows = [row for page in sql.iter_pages('visits', 'visit_id, patient_id',
+                                           [('in_', 'patient_id', [1, 4]), ('eq', 'paymentmethod', 'cash')],
+                                           key='visit_id')
+            for row in page]
+    assert rows == [{'visit_id': 5, 'patient_id': 4}, {'visit_id': 6, 'patient_id': 4}]
+
+
+def _numpy_periods(granularity, date_from=None, date_to=None):
+    """What the PostgREST path computes: the same rows, filtered as PostgREST compares text dates."""
+    def in_range(row):
+        return ((not date_from or (row['date'] is not None and row['date'] >= date_from))
+                and (not date_to or (row['date'] is not None and row['date'] <= date_to)))
+    return financial_aggregation.aggregate(
+        financial_aggregation.visit_columns([v for v in VISITS if in_range(v)]),
+        financial_aggregation.medicine_columns([m for m in MEDICINES if in_range(m)]),
+        granularity, ('N',))
+
+
+def _assert_same_periods(actual, expected):
+    assert sorted(actual) == sorted(expected)
+    for period, stats in expected.items():
+        assert actual[period].pop('period') == stats.pop('period') == period
+        assert actual[period] == pytest.approx(stats)
+
+
+@pytest.mark.parametrize('granularity', financial_aggregation.GRANULARITIES)
+def test_financial_periods_match_numpy_path(engine, granularity):
+    _assert_same_periods(sql.financial_periods(granularity, new_patient_codes=('N',)), _numpy_periods(granularity))
+
+
+def test_financial_periods_date_range_matches_numpy_path(engine):
+    periods = sql.financial_periods('day', '2024-01-02', '2024-02-29', ('N',))
+    assert sorted(periods) == ['2024-01-03', '2024-01-07', '2024-01-08', '2024-02-29']
+    _assert_same_periods(periods, _numpy_periods('day', '2024-01-02', '2024-02-29'))
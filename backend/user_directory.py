@@ -0,0 +1,147 @@
+"""
+In-process directory of staff users (uuid -> users row).
+
+The users table is tiny and rarely changes, so it is loaded in bulk and
+kept in memory. Lookups never hit the database except to (re)load the whole
+table: on first use, after the TTL (in the background), after invalidate(),
+when an unknown uuid is requested (rate limited), or when the shared 'users'
+cache version has moved. That version is bumped by every write to users
+(create_cache_versions.sql), so a role change or revoked approval made
+through any worker, or directly in Supabase, is seen by every worker within
+CACHE_VERSION_INTERVAL seconds rather than after the TTL.
+"""
+
+import os
+import time
+import logging
+import threading
+
+import cache_versions
+from database import db_repo
+from supabase_client import get_shared_client
+
+USER_DIRECTORY_TTL = float(os.getenv('USER_DIRECTORY_TTL', 300))
+# Minimum gap between reloads triggered by unknown uuids
+MISS_RELOAD_INTERVAL = 10.0
+
+USER_FIELDS = ('uuid', 'screenname', 'email', 'role', 'approved')
+
+_lock = threading.Lock()
+# Held for the duration of a table load, so concurrent requests never load it twice
+_load_lock = threading.Lock()
+_users = {}
+_loaded_at = 0.0
+_version = None
+_refreshing = False
+stats = {'loads': 0, 'hits': 0, 'misses': 0}
+
+
+def _load():
+    global _users, _loaded_at, _version
+    # Read before the table, so a write during the load triggers another one
+    version = cache_versions.get('users')
+    # The shared client: a reload must not take a pooled client from the request that triggered it
+    users = {row['uuid']: row for row in db_repo.iter_records('users', client=get_shared_client())
+             if row.get('uuid')}
+    with _lock:
+        _users = users
+        _loaded_at = time.time()
+        _version = version
+        stats['loads'] += 1
+    return users
+
+
+def _reload():
+    """Load the table unless another thread already is, in which case keep the current map."""
+    if not _load_lock.acquire(blocking=False):
+        return _users
+    try:
+        return _load()
+    finally:
+        _load_lock.release()
+
+
+def _refresh_in_background():
+    global _refreshing
+    with _lock:
+        if _refreshing:
+            return
+        _refreshing = True
+
+    def run():
+        global _refreshing
+        try:
+            _reload()
+        except Exception:
+            logging.exception('User directory refresh failed')
+        finally:
+            with _lock:
+                _refreshing = False
+
+    threading.Thread(target=run, name='user-directory-refresh', daemon=True).start()
+
+
+def _current():
+    """Return the user map, loading it if needed and refreshing it when stale."""
+    if not _loaded_at:
+        # Nothing to serve yet: wait for whichever thread is loading
+        with _load_lock:
+            if _loaded_at:
+                return _users
+            return _load()
+    shared = cache_versions.get('users')
+    if shared is not None and shared != _version:
+        return _reload()
+    if time.time() - _loaded_at > USER_DIRECTORY_TTL:
+        _refresh_in_background()
+    return _users
+
+
+def warm():
+    """Load the directory now (startup); returns whether it loaded."""
+    try:
+        _load()
+        return True
+    except Exception:
+        logging.exception('User directory warm-up failed')
+        return False
+
+
+def invalidate():
+    """Forget cached users; the next lookup reloads the table."""
+    global _loaded_at
+    with _lock:
+        _loaded_at = 0.0
+
+
+def get_user(uuid):
+    """Return the users row for uuid, or None."""
+    return get_users([uuid]).get(uuid)
+
+
+def get_users(uuids):
+    """Return {uuid: users row} for the uuids found."""
+    users = _current()
+    found = {u: users[u] for u in uuids if u in users}
+    if len(found) < len(set(uuids)) and time.time() - _loaded_at > MISS_RELOAD_INTERVAL:
+        # Someone new may have signed up since the last load
+        users = _reload()
+        found = {u: users[u] for u in uuids if u in users}
+    stats['hits'] += len(found)
+    stats['misses'] += len(set(uuids)) - len(found)
+    return found
+
+
+def list_users():
+    """All users as summary dicts, ordered by screenname (unnamed last)."""
+    users = [{field: row.get(field) for field in USER_FIELDS} for row in _current().values()]
+    users.sort(key=lambda u: (u['screenname'] is None, (u['screenname'] or '').lower()))
+    return users
+
+
+def display_name(user):
+    return (user or {}).get('screenname') or (user or {}).get('email') or 'Unknown User'
+
+
+def get_stats():
+    return {**stats, 'size': len(_users), 'age_seconds': round(time.time() - _loaded_at, 1) if _loaded_at else None}
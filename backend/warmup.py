@@ -0,0 +1,111 @@
+"""
+Worker warm-up and readiness.
+
+start() runs, each on its own background thread, the work the first
+requests of a fresh worker would otherwise pay for:
+- opening the pooled Supabase clients (and the async client when enabled)
+- fetching the JWKS
+- loading the users directory, the vocabularies and the medicine and
+  patient search indexes
+
+A task that fails is retried with backoff until it succeeds. /ready answers
+200 only once every task has succeeded in this process.
+
+Under gunicorn.conf.py the app is imported once in the master and forked.
+The master must not start these threads, because threads do not survive
+fork and a lock held at fork time would stay held in the worker. So
+WARMUP_ON_FORK is set there, and each worker calls start() in post_fork.
+It then waits up to WARMUP_TIMEOUT seconds before accepting connections.
+"""
+
+import os
+import time
+import logging
+import threading
+
+import async_supabase
+import jwt_verifier
+import supabase_client
+import user_directory
+from services import medicine_index, patient_index, vocabularies
+
+WARMUP_ON_FORK = os.getenv('WARMUP_ON_FORK', 'false').lower() == 'true'
+WARMUP_TIMEOUT = float(os.getenv('WARMUP_TIMEOUT', 20))
+# Longest pause between retries of a failed task
+MAX_RETRY_INTERVAL = 30
+
+TASKS = (
+    ('supabase_pool', supabase_client.warm_pool),
+    ('async_client', async_supabase.warm),
+    ('jwks', jwt_verifier.warm),
+    ('user_directory', user_directory.warm),
+    ('vocabularies', lambda: bool(vocabularies.snapshot())),
+    ('medicine_index', medicine_index.warm),
+    ('patient_index', patient_index.warm),
+)
+
+_lock = threading.Lock()
+_pid = None
+_started_at = 0.0
+_tasks = {}
+_ready = threading.Event()
+
+
+def _run(name, task):
+    attempt = 0
+    while True:
+        started = time.monotonic()
+        try:
+            ok = task()
+        except Exception:
+            logging.exception('Warm-up task %s failed', name)
+            ok = False
+        with _lock:
+            entry = _tasks[name]
+            entry['attempts'] += 1
+            if ok:
+                entry['state'] = 'ready'
+                entry['seconds'] = round(time.monotonic() - started, 3)
+                if all(t['state'] == 'ready' for t in _tasks.values()):
+                    _ready.set()
+                    logging.info('Worker %d warm in %.2f s', os.getpid(), time.monotonic() - _started_at)
+                return
+            entry['state'] = 'retrying'
+        time.sleep(min(MAX_RETRY_INTERVAL, 2 ** attempt))
+        attempt += 1
+
+
+def start():
+    """Start warming this process (again in a forked worker); returns at once."""
+    global _pid, _started_at, _ready
+    with _lock:
+        if _pid == os.getpid():
+            return
+        _pid = os.getpid()
+        _started_at = time.monotonic()
+        _ready = threading.Event()
+        _tasks.clear()
+        for name, _ in TASKS:
+            _tasks[name] = {'state': 'pending', 'attempts': 0, 'seconds': None}
+    for name, task in TASKS:
+        threading.Thread(target=_run, args=(name, task), name=f'warmup-{name}', daemon=True).start()
+
+
+def wait(timeout=WARMUP_TIMEOUT):
+    """Block until warm or timeout; returns whether the process is warm."""
+    return _ready.wait(timeout)
+
+
+def is_ready():
+    return _pid == os.getpid() and _ready.is_set()
+
+
+def get_status():
+    with _lock:
+        tasks = {name: dict(entry) for name, entry in _tasks.items()}
+    return {
+        'ready': is_ready(),
+        'pid': os.getpid(),
+        'uptime': round(time.monotonic() - _started_at, 3) if _started_at else None,
+        'tasks': tasks,
+    }
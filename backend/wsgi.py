@@ -1 +1,2 @@
-app:app
+"""WSGI entry point: gunicorn wsgi:app (settings in gunicorn.conf.py)."""
+from app import app
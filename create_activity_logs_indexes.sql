@@ -0,0 +1,12 @@
+-- =============================================
+-- INDEX FOR ACTIVITY LOG CURSOR PAGINATION
+-- Copy and paste this script into Supabase SQL Editor
+-- =============================================
+
+-- /api/activity-logs pages newest first on (created_at, log_id)
+CREATE INDEX IF NOT EXISTS idx_activity_logs_created_at_log_id
+ON activity_logs (created_at DESC, log_id DESC);
+
+-- Same ordering when filtered to one staff member
+CREATE INDEX IF NOT EXISTS idx_activity_logs_user_created_at
+ON activity_logs (user_uuid, created_at DESC, log_id DESC);
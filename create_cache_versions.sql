@@ -0,0 +1,65 @@
+-- =============================================
+-- CREATE SHARED CACHE VERSIONS
+-- Copy and paste this script into Supabase SQL Editor
+-- Every write to a cached table bumps its cache's version, so each
+-- backend worker reloads its in-memory copy within seconds
+-- =============================================
+
+CREATE TABLE IF NOT EXISTS cache_versions (
+  name TEXT PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+INSERT INTO cache_versions (name) VALUES ('vocabularies'), ('users'), ('patient_cards')
+ON CONFLICT (name) DO NOTHING;
+
+-- Statement-level trigger function; the cache name is the trigger argument
+CREATE OR REPLACE FUNCTION bump_cache_version()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO cache_versions (name, version, updated_at)
+  VALUES (TG_ARGV[0], 1, NOW())
+  ON CONFLICT (name) DO UPDATE
+    SET version = cache_versions.version + 1, updated_at = NOW();
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Dropdown vocabularies (/api/vocabularies)
+DO $$
+DECLARE
+  t TEXT;
+BEGIN
+  FOREACH t IN ARRAY ARRAY['custom_medicines', 'custom_quantities', 'custom_times',
+                           'custom_areasites', 'custom_durations', 'custom_instructions']
+  LOOP
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t || '_bump_cache_version', t);
+    EXECUTE format('CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+                   'FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_version(%L)',
+                   t || '_bump_cache_version', t, 'vocabularies');
+  END LOOP;
+END $$;
+
+-- Staff users directory (/api/auth/me, approvals and roles)
+DROP TRIGGER IF EXISTS users_bump_cache_version ON users;
+CREATE TRIGGER users_bump_cache_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users
+FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_version('users');
+
+-- Patient cards (/api/patients/<id>/card)
+DO $$
+DECLARE
+  t TEXT;
+BEGIN
+  FOREACH t IN ARRAY ARRAY['patients', 'visits', 'medicines', 'prescriptions', 'prescription_medicines']
+  LOOP
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t || '_bump_patient_cards_version', t);
+    EXECUTE format('CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+                   'FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_version(%L)',
+                   t || '_bump_patient_cards_version', t, 'patient_cards');
+  END LOOP;
+END $$;
+
+-- Verify
+SELECT name, version, updated_at FROM cache_versions ORDER BY name;
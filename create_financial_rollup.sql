@@ -0,0 +1,83 @@
+-- =============================================
+-- CREATE MONTHLY FINANCIAL ROLLUP
+-- Copy and paste this script into Supabase SQL Editor
+-- Then run the backfill once from the backend folder:
+--   python -m services.financial_rollup --backfill
+-- =============================================
+
+-- Per-month totals read by /api/financials/monthly-stats
+CREATE TABLE IF NOT EXISTS monthly_financial_rollup (
+  month TEXT PRIMARY KEY,                -- 'YYYY-MM'
+  total_visits INTEGER NOT NULL DEFAULT 0,
+  drug_visits INTEGER NOT NULL DEFAULT 0,
+  total_revenue NUMERIC NOT NULL DEFAULT 0,
+  new_patients INTEGER NOT NULL DEFAULT 0,
+  google_referrals INTEGER NOT NULL DEFAULT 0,
+  refreshed_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- High-water mark of the last incremental refresh
+CREATE TABLE IF NOT EXISTS financial_rollup_state (
+  name TEXT PRIMARY KEY,
+  high_water_mark TIMESTAMPTZ,
+  refreshed_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Track row changes on the source tables
+ALTER TABLE visits ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+ALTER TABLE medicines ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at = NOW();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS visits_set_updated_at ON visits;
+CREATE TRIGGER visits_set_updated_at
+BEFORE UPDATE ON visits
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS medicines_set_updated_at ON medicines;
+CREATE TRIGGER medicines_set_updated_at
+BEFORE UPDATE ON medicines
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+-- Months that lost a row (delete, or a date moved to another month). Changed
+-- rows are found by updated_at, but these leave nothing behind in their old month
+CREATE TABLE IF NOT EXISTS financial_rollup_dirty_months (
+  month TEXT PRIMARY KEY,                -- 'YYYY-MM'
+  marked_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION mark_rollup_month_dirty()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF OLD.date IS NOT NULL AND (TG_OP = 'DELETE' OR OLD.date IS DISTINCT FROM NEW.date) THEN
+    INSERT INTO financial_rollup_dirty_months (month, marked_at)
+    VALUES (to_char(OLD.date::date, 'YYYY-MM'), NOW())
+    ON CONFLICT (month) DO UPDATE SET marked_at = EXCLUDED.marked_at;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS visits_mark_rollup_month ON visits;
+CREATE TRIGGER visits_mark_rollup_month
+AFTER DELETE OR UPDATE OF date ON visits
+FOR EACH ROW EXECUTE FUNCTION mark_rollup_month_dirty();
+
+DROP TRIGGER IF EXISTS medicines_mark_rollup_month ON medicines;
+CREATE TRIGGER medicines_mark_rollup_month
+AFTER DELETE OR UPDATE OF date ON medicines
+FOR EACH ROW EXECUTE FUNCTION mark_rollup_month_dirty();
+
+CREATE INDEX IF NOT EXISTS idx_visits_updated_at ON visits(updated_at);
+CREATE INDEX IF NOT EXISTS idx_medicines_updated_at ON medicines(updated_at);
+CREATE INDEX IF NOT EXISTS idx_visits_date ON visits(date);
+CREATE INDEX IF NOT EXISTS idx_medicines_date ON medicines(date);
+
+-- Verify
+SELECT 'Rollup months' as table_name, COUNT(*) as count FROM monthly_financial_rollup;
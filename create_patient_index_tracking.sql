@@ -0,0 +1,50 @@
+-- =============================================
+-- PATIENT SEARCH INDEX CHANGE TRACKING
+-- Copy and paste this script into Supabase SQL Editor
+-- Lets every backend worker pick up patient edits and deletes
+-- from changes since its high-water mark
+-- =============================================
+
+-- Track row changes on patients
+ALTER TABLE patients ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at = NOW();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS patients_set_updated_at ON patients;
+CREATE TRIGGER patients_set_updated_at
+BEFORE UPDATE ON patients
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+CREATE INDEX IF NOT EXISTS idx_patients_updated_at ON patients(updated_at);
+
+-- Deleted rows leave no updated_at behind, so record them here
+CREATE TABLE IF NOT EXISTS patient_deletions (
+  patient_id BIGINT PRIMARY KEY,
+  deleted_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_patient_deletions_deleted_at ON patient_deletions(deleted_at);
+
+CREATE OR REPLACE FUNCTION record_patient_deletion()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO patient_deletions (patient_id, deleted_at)
+  VALUES (OLD.patient_id, NOW())
+  ON CONFLICT (patient_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS patients_record_deletion ON patients;
+CREATE TRIGGER patients_record_deletion
+AFTER DELETE ON patients
+FOR EACH ROW EXECUTE FUNCTION record_patient_deletion();
+
+-- Verify
+SELECT 'Patients tracked' as table_name, COUNT(*) as count FROM patients WHERE updated_at IS NOT NULL;
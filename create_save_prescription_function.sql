@@ -0,0 +1,134 @@
+-- =============================================
+-- TRANSACTIONAL PRESCRIPTION SAVE
+-- Copy and paste this script into Supabase SQL Editor
+-- Called by POST /api/prescriptions/save
+-- =============================================
+
+-- Saves a visit's prescription and its medicines in one transaction.
+-- p_prescription: {"symptoms", "findings", "diagnosis", "procedures"}
+-- p_medicines: [{"medicine_id", "medicine_name", "quantity", "time", "areasite", "duration"}]
+--   Rows with the medicine_id of one of this prescription's medicines update it
+--   (only when something changed); rows without one are inserted; medicines
+--   missing from the list are deleted.
+--   The result's inserted_ids maps each inserted row's 0-based position in
+--   p_medicines to its new medicine_id.
+-- p_action: optional activity_logs entry written in the same transaction.
+CREATE OR REPLACE FUNCTION save_prescription(
+  p_visit_id BIGINT,
+  p_prescription JSONB,
+  p_medicines JSONB DEFAULT '[]'::jsonb,
+  p_user_uuid UUID DEFAULT NULL,
+  p_action TEXT DEFAULT NULL
+)
+RETURNS JSONB AS $$
+DECLARE
+  v_patient_id BIGINT;
+  v_prescription_id BIGINT;
+  v_prescription_changed INTEGER := 0;
+  v_inserted INTEGER := 0;
+  v_updated INTEGER := 0;
+  v_deleted INTEGER := 0;
+  v_inserted_ids JSONB := '{}'::jsonb;
+  v_new RECORD;
+  v_medicine_id BIGINT;
+BEGIN
+  -- Locking the visit makes concurrent saves of one prescription run in turn
+  SELECT patient_id INTO v_patient_id FROM visits WHERE visit_id = p_visit_id FOR UPDATE;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'Visit % not found', p_visit_id USING ERRCODE = 'P0002';
+  END IF;
+
+  SELECT prescription_id INTO v_prescription_id
+  FROM prescriptions WHERE visit_id = p_visit_id
+  ORDER BY prescription_id LIMIT 1;
+
+  IF v_prescription_id IS NULL THEN
+    INSERT INTO prescriptions (visit_id, symptoms, findings, diagnosis, procedures)
+    VALUES (p_visit_id, p_prescription->>'symptoms', p_prescription->>'findings',
+            p_prescription->>'diagnosis', p_prescription->>'procedures')
+    RETURNING prescription_id INTO v_prescription_id;
+    v_prescription_changed := 1;
+  ELSE
+    UPDATE prescriptions
+    SET symptoms = p_prescription->>'symptoms',
+        findings = p_prescription->>'findings',
+        diagnosis = p_prescription->>'diagnosis',
+        procedures = p_prescription->>'procedures'
+    WHERE prescription_id = v_prescription_id
+      AND (symptoms, findings, diagnosis, procedures) IS DISTINCT FROM
+          (p_prescription->>'symptoms', p_prescription->>'findings',
+           p_prescription->>'diagnosis', p_prescription->>'procedures');
+    GET DIAGNOSTICS v_prescription_changed = ROW_COUNT;
+  END IF;
+
+  CREATE TEMP TABLE wanted_medicines ON COMMIT DROP AS
+  SELECT (item->>'medicine_id')::BIGINT AS medicine_id,
+         item->>'medicine_name' AS medicine_name,
+         item->>'quantity' AS quantity,
+         item->>'time' AS "time",
+         item->>'areasite' AS areasite,
+         item->>'duration' AS duration,
+         ord
+  FROM jsonb_array_elements(COALESCE(p_medicines, '[]'::jsonb)) WITH ORDINALITY AS m(item, ord);
+
+  DELETE FROM prescription_medicines pm
+  WHERE pm.prescription_id = v_prescription_id
+    AND NOT EXISTS (SELECT 1 FROM wanted_medicines w WHERE w.medicine_id = pm.medicine_id);
+  GET DIAGNOSTICS v_deleted = ROW_COUNT;
+
+  UPDATE prescription_medicines pm
+  SET medicine_name = w.medicine_name,
+      quantity = w.quantity,
+      "time" = w."time",
+      areasite = w.areasite,
+      duration = w.duration
+  FROM wanted_medicines w
+  WHERE pm.prescription_id = v_prescription_id
+    AND pm.medicine_id = w.medicine_id
+    AND (pm.medicine_name, pm.quantity, pm."time", pm.areasite, pm.duration) IS DISTINCT FROM
+        (w.medicine_name, w.quantity, w."time", w.areasite, w.duration);
+  GET DIAGNOSTICS v_updated = ROW_COUNT;
+
+  -- One row at a time, so each new medicine_id is paired with the row's position
+  FOR v_new IN
+    SELECT w.* FROM wanted_medicines w
+    WHERE NOT EXISTS (
+      SELECT 1 FROM prescription_medicines pm
+      WHERE pm.prescription_id = v_prescription_id AND pm.medicine_id = w.medicine_id
+    )
+    ORDER BY w.ord
+  LOOP
+    INSERT INTO prescription_medicines (prescription_id, medicine_name, quantity, "time", areasite, duration)
+    VALUES (v_prescription_id, v_new.medicine_name, v_new.quantity, v_new."time", v_new.areasite, v_new.duration)
+    RETURNING medicine_id INTO v_medicine_id;
+    v_inserted_ids := v_inserted_ids || jsonb_build_object((v_new.ord - 1)::TEXT, v_medicine_id);
+    v_inserted := v_inserted + 1;
+  END LOOP;
+
+  DROP TABLE wanted_medicines;
+
+  IF p_action IS NOT NULL AND p_user_uuid IS NOT NULL THEN
+    INSERT INTO activity_logs (user_uuid, action) VALUES (p_user_uuid, p_action);
+  END IF;
+
+  RETURN jsonb_build_object(
+    'patient_id', v_patient_id,
+    'prescription', (SELECT to_jsonb(p) FROM prescriptions p WHERE p.prescription_id = v_prescription_id),
+    'medicines', COALESCE((
+      SELECT jsonb_agg(to_jsonb(pm) ORDER BY pm.medicine_id)
+      FROM prescription_medicines pm WHERE pm.prescription_id = v_prescription_id
+    ), '[]'::jsonb),
+    'inserted_ids', v_inserted_ids,
+    'changes', jsonb_build_object(
+      'prescription', v_prescription_changed > 0,
+      'inserted', v_inserted,
+      'updated', v_updated,
+      'deleted', v_deleted
+    )
+  );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Medicines are read and diffed by prescription
+CREATE INDEX IF NOT EXISTS idx_prescription_medicines_prescription_id ON prescription_medicines(prescription_id);
+CREATE INDEX IF NOT EXISTS idx_prescriptions_visit_id ON prescriptions(visit_id);
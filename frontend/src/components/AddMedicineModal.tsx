@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import supabase from '../lib/supabaseClient';
 import { logActivity } from '../lib/activityLog';
+import { invalidatePatientCard } from '../lib/api/api';
 import './AddMedicineModal.css';
 
 interface AddMedicineModalProps {
@@ -121,6 +122,7 @@ export default function AddMedicineModal({ isOpen, onClose, onMedicineAdded, pre
         ]);
 
       if (insertError) throw insertError;
+      invalidatePatientCard(patient!.patient_id);
 
       // Log activity
       await logActivity(`Added Medicine Record (Medicine ID: ${nextMedId}, Patient: ${patient!.name})`);
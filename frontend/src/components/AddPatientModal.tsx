@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import supabase from '../lib/supabaseClient';
 import { logActivity } from '../lib/activityLog';
+import { reindexPatient } from '../lib/api/api';
 import './AddPatientModal.css';
 
 interface AddPatientModalProps {
@@ -135,6 +136,7 @@ export default function AddPatientModal({ isOpen, onClose, onPatientAdded }: Add
         ]);
 
       if (insertError) throw insertError;
+      reindexPatient(nextPatientId);
 
       // Log activity
       await logActivity(`Created New Patient (Patient ID: ${nextPatientId}, Name: ${formData.name.trim()})`);
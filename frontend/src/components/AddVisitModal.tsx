@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import supabase from '../lib/supabaseClient';
 import { logActivity } from '../lib/activityLog';
+import { invalidatePatientCard } from '../lib/api/api';
 import './AddVisitModal.css';
 
 interface AddVisitModalProps {
@@ -164,6 +165,7 @@ export default function AddVisitModal({ isOpen, onClose, onVisitAdded, prefilled
         ]);
 
       if (insertError) throw insertError;
+      invalidatePatientCard(patient!.patient_id);
 
       // Log activity
       await logActivity(`Added Visit (Visit ID: ${nextVisitId}) For Patient (Patient ID: ${patient!.patient_id}, Patient Name: ${patient!.name})`);
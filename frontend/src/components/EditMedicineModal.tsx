@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import supabase from '../lib/supabaseClient';
 import { logActivity } from '../lib/activityLog';
+import { invalidatePatientCard } from '../lib/api/api';
 import './EditMedicineModal.css';
 
 interface Medicine {
@@ -82,6 +83,7 @@ export default function EditMedicineModal({ isOpen, onClose, onMedicineUpdated,
         .eq('med_id', medicine.med_id);
 
       if (updateError) throw updateError;
+      invalidatePatientCard(medicine.patient_id);
 
       // Log activity
       await logActivity(`Edited Medicine Record (Medicine ID: ${medicine.med_id})`);
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import supabase, { getPatientImageUrl } from '../lib/supabaseClient';
 import { logActivity } from '../lib/activityLog';
+import { reindexPatient } from '../lib/api/api';
 import './EditPatientModal.css';
 
 interface Patient {
@@ -133,6 +134,7 @@ export default function EditPatientModal({ isOpen, onClose, onPatientUpdated, pa
         .eq('patient_id', patient.patient_id);
 
       if (updateError) throw updateError;
+      reindexPatient(patient.patient_id);
 
       // Log activity
       await logActivity(`Edited Patient (Patient ID: ${patient.patient_id}, Patient Name: ${formData.name.trim()})`);
@@ -237,7 +239,7 @@ export default function EditPatientModal({ isOpen, onClose, onPatientUpdated, pa
             {patient.pic_filename && (
               <div className="current-image">
                 <img 
-                  src={getPatientImageUrl(patient.pic_filename) || ''}
+                  src={getPatientImageUrl(patient.pic_filename, 256) || ''}
                   alt="Current"
                   className="preview-img"
                 />
@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import supabase from '../lib/supabaseClient';
-import { CLINIC_MEDICINES } from '../data/medicines';
+import { useMedicineSuggestions } from '../lib/useMedicineSuggestions';
+import { fetchVocabularies, savePrescription } from '../lib/api/api';
 import { logActivity } from '../lib/activityLog';
 import './EditPrescriptionModal.css';
 
@@ -11,6 +12,8 @@ interface CustomMedicine {
 
 interface Medicine {
   id: string;
+  // Set for rows already stored, so a save updates them instead of re-adding
+  medicine_id?: number;
   name: string;
   quantity: string;
   time: string;
@@ -40,7 +43,7 @@ export default function EditPrescriptionModal({
     medicines: [] as Medicine[],
   });
   const [loading, setLoading] = useState(false);
-  const [allMedicines, setAllMedicines] = useState<string[]>(CLINIC_MEDICINES);
+  const { getSuggestions, requestSuggestions } = useMedicineSuggestions();
   
   // Dynamic dropdown options from database
   const [quantityOptions, setQuantityOptions] = useState<string[]>(['1', '2', 'N/A', 'CUSTOM']);
@@ -57,7 +60,6 @@ export default function EditPrescriptionModal({
   const [customDurationMode, setCustomDurationMode] = useState<Record<string, boolean>>({});
 
   useEffect(() => {
-    fetchCustomMedicines();
     fetchDropdownOptions();
   }, []);
 
@@ -67,68 +69,19 @@ export default function EditPrescriptionModal({
     }
   }, [isOpen, prescriptionId]);
 
-  const fetchCustomMedicines = async () => {
-    try {
-      const { data, error } = await supabase
-        .from('custom_medicines')
-        .select('medicine_name')
-        .order('medicine_name', { ascending: true });
-
-      if (error) throw error;
-
-      const customMeds = data?.map((m: any) => m.medicine_name) || [];
-      const merged = [...CLINIC_MEDICINES, ...customMeds].sort();
-      setAllMedicines(merged);
-    } catch (error) {
-      console.error('Error fetching custom medicines:', error);
-    }
-  };
-
   const fetchDropdownOptions = async () => {
     try {
-      // Fetch quantities
-      const { data: quantitiesData } = await supabase
-        .from('custom_quantities')
-        .select('quantity_value')
-        .order('quantity_value', { ascending: true });
-      
-      if (quantitiesData && quantitiesData.length > 0) {
-        const values = quantitiesData.map(q => q.quantity_value);
-        setQuantityOptions([...values, 'CUSTOM']);
-      }
-
-      // Fetch times
-      const { data: timesData } = await supabase
-        .from('custom_times')
-        .select('time_value')
-        .order('time_value', { ascending: true });
-      
-      if (timesData && timesData.length > 0) {
-        const values = timesData.map(t => t.time_value);
-        setTimeOptions([...values, 'CUSTOM']);
-      }
-
-      // Fetch areasites
-      const { data: areasitesData } = await supabase
-        .from('custom_areasites')
-        .select('areasite_value')
-        .order('areasite_value', { ascending: true });
-      
-      if (areasitesData && areasitesData.length > 0) {
-        const values = areasitesData.map(a => a.areasite_value);
-        setAreasiteOptions([...values, 'CUSTOM']);
-      }
-
-      // Fetch durations
-      const { data: durationsData } = await supabase
-        .from('custom_durations')
-        .select('duration_value')
-        .order('duration_value', { ascending: true });
-      
-      if (durationsData && durationsData.length > 0) {
-        const values = durationsData.map(d => d.duration_value);
-        setDurationOptions([...values, 'CUSTOM']);
-      }
+      // One request for every vocabulary; unchanged lists revalidate as a 304
+      const vocab = await fetchVocabularies();
+      const withCustom = (values: string[]) => (values.length > 0 ? [...values, 'CUSTOM'] : null);
+      const quantities = withCustom(vocab.quantities);
+      if (quantities) setQuantityOptions(quantities);
+      const times = withCustom(vocab.times);
+      if (times) setTimeOptions(times);
+      const areasites = withCustom(vocab.areasites);
+      if (areasites) setAreasiteOptions(areasites);
+      const durations = withCustom(vocab.durations);
+      if (durations) setDurationOptions(durations);
     } catch (error) {
       console.error('Error fetching dropdown options:', error);
     }
@@ -156,6 +109,7 @@ export default function EditPrescriptionModal({
 
       const loadedMedicines = medsData?.map((med) => ({
         id: med.medicine_id.toString(),
+        medicine_id: med.medicine_id,
         name: med.medicine_name,
         quantity: med.quantity || '1',
         time: med.time || 'After Meal (Morning)',
@@ -215,6 +169,7 @@ export default function EditPrescriptionModal({
     setMedicineSearchTerms({ ...medicineSearchTerms, [id]: value });
     updateMedicine(id, 'name', value);
     setShowMedicineDropdown({ ...showMedicineDropdown, [id]: value.length > 0 });
+    requestSuggestions(value);
   };
 
   const selectMedicine = (id: string, medicineName: string) => {
@@ -223,12 +178,7 @@ export default function EditPrescriptionModal({
     setShowMedicineDropdown({ ...showMedicineDropdown, [id]: false });
   };
 
-  const getFilteredMedicines = (searchTerm: string) => {
-    if (!searchTerm) return [];
-    return allMedicines.filter((med) =>
-      med.toLowerCase().includes(searchTerm.toLowerCase())
-    );
-  };
+  const getFilteredMedicines = (searchTerm: string) => getSuggestions(searchTerm);
 
   const handleDelete = async () => {
     const confirmed = window.confirm(
@@ -272,47 +222,23 @@ export default function EditPrescriptionModal({
   const handleSave = async () => {
     setLoading(true);
     try {
-      // Update prescription
-      const { error: updateError } = await supabase
-        .from('prescriptions')
-        .update({
-          symptoms: formData.symptoms || null,
-          findings: null,
-          diagnosis: formData.diagnosis || null,
-          procedures: formData.procedures || null,
-        })
-        .eq('prescription_id', prescriptionId);
-
-      if (updateError) throw updateError;
-
-      // Delete all old medicines
-      const { error: deleteError } = await supabase
-        .from('prescription_medicines')
-        .delete()
-        .eq('prescription_id', prescriptionId);
-
-      if (deleteError) throw deleteError;
-
-      // Insert new medicines
-      if (formData.medicines.length > 0) {
-        const medicinesData = formData.medicines.map((med) => ({
-          prescription_id: prescriptionId,
+      // The backend diffs the medicines and saves everything, activity log included, in one transaction
+      await savePrescription({
+        visit_id: visitId,
+        symptoms: formData.symptoms || null,
+        findings: null,
+        diagnosis: formData.diagnosis || null,
+        procedures: formData.procedures || null,
+        medicines: formData.medicines.map((med) => ({
+          medicine_id: med.medicine_id ?? null,
           medicine_name: med.name,
           quantity: med.quantity,
           time: med.time,
           areasite: med.areasite,
           duration: med.duration,
-        }));
-
-        const { error: insertError } = await supabase
-          .from('prescription_medicines')
-          .insert(medicinesData);
-
-        if (insertError) throw insertError;
-      }
-
-      // Log activity
-      await logActivity(`Edited Prescription (Prescription ID: ${prescriptionId}, ${formData.medicines.length} medicines prescribed)`);
+        })),
+        log_action: `Edited Prescription (Prescription ID: ${prescriptionId}, ${formData.medicines.length} medicines prescribed)`,
+      });
 
       alert('Prescription updated successfully!');
       onSave();
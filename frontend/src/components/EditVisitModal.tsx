@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import supabase from '../lib/supabaseClient';
 import { logActivity } from '../lib/activityLog';
+import { invalidatePatientCard } from '../lib/api/api';
 import './EditVisitModal.css';
 
 interface EditVisitModalProps {
@@ -12,6 +13,7 @@ interface EditVisitModalProps {
 
 interface Visit {
   visit_id: number;
+  patient_id?: number | null;
   date: string;
   fullname: string;
   hometown: string;
@@ -101,6 +103,7 @@ export default function EditVisitModal({ isOpen, onClose, onVisitUpdated, visit
         .eq('visit_id', visit.visit_id);
 
       if (updateError) throw updateError;
+      invalidatePatientCard(visit.patient_id);
 
       // Log activity
       await logActivity(`Edited Visit (Visit ID: ${visit.visit_id})`);
@@ -153,6 +156,7 @@ export default function EditVisitModal({ isOpen, onClose, onVisitUpdated, visit
                       .eq('visit_id', visit.visit_id);
                     
                     if (deleteError) throw deleteError;
+                    invalidatePatientCard(visit.patient_id);
                     
                     // Log activity
                     await logActivity(`Deleted Visit (Visit ID: ${visit.visit_id})`);
@@ -1,31 +1,15 @@
-import supabase from './supabaseClient';
-import { useAuthStore } from './state/authStore';
+import { queueActivityLog } from './api/api';
 
 /**
  * Log an activity to the activity_logs table
+ * The backend queues the entry and writes it in a batch, so callers only wait
+ * for the session token, never for the insert.
  * @param action - Description of the action performed
  */
 export async function logActivity(action: string): Promise<void> {
   try {
-    const session = await supabase.auth.getSession();
-    const userId = session?.data?.session?.user?.id;
-
-    if (!userId) {
-      console.warn('Cannot log activity: No authenticated user');
-      return;
-    }
-
-    const { error } = await supabase
-      .from('activity_logs')
-      .insert({
-        user_uuid: userId,
-        action: action,
-      });
-
-    if (error) {
-      console.error('Failed to log activity:', error);
-    }
+    await queueActivityLog(action);
   } catch (err) {
-    console.error('Error logging activity:', err);
+    console.warn('Cannot log activity:', err);
   }
 }
@@ -55,6 +55,195 @@ export async function fetchDashboardData() {
   return r.data;
 }
 
+// ============= FINANCIALS API =============
+
+export async function fetchFinancialSummary(params: { granularity?: 'day' | 'week' | 'month'; from?: string; to?: string } = {}) {
+  const r = await api.get('/financials/summary', { headers: await authHeaders(), params });
+  return r.data;
+}
+
+// Bearer token header for backend routes that require a signed-in user
+async function authHeaders() {
+  const session = await supabase.auth.getSession();
+  const token = (session as any)?.data?.session?.access_token;
+  if (!token) throw new Error('Not authenticated');
+  return { Authorization: `Bearer ${token}` };
+}
+
+// ============= PRESCRIPTIONS API =============
+
+export interface PrescriptionMedicineInput {
+  medicine_id?: number | null;
+  medicine_name: string;
+  quantity: string;
+  time: string;
+  areasite: string;
+  duration: string;
+}
+
+export interface SavePrescriptionInput {
+  visit_id: number | string;
+  symptoms?: string | null;
+  findings?: string | null;
+  diagnosis?: string | null;
+  procedures?: string | null;
+  medicines: PrescriptionMedicineInput[];
+  // Activity log entry written in the same transaction
+  log_action?: string;
+}
+
+export interface SavedPrescription {
+  patient_id: number | null;
+  prescription: Record<string, any> & { prescription_id: number; visit_id: number };
+  medicines: (PrescriptionMedicineInput & { medicine_id: number; prescription_id: number })[];
+  // Position in the request's medicines -> medicine_id, for rows that were inserted
+  inserted_ids: Record<string, number>;
+  changes: { prescription: boolean; inserted: number; updated: number; deleted: number };
+}
+
+// Create or update a visit's prescription and its medicines in one transaction
+export async function savePrescription(input: SavePrescriptionInput) {
+  const headers = await authHeaders();
+  const r = await api.post('/prescriptions/save', input, { headers });
+  return r.data as SavedPrescription;
+}
+
+// ============= MEDICINES API =============
+
+export interface MedicineSuggestion {
+  id: number;
+  name: string;
+  uses: number;
+  match: 'prefix' | 'brand' | 'generic' | 'substring' | 'fuzzy';
+}
+
+// Ranked dropdown suggestions for a partially typed medicine name
+export async function suggestMedicines(q: string, limit = 15) {
+  const headers = await authHeaders();
+  const r = await api.get('/medicines/suggest', { headers, params: { q, limit } });
+  return r.data.suggestions as MedicineSuggestion[];
+}
+
+// ============= PATIENTS API =============
+
+export interface PatientSearchResult<T = Record<string, any>> {
+  patient: T;
+  match: 'prefix' | 'word' | 'substring' | 'phonetic' | 'phone';
+}
+
+export interface PatientSearchParams {
+  q?: string;
+  phone?: string;
+  sex?: string;
+  limit?: number;
+  offset?: number;
+}
+
+// Ranked patient search by partial name and/or phone digits; `truncated`
+// means there are more matches than `total` counts
+export async function searchPatients<T = Record<string, any>>(params: PatientSearchParams) {
+  const headers = await authHeaders();
+  const r = await api.get('/patients/search', { headers, params });
+  return r.data as { results: PatientSearchResult<T>[]; total: number; truncated: boolean };
+}
+
+// Call after adding, editing or deleting a patient so search sees it immediately
+export async function reindexPatient(patientId: number) {
+  try {
+    const headers = await authHeaders();
+    await api.post(`/patients/${patientId}/reindex`, null, { headers });
+  } catch (err) {
+    console.error('Failed to refresh patient search index:', err);
+  }
+}
+
+export interface PatientCard<P = Record<string, any>, V = Record<string, any>, M = Record<string, any>> {
+  patient: P;
+  visits: V[];
+  medicines: M[];
+  stats: {
+    total_visits: number;
+    total_drug_fees: number;
+    total_consultation_fees: number;
+    total_procedure_fees: number;
+    payment_methods: string[];
+  };
+}
+
+// Patient, visits (newest first, each with its prescription and medicines),
+// medicine purchases and totals in one request
+export async function fetchPatientCard<P = Record<string, any>, V = Record<string, any>, M = Record<string, any>>(
+  patientId: number | string,
+  options: { fresh?: boolean; fields?: string[] } = {}
+) {
+  const headers = await authHeaders();
+  const params: Record<string, string> = {};
+  if (options.fresh) params.fresh = '1';
+  if (options.fields) params.fields = options.fields.join(',');
+  const r = await api.get(`/patients/${patientId}/card`, { headers, params });
+  return r.data as PatientCard<P, V, M>;
+}
+
+// Call after writing a patient's visits, medicines or prescriptions
+export async function invalidatePatientCard(patientId: number | string | null | undefined) {
+  if (!patientId) return;
+  try {
+    const headers = await authHeaders();
+    await api.delete(`/patients/${patientId}/card`, { headers });
+  } catch (err) {
+    console.error('Failed to invalidate patient card:', err);
+  }
+}
+
+// ============= VOCABULARIES API =============
+
+export type VocabularyKind = 'medicines' | 'quantities' | 'times' | 'areasites' | 'durations' | 'instructions';
+
+export interface VocabularyItem {
+  id: number;
+  value: string;
+}
+
+export type Vocabularies<T = string> = { version: string } & Record<VocabularyKind, T[]>;
+
+// All dropdown vocabularies in one request; the browser revalidates with the
+// ETag, so unchanged lists come back as a 304
+export async function fetchVocabularies(): Promise<Vocabularies>;
+export async function fetchVocabularies(detail: true): Promise<Vocabularies<VocabularyItem>>;
+export async function fetchVocabularies(detail = false) {
+  const headers = await authHeaders();
+  const r = await api.get('/vocabularies', { headers, params: detail ? { detail: 1 } : {} });
+  return r.data;
+}
+
+export async function createVocabularyItem(kind: VocabularyKind, value: string) {
+  const headers = await authHeaders();
+  const r = await api.post(`/vocabularies/${kind}`, { value }, { headers });
+  return r.data as VocabularyItem;
+}
+
+export async function updateVocabularyItem(kind: VocabularyKind, id: number, value: string) {
+  const headers = await authHeaders();
+  const r = await api.put(`/vocabularies/${kind}/${id}`, { value }, { headers });
+  return r.data as VocabularyItem;
+}
+
+export async function deleteVocabularyItem(kind: VocabularyKind, id: number) {
+  const headers = await authHeaders();
+  await api.delete(`/vocabularies/${kind}/${id}`, { headers });
+}
+
+// ============= ACTIVITY LOGS API =============
+
+// Queue an activity log entry. Resolves once the token is read and the request is
+// on its way; the backend writes entries in batches, so nothing waits on the database.
+export async function queueActivityLog(action: string) {
+  const headers = await authHeaders();
+  api.post('/activity-logs', { action }, { headers }).catch((err) => {
+    console.error('Failed to log activity:', err);
+  });
+}
+
 // ============= ADD MORE API FUNCTIONS HERE =============
 
 export default api;
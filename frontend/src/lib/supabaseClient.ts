@@ -27,10 +27,19 @@ export const supabase = createClient(SUPABASE_URL, SUPABASE_ANON, {
     },
 })
 
-// Helper function to get patient image URL from Supabase Storage
-export const getPatientImageUrl = (filename: string | null): string | null => {
+// Helper function to get patient image URL. Served through the backend image
+// cache (resized to `width` when given); falls back to Supabase Storage.
+export const getPatientImageUrl = (filename: string | null, width?: number, version?: number): string | null => {
     if (!filename) return null;
-    return `${SUPABASE_URL}/storage/v1/object/public/patient_images/${filename}`;
+    const apiUrl = import.meta.env.VITE_API_URL;
+    if (!apiUrl) {
+        return `${SUPABASE_URL}/storage/v1/object/public/patient_images/${filename}`;
+    }
+    const params = new URLSearchParams();
+    if (width) params.append('w', width.toString());
+    if (version) params.append('v', version.toString());
+    const query = params.toString();
+    return `${apiUrl}/patients/image/${encodeURIComponent(filename)}${query ? `?${query}` : ''}`;
 }
 
 export default supabase
@@ -0,0 +1,34 @@
+import { useRef, useState } from 'react';
+import { suggestMedicines } from './api/api';
+import { CLINIC_MEDICINES } from '../data/medicines';
+
+// Medicine dropdown suggestions from the backend index (/medicines/suggest).
+// Until a term's results arrive, or if the request fails, the built-in
+// medicine list is filtered locally.
+export function useMedicineSuggestions() {
+  const [results, setResults] = useState<Record<string, string[]>>({});
+  const timer = useRef<ReturnType<typeof setTimeout> | null>(null);
+
+  // Call from input handlers; requests are debounced to one per pause in typing
+  const requestSuggestions = (term: string) => {
+    const key = term.trim().toLowerCase();
+    if (timer.current) clearTimeout(timer.current);
+    if (!key || results[key]) return;
+    timer.current = setTimeout(async () => {
+      try {
+        const suggestions = await suggestMedicines(key);
+        setResults((prev) => ({ ...prev, [key]: suggestions.map((s) => s.name) }));
+      } catch (err) {
+        console.error('Failed to fetch medicine suggestions:', err);
+      }
+    }, 120);
+  };
+
+  const getSuggestions = (term: string) => {
+    const key = term.trim().toLowerCase();
+    if (!key) return [];
+    return results[key] ?? CLINIC_MEDICINES.filter((med) => med.toLowerCase().includes(key));
+  };
+
+  return { getSuggestions, requestSuggestions };
+}
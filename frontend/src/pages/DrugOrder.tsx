@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
-import supabase from '../lib/supabaseClient';
 import { logActivity } from '../lib/activityLog';
+import { fetchVocabularies, createVocabularyItem, updateVocabularyItem, deleteVocabularyItem } from '../lib/api/api';
 import './DrugOrder.css';
 
 interface CustomMedicine {
@@ -35,6 +35,13 @@ interface CustomInstruction {
 
 type TabType = 'medicines' | 'quantities' | 'times' | 'frequencies' | 'durations' | 'instructions';
 
+// Insert or replace an item by id, keeping the list sorted like the backend sends it
+function withItem<T extends { id: number }>(list: T[], item: T, field: keyof T): T[] {
+  const value = (entry: T) => String(entry[field]).toLowerCase();
+  return [...list.filter((entry) => entry.id !== item.id), item]
+    .sort((a, b) => (value(a) < value(b) ? -1 : value(a) > value(b) ? 1 : 0));
+}
+
 export default function DrugOrder() {
   const [activeTab, setActiveTab] = useState<TabType>('medicines');
   
@@ -71,31 +78,25 @@ export default function DrugOrder() {
     fetchAllData();
   }, []);
 
-  const fetchAllData = () => {
-    fetchCustomMedicines();
-    fetchCustomQuantities();
-    fetchCustomTimes();
-    fetchCustomFrequencies();
-    fetchCustomDurations();
-    fetchCustomInstructions();
-  };
-
-  // MEDICINES CRUD
-  const fetchCustomMedicines = async () => {
+  // All six lists come from one request. After a write the lists are updated
+  // from the item the write returns rather than refetched: another worker
+  // may still serve its cached copy for up to CACHE_VERSION_INTERVAL seconds
+  const fetchAllData = async () => {
     try {
-      const { data, error } = await supabase
-        .from('custom_medicines')
-        .select('*')
-        .order('medicine_name', { ascending: true });
-
-      if (error) throw error;
-      setCustomMedicines(data || []);
+      const vocab = await fetchVocabularies(true);
+      setCustomMedicines(vocab.medicines.map(({ id, value }) => ({ id, medicine_name: value })));
+      setCustomQuantities(vocab.quantities.map(({ id, value }) => ({ id, quantity_value: value })));
+      setCustomTimes(vocab.times.map(({ id, value }) => ({ id, time_value: value })));
+      setCustomFrequencies(vocab.areasites.map(({ id, value }) => ({ id, areasite_value: value })));
+      setCustomDurations(vocab.durations.map(({ id, value }) => ({ id, duration_value: value })));
+      setCustomInstructions(vocab.instructions.map(({ id, value }) => ({ id, instruction_value: value })));
     } catch (error: any) {
-      console.error('Error fetching medicines:', error);
+      console.error('Error fetching dropdown values:', error);
       alert('Failed to load medicines');
     }
   };
 
+  // MEDICINES CRUD
   const addMedicine = async () => {
     if (!newMedicine.trim()) {
       alert('Please enter a medicine name');
@@ -104,15 +105,11 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_medicines')
-        .insert([{ medicine_name: newMedicine.trim() }]);
-
-      if (error) throw error;
+      const item = await createVocabularyItem('medicines', newMedicine.trim());
 
       await logActivity(`Added custom medicine: ${newMedicine.trim()}`);
       setNewMedicine('');
-      fetchCustomMedicines();
+      setCustomMedicines((list) => withItem(list, { id: item.id, medicine_name: item.value }, 'medicine_name'));
     } catch (error: any) {
       console.error('Error adding medicine:', error);
       alert('Failed to add medicine');
@@ -129,17 +126,12 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_medicines')
-        .update({ medicine_name: editingValue.trim() })
-        .eq('id', id);
-
-      if (error) throw error;
+      const item = await updateVocabularyItem('medicines', id, editingValue.trim());
 
       await logActivity(`Updated custom medicine ID ${id}`);
       setEditingId(null);
       setEditingValue('');
-      fetchCustomMedicines();
+      setCustomMedicines((list) => withItem(list, { id: item.id, medicine_name: item.value }, 'medicine_name'));
     } catch (error: any) {
       console.error('Error updating medicine:', error);
       alert('Failed to update medicine');
@@ -153,15 +145,10 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_medicines')
-        .delete()
-        .eq('id', id);
-
-      if (error) throw error;
+      await deleteVocabularyItem('medicines', id);
 
       await logActivity(`Deleted custom medicine: ${name}`);
-      fetchCustomMedicines();
+      setCustomMedicines((list) => list.filter((entry) => entry.id !== id));
     } catch (error: any) {
       console.error('Error deleting medicine:', error);
       alert('Failed to delete medicine');
@@ -171,20 +158,6 @@ export default function DrugOrder() {
   };
 
   // QUANTITIES CRUD
-  const fetchCustomQuantities = async () => {
-    try {
-      const { data, error } = await supabase
-        .from('custom_quantities')
-        .select('*')
-        .order('quantity_value', { ascending: true });
-
-      if (error) throw error;
-      setCustomQuantities(data || []);
-    } catch (error: any) {
-      console.error('Error fetching quantities:', error);
-    }
-  };
-
   const addQuantity = async () => {
     if (!newQuantity.trim()) {
       alert('Please enter a quantity value');
@@ -193,15 +166,11 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_quantities')
-        .insert([{ quantity_value: newQuantity.trim() }]);
-
-      if (error) throw error;
+      const item = await createVocabularyItem('quantities', newQuantity.trim());
 
       await logActivity(`Added custom quantity: ${newQuantity.trim()}`);
       setNewQuantity('');
-      fetchCustomQuantities();
+      setCustomQuantities((list) => withItem(list, { id: item.id, quantity_value: item.value }, 'quantity_value'));
     } catch (error: any) {
       console.error('Error adding quantity:', error);
       alert('Failed to add quantity');
@@ -218,17 +187,12 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_quantities')
-        .update({ quantity_value: editingValue.trim() })
-        .eq('id', id);
-
-      if (error) throw error;
+      const item = await updateVocabularyItem('quantities', id, editingValue.trim());
 
       await logActivity(`Updated custom quantity ID ${id}`);
       setEditingId(null);
       setEditingValue('');
-      fetchCustomQuantities();
+      setCustomQuantities((list) => withItem(list, { id: item.id, quantity_value: item.value }, 'quantity_value'));
     } catch (error: any) {
       console.error('Error updating quantity:', error);
       alert('Failed to update quantity');
@@ -242,15 +206,10 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_quantities')
-        .delete()
-        .eq('id', id);
-
-      if (error) throw error;
+      await deleteVocabularyItem('quantities', id);
 
       await logActivity(`Deleted custom quantity: ${value}`);
-      fetchCustomQuantities();
+      setCustomQuantities((list) => list.filter((entry) => entry.id !== id));
     } catch (error: any) {
       console.error('Error deleting quantity:', error);
       alert('Failed to delete quantity');
@@ -260,20 +219,6 @@ export default function DrugOrder() {
   };
 
   // TIMES CRUD
-  const fetchCustomTimes = async () => {
-    try {
-      const { data, error } = await supabase
-        .from('custom_times')
-        .select('*')
-        .order('time_value', { ascending: true });
-
-      if (error) throw error;
-      setCustomTimes(data || []);
-    } catch (error: any) {
-      console.error('Error fetching times:', error);
-    }
-  };
-
   const addTime = async () => {
     if (!newTime.trim()) {
       alert('Please enter a time value');
@@ -282,15 +227,11 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_times')
-        .insert([{ time_value: newTime.trim() }]);
-
-      if (error) throw error;
+      const item = await createVocabularyItem('times', newTime.trim());
 
       await logActivity(`Added custom time: ${newTime.trim()}`);
       setNewTime('');
-      fetchCustomTimes();
+      setCustomTimes((list) => withItem(list, { id: item.id, time_value: item.value }, 'time_value'));
     } catch (error: any) {
       console.error('Error adding time:', error);
       alert('Failed to add time');
@@ -307,17 +248,12 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_times')
-        .update({ time_value: editingValue.trim() })
-        .eq('id', id);
-
-      if (error) throw error;
+      const item = await updateVocabularyItem('times', id, editingValue.trim());
 
       await logActivity(`Updated custom time ID ${id}`);
       setEditingId(null);
       setEditingValue('');
-      fetchCustomTimes();
+      setCustomTimes((list) => withItem(list, { id: item.id, time_value: item.value }, 'time_value'));
     } catch (error: any) {
       console.error('Error updating time:', error);
       alert('Failed to update time');
@@ -331,15 +267,10 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_times')
-        .delete()
-        .eq('id', id);
-
-      if (error) throw error;
+      await deleteVocabularyItem('times', id);
 
       await logActivity(`Deleted custom time: ${value}`);
-      fetchCustomTimes();
+      setCustomTimes((list) => list.filter((entry) => entry.id !== id));
     } catch (error: any) {
       console.error('Error deleting time:', error);
       alert('Failed to delete time');
@@ -349,20 +280,6 @@ export default function DrugOrder() {
   };
 
   // FREQUENCIES CRUD
-  const fetchCustomFrequencies = async () => {
-    try {
-      const { data, error } = await supabase
-        .from('custom_areasites')
-        .select('*')
-        .order('areasite_value', { ascending: true });
-
-      if (error) throw error;
-      setCustomFrequencies(data || []);
-    } catch (error: any) {
-      console.error('Error fetching frequencies:', error);
-    }
-  };
-
   const addFrequency = async () => {
     if (!newFrequency.trim()) {
       alert('Please enter a frequency value');
@@ -371,15 +288,11 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_areasites')
-        .insert([{ areasite_value: newFrequency.trim() }]);
-
-      if (error) throw error;
+      const item = await createVocabularyItem('areasites', newFrequency.trim());
 
       await logActivity(`Added custom frequency: ${newFrequency.trim()}`);
       setNewFrequency('');
-      fetchCustomFrequencies();
+      setCustomFrequencies((list) => withItem(list, { id: item.id, areasite_value: item.value }, 'areasite_value'));
     } catch (error: any) {
       console.error('Error adding frequency:', error);
       alert('Failed to add frequency');
@@ -396,17 +309,12 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_areasites')
-        .update({ areasite_value: editingValue.trim() })
-        .eq('id', id);
-
-      if (error) throw error;
+      const item = await updateVocabularyItem('areasites', id, editingValue.trim());
 
       await logActivity(`Updated custom frequency ID ${id}`);
       setEditingId(null);
       setEditingValue('');
-      fetchCustomFrequencies();
+      setCustomFrequencies((list) => withItem(list, { id: item.id, areasite_value: item.value }, 'areasite_value'));
     } catch (error: any) {
       console.error('Error updating frequency:', error);
       alert('Failed to update frequency');
@@ -420,15 +328,10 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_areasites')
-        .delete()
-        .eq('id', id);
-
-      if (error) throw error;
+      await deleteVocabularyItem('areasites', id);
 
       await logActivity(`Deleted custom frequency: ${value}`);
-      fetchCustomFrequencies();
+      setCustomFrequencies((list) => list.filter((entry) => entry.id !== id));
     } catch (error: any) {
       console.error('Error deleting frequency:', error);
       alert('Failed to delete frequency');
@@ -438,20 +341,6 @@ export default function DrugOrder() {
   };
 
   // DURATIONS CRUD
-  const fetchCustomDurations = async () => {
-    try {
-      const { data, error } = await supabase
-        .from('custom_durations')
-        .select('*')
-        .order('duration_value', { ascending: true });
-
-      if (error) throw error;
-      setCustomDurations(data || []);
-    } catch (error: any) {
-      console.error('Error fetching durations:', error);
-    }
-  };
-
   const addDuration = async () => {
     if (!newDuration.trim()) {
       alert('Please enter a duration value');
@@ -460,15 +349,11 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_durations')
-        .insert([{ duration_value: newDuration.trim() }]);
-
-      if (error) throw error;
+      const item = await createVocabularyItem('durations', newDuration.trim());
 
       await logActivity(`Added custom duration: ${newDuration.trim()}`);
       setNewDuration('');
-      fetchCustomDurations();
+      setCustomDurations((list) => withItem(list, { id: item.id, duration_value: item.value }, 'duration_value'));
     } catch (error: any) {
       console.error('Error adding duration:', error);
       alert('Failed to add duration');
@@ -485,17 +370,12 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_durations')
-        .update({ duration_value: editingValue.trim() })
-        .eq('id', id);
-
-      if (error) throw error;
+      const item = await updateVocabularyItem('durations', id, editingValue.trim());
 
       await logActivity(`Updated custom duration ID ${id}`);
       setEditingId(null);
       setEditingValue('');
-      fetchCustomDurations();
+      setCustomDurations((list) => withItem(list, { id: item.id, duration_value: item.value }, 'duration_value'));
     } catch (error: any) {
       console.error('Error updating duration:', error);
       alert('Failed to update duration');
@@ -509,15 +389,10 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_durations')
-        .delete()
-        .eq('id', id);
-
-      if (error) throw error;
+      await deleteVocabularyItem('durations', id);
 
       await logActivity(`Deleted custom duration: ${value}`);
-      fetchCustomDurations();
+      setCustomDurations((list) => list.filter((entry) => entry.id !== id));
     } catch (error: any) {
       console.error('Error deleting duration:', error);
       alert('Failed to delete duration');
@@ -527,20 +402,6 @@ export default function DrugOrder() {
   };
 
   // INSTRUCTIONS CRUD
-  const fetchCustomInstructions = async () => {
-    try {
-      const { data, error } = await supabase
-        .from('custom_instructions')
-        .select('*')
-        .order('instruction_value', { ascending: true });
-
-      if (error) throw error;
-      setCustomInstructions(data || []);
-    } catch (error: any) {
-      console.error('Error fetching instructions:', error);
-    }
-  };
-
   const addInstruction = async () => {
     if (!newInstruction.trim()) {
       alert('Please enter an instruction value');
@@ -549,15 +410,11 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_instructions')
-        .insert([{ instruction_value: newInstruction.trim() }]);
-
-      if (error) throw error;
+      const item = await createVocabularyItem('instructions', newInstruction.trim());
 
       await logActivity(`Added custom instruction: ${newInstruction.trim()}`);
       setNewInstruction('');
-      fetchCustomInstructions();
+      setCustomInstructions((list) => withItem(list, { id: item.id, instruction_value: item.value }, 'instruction_value'));
     } catch (error: any) {
       console.error('Error adding instruction:', error);
       alert('Failed to add instruction');
@@ -574,17 +431,12 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_instructions')
-        .update({ instruction_value: editingValue.trim() })
-        .eq('id', id);
-
-      if (error) throw error;
+      const item = await updateVocabularyItem('instructions', id, editingValue.trim());
 
       await logActivity(`Updated custom instruction ID ${id}`);
       setEditingId(null);
       setEditingValue('');
-      fetchCustomInstructions();
+      setCustomInstructions((list) => withItem(list, { id: item.id, instruction_value: item.value }, 'instruction_value'));
     } catch (error: any) {
       console.error('Error updating instruction:', error);
       alert('Failed to update instruction');
@@ -598,15 +450,10 @@ export default function DrugOrder() {
 
     setLoading(true);
     try {
-      const { error } = await supabase
-        .from('custom_instructions')
-        .delete()
-        .eq('id', id);
-
-      if (error) throw error;
+      await deleteVocabularyItem('instructions', id);
 
       await logActivity(`Deleted custom instruction: ${value}`);
-      fetchCustomInstructions();
+      setCustomInstructions((list) => list.filter((entry) => entry.id !== id));
     } catch (error: any) {
       console.error('Error deleting instruction:', error);
       alert('Failed to delete instruction');
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import supabase from '../lib/supabaseClient';
+import { fetchFinancialSummary } from '../lib/api/api';
 import './Financials.css';
 
 interface DailyStats {
@@ -31,6 +31,20 @@ interface MonthlyBreakdown {
   googleReferrals: number;
 }
 
+interface SummaryPeriod {
+  period: string;
+  totalVisits: number;
+  drugVisits: number;
+  consultationFees: number;
+  drugFees: number;
+  procedureFees: number;
+  totalRevenue: number;
+  cashPayments: number;
+  cardPayments: number;
+  gpayPayments: number;
+  newPatients: number;
+}
+
 interface MonthlyRevenue {
   month: string;
   drugRevenue: number;
@@ -66,80 +80,68 @@ export default function Financials() {
   const monthlyRevenueRowsPerPage = 10;
 
   useEffect(() => {
-    fetchDailyStats();
-    fetchDailyBreakdown();
+    fetchSummary();
     fetchMonthlyBreakdown();
-    fetchMonthlyRevenue();
   }, []);
 
-  const fetchDailyBreakdown = async () => {
+  const fetchSummary = async () => {
+    setLoading(true);
     setLoadingBreakdown(true);
+    setLoadingMonthlyRevenue(true);
     try {
-      // Fetch all visits
-      const { data: visitsData, error: visitsError } = await supabase
-        .from('visits')
-        .select('date, consultation_fee, drug_fee, Procedure_Fee, new_old')
-        .order('date', { ascending: false });
-
-      if (visitsError) throw visitsError;
-
-      // Fetch all medicines
-      const { data: medicinesData, error: medicinesError } = await supabase
-        .from('medicines')
-        .select('date, drug_fee')
-        .order('date', { ascending: false });
-
-      if (medicinesError) throw medicinesError;
-
-      // Group by date
-      const dateMap = new Map<string, DailyBreakdown>();
-
-      // Process visits
-      (visitsData || []).forEach(visit => {
-        const date = visit.date;
-        if (!dateMap.has(date)) {
-          dateMap.set(date, {
-            date,
-            totalVisits: 0,
-            drugVisits: 0,
-            newPatients: 0,
-            totalRevenue: 0,
+      // One pre-aggregated request instead of downloading every visit and medicine row
+      const summary = await fetchFinancialSummary({ granularity: 'day' });
+      const days: SummaryPeriod[] = summary.periods || [];
+
+      // Daily breakdown (already sorted by date descending)
+      setDailyBreakdown(days.map(day => ({
+        date: day.period,
+        totalVisits: day.totalVisits,
+        drugVisits: day.drugVisits,
+        newPatients: day.newPatients,
+        totalRevenue: day.totalRevenue,
+      })));
+
+      // Roll days up into months
+      const monthMap = new Map<string, MonthlyRevenue>();
+      days.forEach(day => {
+        const monthKey = day.period.slice(0, 7);
+        if (!monthMap.has(monthKey)) {
+          monthMap.set(monthKey, {
+            month: monthKey,
+            drugRevenue: 0,
+            consultationFee: 0,
+            procedureFee: 0,
+            cashPayments: 0,
           });
         }
-        const stats = dateMap.get(date)!;
-        stats.totalVisits++;
-        const newOldValue = (visit.new_old || '').trim().toUpperCase();
-        if (newOldValue === 'NEW' || newOldValue === 'N') stats.newPatients++;
-        stats.totalRevenue += (visit.consultation_fee || 0) + (visit.drug_fee || 0) + (visit.Procedure_Fee || 0);
+        const stats = monthMap.get(monthKey)!;
+        stats.drugRevenue += day.drugFees;
+        stats.consultationFee += day.consultationFees;
+        stats.procedureFee += day.procedureFees;
+        stats.cashPayments += day.cashPayments;
       });
+      setMonthlyRevenue(Array.from(monthMap.values()).sort((a, b) => b.month.localeCompare(a.month)));
 
-      // Process medicines
-      (medicinesData || []).forEach(medicine => {
-        const date = medicine.date;
-        if (!dateMap.has(date)) {
-          dateMap.set(date, {
-            date,
-            totalVisits: 0,
-            drugVisits: 0,
-            newPatients: 0,
-            totalRevenue: 0,
-          });
-        }
-        const stats = dateMap.get(date)!;
-        stats.drugVisits++;
-        stats.totalRevenue += medicine.drug_fee || 0;
+      // Today's cards
+      const today = new Date().toISOString().split('T')[0];
+      const todayStats = days.find(day => day.period === today);
+      setDailyStats({
+        consultationFees: todayStats?.consultationFees || 0,
+        drugFees: todayStats?.drugFees || 0,
+        procedureFees: todayStats?.procedureFees || 0,
+        totalRevenue: todayStats?.totalRevenue || 0,
+        cashPayments: todayStats?.cashPayments || 0,
+        cardPayments: todayStats?.cardPayments || 0,
+        gpayPayments: todayStats?.gpayPayments || 0,
+        newPatientsCount: todayStats?.newPatients || 0,
       });
-
-      // Convert to array and sort by date descending
-      const breakdown = Array.from(dateMap.values()).sort((a, b) => 
-        new Date(b.date).getTime() - new Date(a.date).getTime()
-      );
-
-      setDailyBreakdown(breakdown);
     } catch (err: any) {
-      console.error('Error fetching daily breakdown:', err);
+      console.error('Error fetching financial summary:', err);
     } finally {
+      setLoading(false);
       setLoadingBreakdown(false);
+      setLoadingMonthlyRevenue(false);
     }
   };
 
@@ -160,167 +162,6 @@ export default function Financials() {
     }
   };
 
-  const fetchMonthlyRevenue = async () => {
-    setLoadingMonthlyRevenue(true);
-    try {
-      // Fetch all visits
-      const { data: visitsData, error: visitsError } = await supabase
-        .from('visits')
-        .select('date, consultation_fee, drug_fee, Procedure_Fee, paymentmethod')
-        .order('date', { ascending: false });
-
-      if (visitsError) throw visitsError;
-
-      // Fetch all medicines
-      const { data: medicinesData, error: medicinesError } = await supabase
-        .from('medicines')
-        .select('date, drug_fee, payment_method')
-        .order('date', { ascending: false });
-
-      if (medicinesError) throw medicinesError;
-
-      // Group by month
-      const monthMap = new Map<string, MonthlyRevenue>();
-
-      // Process visits
-      (visitsData || []).forEach(visit => {
-        const date = new Date(visit.date);
-        const monthKey = `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}`;
-        
-        if (!monthMap.has(monthKey)) {
-          monthMap.set(monthKey, {
-            month: monthKey,
-            drugRevenue: 0,
-            consultationFee: 0,
-            procedureFee: 0,
-            cashPayments: 0,
-          });
-        }
-        
-        const stats = monthMap.get(monthKey)!;
-        stats.consultationFee += visit.consultation_fee || 0;
-        stats.drugRevenue += visit.drug_fee || 0;
-        stats.procedureFee += visit.Procedure_Fee || 0;
-        
-        // Add to cash payments if payment method is Cash
-        if (visit.paymentmethod?.toUpperCase() === 'CASH') {
-          stats.cashPayments += (visit.consultation_fee || 0) + (visit.drug_fee || 0) + (visit.Procedure_Fee || 0);
-        }
-      });
-
-      // Process medicines
-      (medicinesData || []).forEach(medicine => {
-        const date = new Date(medicine.date);
-        const monthKey = `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}`;
-        
-        if (!monthMap.has(monthKey)) {
-          monthMap.set(monthKey, {
-            month: monthKey,
-            drugRevenue: 0,
-            consultationFee: 0,
-            procedureFee: 0,
-            cashPayments: 0,
-          });
-        }
-        
-        const stats = monthMap.get(monthKey)!;
-        stats.drugRevenue += medicine.drug_fee || 0;
-        
-        // Add to cash payments if payment method is Cash
-        if (medicine.payment_method?.toUpperCase() === 'CASH') {
-          stats.cashPayments += medicine.drug_fee || 0;
-        }
-      });
-
-      // Convert to array and sort by month descending
-      const revenue = Array.from(monthMap.values()).sort((a, b) => b.month.localeCompare(a.month));
-      setMonthlyRevenue(revenue);
-    } catch (err: any) {
-      console.error('Error fetching monthly revenue:', err);
-    } finally {
-      setLoadingMonthlyRevenue(false);
-    }
-  };
-
-  const fetchDailyStats = async () => {
-    setLoading(true);
-    try {
-      const today = new Date().toISOString().split('T')[0];
-
-      // Fetch today's visits
-      const { data: visitsData, error: visitsError } = await supabase
-        .from('visits')
-        .select('consultation_fee, drug_fee, Procedure_Fee, paymentmethod, new_old')
-        .gte('date', today)
-        .lte('date', today);
-
-      if (visitsError) throw visitsError;
-
-      // Count new patients from today's visits
-      const newPatientsCount = (visitsData || []).filter(visit => {
-        const newOldValue = (visit.new_old || '').trim().toUpperCase();
-        return newOldValue === 'NEW' || newOldValue === 'N';
-      }).length;
-
-      // Fetch today's medicines
-      const { data: medicinesData, error: medicinesError } = await supabase
-        .from('medicines')
-        .select('drug_fee, payment_method')
-        .gte('date', today)
-        .lte('date', today);
-
-      if (medicinesError) throw medicinesError;
-
-      // Calculate stats from visits
-      const visitStats = (visitsData || []).reduce((acc, visit) => {
-        acc.consultationFees += visit.consultation_fee || 0;
-        acc.drugFees += visit.drug_fee || 0;
-        acc.procedureFees += visit.Procedure_Fee || 0;
-
-        const method = visit.paymentmethod?.toLowerCase();
-        if (method === 'cash') acc.cashPayments += (visit.consultation_fee || 0) + (visit.drug_fee || 0) + (visit.Procedure_Fee || 0);
-        else if (method === 'card') acc.cardPayments += (visit.consultation_fee || 0) + (visit.drug_fee || 0) + (visit.Procedure_Fee || 0);
-        else if (method === 'gpay') acc.gpayPayments += (visit.consultation_fee || 0) + (visit.drug_fee || 0) + (visit.Procedure_Fee || 0);
-
-        return acc;
-      }, { consultationFees: 0, drugFees: 0, procedureFees: 0, cashPayments: 0, cardPayments: 0, gpayPayments: 0 });
-
-      // Calculate stats from medicines
-      const medicineStats = (medicinesData || []).reduce((acc, medicine) => {
-        acc.drugFees += medicine.drug_fee || 0;
-
-        const method = medicine.payment_method?.toLowerCase();
-        if (method === 'cash') acc.cashPayments += medicine.drug_fee || 0;
-        else if (method === 'card') acc.cardPayments += medicine.drug_fee || 0;
-        else if (method === 'gpay') acc.gpayPayments += medicine.drug_fee || 0;
-
-        return acc;
-      }, { drugFees: 0, cashPayments: 0, cardPayments: 0, gpayPayments: 0 });
-
-      // Combine stats
-      const totalDrugFees = visitStats.drugFees + medicineStats.drugFees;
-      const totalCash = visitStats.cashPayments + medicineStats.cashPayments;
-      const totalCard = visitStats.cardPayments + medicineStats.cardPayments;
-      const totalGpay = visitStats.gpayPayments + medicineStats.gpayPayments;
-      const totalRevenue = visitStats.consultationFees + totalDrugFees + visitStats.procedureFees;
-
-      setDailyStats({
-        consultationFees: visitStats.consultationFees,
-        drugFees: totalDrugFees,
-        procedureFees: visitStats.procedureFees,
-        totalRevenue,
-        cashPayments: totalCash,
-        cardPayments: totalCard,
-        gpayPayments: totalGpay,
-        newPatientsCount,
-      });
-    } catch (err: any) {
-      console.error('Error fetching daily stats:', err);
-    } finally {
-      setLoading(false);
-    }
-  };
-
   const formatCurrency = (amount: number) => {
     return `₹${amount.toLocaleString('en-IN', { minimumFractionDigits: 2, maximumFractionDigits: 2 })}`;
   };
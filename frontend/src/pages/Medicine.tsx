@@ -46,8 +46,10 @@ export default function Medicine() {
         .select('*', { count: 'exact' })
         .order('med_id', { ascending: false });
 
-      if (searchName) {
-        query = query.ilike('patient_name', `%${searchName}%`);
+      // Filter on the row's own patient_name, so every matching medicine
+      // is counted and paged, however many patients share the name
+      if (searchName.trim()) {
+        query = query.ilike('patient_name', `%${searchName.trim()}%`);
       }
 
       if (dateFrom) {
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate, Link } from 'react-router-dom';
 import supabase, { getPatientImageUrl } from '../lib/supabaseClient';
 import { logActivity } from '../lib/activityLog';
+import { reindexPatient, fetchPatientCard } from '../lib/api/api';
 import EditPatientModal from '../components/EditPatientModal';
 import AddVisitModal from '../components/AddVisitModal';
 import AddMedicineModal from '../components/AddMedicineModal';
@@ -20,6 +21,7 @@ interface Patient {
 
 interface Visit {
   visit_id: number;
+  prescription?: Prescription | null;
   date: string;
   consultation_fee: number;
   drug_fee: number;
@@ -84,54 +86,17 @@ export default function PatientCard() {
   const [showDeleteConfirm, setShowDeleteConfirm] = useState(false);
   const [isEditPrescriptionModalOpen, setIsEditPrescriptionModalOpen] = useState(false);
   const [editingPrescription, setEditingPrescription] = useState<{ prescriptionId: number; visitId: number } | null>(null);
-  const [imageVersion, setImageVersion] = useState(Date.now());
+  const [imageVersion, setImageVersion] = useState(0);
 
   useEffect(() => {
     fetchPatientData();
   }, [patientId]);
 
-  const fetchPrescriptionForVisit = async (visitId: number) => {
-    if (prescriptions[visitId] && prescriptions[visitId].medicines) {
-      // Already loaded with full data
-      return;
-    }
-
-    try {
-      // Fetch prescription
-      const { data: prescData, error: prescError } = await supabase
-        .from('prescriptions')
-        .select('*')
-        .eq('visit_id', visitId)
-        .single();
-
-      if (prescError || !prescData) return;
-
-      // Fetch medicines for this prescription
-      const { data: medsData, error: medsError } = await supabase
-        .from('prescription_medicines')
-        .select('*')
-        .eq('prescription_id', prescData.prescription_id);
-
-      if (medsError) throw medsError;
-
-      setPrescriptions(prev => ({
-        ...prev,
-        [visitId]: {
-          ...prescData,
-          medicines: medsData || [],
-        },
-      }));
-    } catch (err) {
-      console.error('Error fetching prescription:', err);
-    }
-  };
-
   const toggleVisitExpansion = (visitId: number) => {
     if (expandedVisit === visitId) {
       setExpandedVisit(null);
     } else {
       setExpandedVisit(visitId);
-      fetchPrescriptionForVisit(visitId);
     }
   };
 
@@ -148,94 +113,40 @@ export default function PatientCard() {
 
   const handlePrescriptionSaved = () => {
     // Refresh prescription data
-    if (editingPrescription) {
-      fetchPrescriptionForVisit(editingPrescription.visitId);
-    }
+    fetchPatientData(true);
     setIsEditPrescriptionModalOpen(false);
     setEditingPrescription(null);
   };
 
-  const fetchPatientData = async () => {
+  // One request for the whole card; fresh bypasses the server's short-lived
+  // cache after this page has written something itself
+  const fetchPatientData = async (fresh = false) => {
     setLoading(true);
     setError('');
 
     try {
-      // Fetch patient details
-      const { data: patientData, error: patientError } = await supabase
-        .from('patients')
-        .select('*')
-        .eq('patient_id', patientId)
-        .single();
-
-      if (patientError) throw patientError;
-      setPatient(patientData);
-
-      // Fetch all visits for this patient (using patient_id)
-      const { data: visitsData, error: visitsError } = await supabase
-        .from('visits')
-        .select('*')
-        .eq('patient_id', patientId)
-        .order('date', { ascending: false });
-
-      if (visitsError) throw visitsError;
-
-      // Fetch all medicine visits for this patient
-      const { data: medicinesData, error: medicinesError } = await supabase
-        .from('medicines')
-        .select('*')
-        .eq('patient_id', patientId)
-        .order('date', { ascending: false });
-
-      if (medicinesError) throw medicinesError;
-
-      // Calculate statistics
-      const totalVisits = visitsData.length;
-      
-      // Total drug fees from BOTH visits table AND medicines table
-      const drugFeesFromVisits = visitsData.reduce((sum, v) => sum + (v.drug_fee || 0), 0);
-      const drugFeesFromMedicines = (medicinesData || []).reduce((sum, m) => sum + (m.drug_fee || 0), 0);
-      const totalDrugFees = drugFeesFromVisits + drugFeesFromMedicines;
-      
-      const totalConsultationFees = visitsData.reduce((sum, v) => sum + (v.consultation_fee || 0), 0);
-      const totalProcedureFees = visitsData.reduce((sum, v) => sum + (v.Procedure_Fee || 0), 0);
-      
-      // Get unique payment methods
-      const paymentMethods = [...new Set(visitsData.map(v => v.paymentmethod).filter(Boolean))];
-      
+      const card = await fetchPatientCard<Patient, Visit, Medicine>(patientId!, { fresh });
+      setPatient(card.patient);
+
       setStats({
-        totalVisits,
-        totalDrugFees,
-        totalConsultationFees,
-        totalProcedureFees,
-        paymentMethods,
-        recentVisits: visitsData.slice(0, 10), // Last 10 visits
-        medicineVisits: medicinesData || [],
+        totalVisits: card.stats.total_visits,
+        totalDrugFees: card.stats.total_drug_fees,
+        totalConsultationFees: card.stats.total_consultation_fees,
+        totalProcedureFees: card.stats.total_procedure_fees,
+        paymentMethods: card.stats.payment_methods,
+        recentVisits: card.visits.slice(0, 10), // Last 10 visits
+        medicineVisits: card.medicines,
       });
 
-      // Check which visits have prescriptions
-      const visitIds = visitsData.slice(0, 10).map(v => v.visit_id);
-      if (visitIds.length > 0) {
-        const { data: prescsData } = await supabase
-          .from('prescriptions')
-          .select('visit_id, prescription_id')
-          .in('visit_id', visitIds);
-
-        if (prescsData) {
-          const prescsMap: Record<number, boolean> = {};
-          prescsData.forEach(p => {
-            prescsMap[p.visit_id] = true;
-          });
-          // Mark which visits have prescriptions
-          const prescsTemp: Record<number, any> = {};
-          prescsData.forEach(p => {
-            prescsTemp[p.visit_id] = { prescription_id: p.prescription_id, visit_id: p.visit_id };
-          });
-          setPrescriptions(prescsTemp);
-        }
-      }
+      // Prescriptions (with their medicines) arrive nested in the visits
+      const prescriptionsByVisit: Record<number, Prescription> = {};
+      card.visits.forEach(v => {
+        if (v.prescription) prescriptionsByVisit[v.visit_id] = v.prescription;
+      });
+      setPrescriptions(prescriptionsByVisit);
 
     } catch (err: any) {
-      setError(err.message || 'Failed to fetch patient data');
+      setError(err.response?.data?.error || err.message || 'Failed to fetch patient data');
       console.error('Error fetching patient:', err);
     } finally {
       setLoading(false);
@@ -250,6 +161,7 @@ export default function PatientCard() {
         .eq('patient_id', patientId);
 
       if (deleteError) throw deleteError;
+      reindexPatient(Number(patientId));
 
       // Log activity
       await logActivity(`Deleted Patient (Patient ID: ${patientId}, Patient Name: ${patient?.name || 'Unknown'})`);
@@ -347,7 +259,7 @@ export default function PatientCard() {
             isOpen={isEditModalOpen}
             onClose={() => setIsEditModalOpen(false)}
             onPatientUpdated={() => {
-              fetchPatientData();
+              fetchPatientData(true);
               setImageVersion(Date.now());
             }}
             patient={patient}
@@ -356,7 +268,7 @@ export default function PatientCard() {
             isOpen={isAddModalOpen}
             onClose={() => setIsAddModalOpen(false)}
             onVisitAdded={() => {
-              fetchPatientData();
+              fetchPatientData(true);
             }}
             prefilledPatientId={patient.patient_id}
           />
@@ -364,7 +276,7 @@ export default function PatientCard() {
             isOpen={isMedicineModalOpen}
             onClose={() => setIsMedicineModalOpen(false)}
             onMedicineAdded={() => {
-              fetchPatientData();
+              fetchPatientData(true);
             }}
             prefilledPatientId={patient.patient_id}
           />
@@ -389,7 +301,7 @@ export default function PatientCard() {
           <div className="patient-avatar-large">
             {patient.pic_filename ? (
               <img 
-                src={`${getPatientImageUrl(patient.pic_filename)}${imageVersion ? `?v=${imageVersion}` : ''}`}
+                src={getPatientImageUrl(patient.pic_filename, 256, imageVersion) || ''}
                 alt={patient.name}
                 className="patient-avatar-img"
                 onError={(e) => {
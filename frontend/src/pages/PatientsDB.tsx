@@ -1,7 +1,8 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import supabase, { getPatientImageUrl } from '../lib/supabaseClient';
 import AddPatientModal from '../components/AddPatientModal';
+import { searchPatients } from '../lib/api/api';
 import './PatientsDB.css';
 
 interface Patient {
@@ -28,13 +29,33 @@ export default function PatientsDB() {
   const [genderFilter, setGenderFilter] = useState('All');
   
   const [isAddModalOpen, setIsAddModalOpen] = useState(false);
-  const [imageVersion, setImageVersion] = useState(Date.now());
+  const [imageVersion, setImageVersion] = useState(0);
+  const [truncated, setTruncated] = useState(false);
+  const latestRequest = useRef(0);
 
   const fetchPatients = async () => {
     setLoading(true);
     setError('');
+    const request = ++latestRequest.current;
 
     try {
+      // Name and phone searches go to the backend search index; a response
+      // for an older keystroke is dropped if a newer one was sent meanwhile
+      if (searchName.trim() || searchPhone.trim()) {
+        const result = await searchPatients<Patient>({
+          q: searchName.trim(),
+          phone: searchPhone.trim(),
+          sex: genderFilter !== 'All' ? genderFilter : undefined,
+          limit: patientsPerPage,
+          offset: (currentPage - 1) * patientsPerPage,
+        });
+        if (request !== latestRequest.current) return;
+        setPatients(result.results.map((r) => r.patient));
+        setTotalCount(result.total);
+        setTruncated(result.truncated);
+        return;
+      }
+
       let query = supabase
         .from('patients')
         .select('*', { count: 'exact' });
@@ -44,16 +65,6 @@ export default function PatientsDB() {
         query = query.eq('sex', genderFilter);
       }
 
-      // Apply name search (case-insensitive, starts with or contains)
-      if (searchName.trim()) {
-        query = query.ilike('name', `%${searchName.trim()}%`);
-      }
-
-      // Apply phone search
-      if (searchPhone.trim()) {
-        query = query.ilike('phone_no', `%${searchPhone.trim()}%`);
-      }
-
       // Pagination
       const from = (currentPage - 1) * patientsPerPage;
       const to = from + patientsPerPage - 1;
@@ -63,14 +74,16 @@ export default function PatientsDB() {
         .range(from, to);
 
       if (fetchError) throw fetchError;
+      if (request !== latestRequest.current) return;
 
       setPatients(data || []);
       setTotalCount(count || 0);
+      setTruncated(false);
     } catch (err: any) {
       setError(err.message || 'Failed to fetch patients');
       console.error('Error fetching patients:', err);
     } finally {
-      setLoading(false);
+      if (request === latestRequest.current) setLoading(false);
     }
   };
 
@@ -108,7 +121,11 @@ export default function PatientsDB() {
       <div className="page-header">
         <h1 className="page-title">Patients Database</h1>
         <div className="header-actions">
-          <span className="count-badge">{totalCount} Total Patients</span>
+          <span className="count-badge">
+            {searchName.trim() || searchPhone.trim()
+              ? `${totalCount}${truncated ? '+' : ''} Matching Patients`
+              : `${totalCount} Total Patients`}
+          </span>
           <button className="btn-add-patient" onClick={() => setIsAddModalOpen(true)}>
             + Add New Patient
           </button>
@@ -198,7 +215,7 @@ export default function PatientsDB() {
                 <div className="patient-avatar">
                   {patient.pic_filename ? (
                     <img 
-                      src={`${getPatientImageUrl(patient.pic_filename)}${imageVersion ? `?v=${imageVersion}` : ''}`}
+                      src={getPatientImageUrl(patient.pic_filename, 128, imageVersion) || ''}
                       alt={patient.name}
                       className="avatar-image"
                       onError={(e) => {
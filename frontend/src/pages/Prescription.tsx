@@ -1,8 +1,8 @@
 import React, { useState, useEffect } from 'react';
 import { useSearchParams } from 'react-router-dom';
-import { CLINIC_MEDICINES } from '../data/medicines';
+import { useMedicineSuggestions } from '../lib/useMedicineSuggestions';
+import { fetchVocabularies, savePrescription } from '../lib/api/api';
 import supabase from '../lib/supabaseClient';
-import { logActivity } from '../lib/activityLog';
 import './Prescription.css';
 
 interface CustomMedicine {
@@ -12,6 +12,8 @@ interface CustomMedicine {
 
 interface Medicine {
   id: string;
+  // Set for rows already stored, so a save updates them instead of re-adding
+  medicine_id?: number;
   name: string;
   quantity: string;
   time: string;
@@ -53,9 +55,26 @@ interface PrescriptionData {
   medicines: Medicine[];
 }
 
+// Letterhead logo data URI, shared by every print in this session
+let letterheadLogo: Promise<string> | null = null;
+
+const fetchLetterheadLogo = (): Promise<string> => {
+  if (!letterheadLogo) {
+    const apiBase = import.meta.env.VITE_API_URL || 'http://localhost:4000/api';
+    letterheadLogo = fetch(`${apiBase}/assets/letterhead`).then(async (response) => {
+      if (!response.ok) {
+        throw new Error(`Failed to fetch logo: ${response.status}`);
+      }
+      const data = await response.json();
+      return data.data_uri as string;
+    });
+  }
+  return letterheadLogo;
+};
+
 export default function Prescription() {
   const [searchParams] = useSearchParams();
-  const [allMedicines, setAllMedicines] = useState<string[]>(CLINIC_MEDICINES);
+  const { getSuggestions, requestSuggestions } = useMedicineSuggestions();
   
   // Dynamic dropdown options from database
   const [quantityOptions, setQuantityOptions] = useState<string[]>(['1', '2', 'N/A', 'CUSTOM']);
@@ -93,7 +112,6 @@ export default function Prescription() {
   const [customDurationMode, setCustomDurationMode] = useState<Record<string, boolean>>({});
   const [patient, setPatient] = useState<Patient | null>(null);
   const [visit, setVisit] = useState<Visit | null>(null);
-  const [existingPrescriptionId, setExistingPrescriptionId] = useState<number | null>(null);
   const [loadingPatient, setLoadingPatient] = useState(false);
 
   // Auto-load visit from URL params
@@ -107,92 +125,23 @@ export default function Prescription() {
     }
   }, [searchParams, searchParams.get('visit_id')]);
 
-  // Fetch custom medicines from DB and merge with hardcoded ones
-  useEffect(() => {
-    const fetchCustomMedicines = async () => {
-      try {
-        const { data, error } = await supabase
-          .from('custom_medicines')
-          .select('medicine_name')
-          .order('medicine_name', { ascending: true });
-
-        if (error) {
-          console.error('Error fetching custom medicines:', error);
-          return;
-        }
-
-        if (data && data.length > 0) {
-          const customNames = data.map(m => m.medicine_name);
-          // Merge hardcoded with custom, remove duplicates, and sort
-          const merged = [...new Set([...CLINIC_MEDICINES, ...customNames])].sort();
-          setAllMedicines(merged);
-        }
-      } catch (error) {
-        console.error('Error in fetchCustomMedicines:', error);
-      }
-    };
-
-    fetchCustomMedicines();
-  }, []);
-
   // Fetch dropdown options from database
   useEffect(() => {
     const fetchDropdownOptions = async () => {
       try {
-        // Fetch quantities
-        const { data: quantitiesData } = await supabase
-          .from('custom_quantities')
-          .select('quantity_value')
-          .order('quantity_value', { ascending: true });
-        
-        if (quantitiesData && quantitiesData.length > 0) {
-          const values = quantitiesData.map(q => q.quantity_value);
-          setQuantityOptions([...values, 'CUSTOM']);
-        }
-
-        // Fetch times
-        const { data: timesData } = await supabase
-          .from('custom_times')
-          .select('time_value')
-          .order('time_value', { ascending: true });
-        
-        if (timesData && timesData.length > 0) {
-          const values = timesData.map(t => t.time_value);
-          setTimeOptions([...values, 'CUSTOM']);
-        }
-
-        // Fetch areasites
-        const { data: areasitesData } = await supabase
-          .from('custom_areasites')
-          .select('areasite_value')
-          .order('areasite_value', { ascending: true });
-        
-        if (areasitesData && areasitesData.length > 0) {
-          const values = areasitesData.map(f => f.areasite_value);
-          setAreasiteOptions([...values, 'CUSTOM']);
-        }
-
-        // Fetch durations
-        const { data: durationsData } = await supabase
-          .from('custom_durations')
-          .select('duration_value')
-          .order('duration_value', { ascending: true });
-        
-        if (durationsData && durationsData.length > 0) {
-          const values = durationsData.map(d => d.duration_value);
-          setDurationOptions([...values, 'CUSTOM']);
-        }
-
-        // Fetch instructions
-        const { data: instructionsData } = await supabase
-          .from('custom_instructions')
-          .select('instruction_value')
-          .order('instruction_value', { ascending: true });
-        
-        if (instructionsData && instructionsData.length > 0) {
-          const values = instructionsData.map(i => i.instruction_value);
-          setInstructionOptions([...values, 'CUSTOM']);
-        }
+        // One request for every vocabulary; unchanged lists revalidate as a 304
+        const vocab = await fetchVocabularies();
+        const withCustom = (values: string[]) => (values.length > 0 ? [...values, 'CUSTOM'] : null);
+        const quantities = withCustom(vocab.quantities);
+        if (quantities) setQuantityOptions(quantities);
+        const times = withCustom(vocab.times);
+        if (times) setTimeOptions(times);
+        const areasites = withCustom(vocab.areasites);
+        if (areasites) setAreasiteOptions(areasites);
+        const durations = withCustom(vocab.durations);
+        if (durations) setDurationOptions(durations);
+        const instructions = withCustom(vocab.instructions);
+        if (instructions) setInstructionOptions(instructions);
       } catch (error) {
         console.error('Error fetching dropdown options:', error);
       }
@@ -293,10 +242,7 @@ export default function Prescription() {
           let loadedMedicines: Medicine[] = [];
           
           if (prescData) {
-            // Prescription exists - load it for editing
-            setExistingPrescriptionId(prescData.prescription_id);
-            
-            // Load medicines
+            // Prescription exists - load its medicines for editing
             const { data: medsData } = await supabase
               .from('prescription_medicines')
               .select('*')
@@ -305,6 +251,7 @@ export default function Prescription() {
             if (medsData && medsData.length > 0) {
               loadedMedicines = medsData.map(med => ({
                 id: med.medicine_id.toString(),
+                medicine_id: med.medicine_id,
                 name: med.medicine_name,
                 quantity: med.quantity || '1',
                 time: med.time || 'After Meal (Morning)',
@@ -312,8 +259,6 @@ export default function Prescription() {
                 duration: med.duration,
               }));
             }
-          } else {
-            setExistingPrescriptionId(null);
           }
 
           setFormData({
@@ -387,12 +332,7 @@ export default function Prescription() {
     });
   };
 
-  const getFilteredMedicines = (searchTerm: string) => {
-    if (!searchTerm) return [];
-    return allMedicines.filter((med) =>
-      med.toLowerCase().includes(searchTerm.toLowerCase())
-    );
-  };
+  const getFilteredMedicines = (searchTerm: string) => getSuggestions(searchTerm);
 
   const selectMedicine = (id: string, medicineName: string) => {
     updateMedicine(id, 'name', medicineName);
@@ -400,73 +340,38 @@ export default function Prescription() {
     setMedicineSearchTerms({ ...medicineSearchTerms, [id]: medicineName });
   };
 
-  const savePrescriptionToDB = async () => {
+  const savePrescriptionToDB = async (logAction?: string) => {
     if (!formData.visit_id) {
       alert('Please enter a valid Visit ID');
       return false;
     }
 
     try {
-      let prescriptionId = existingPrescriptionId;
-
-      if (existingPrescriptionId) {
-        // Update existing prescription
-        const { error: updateError } = await supabase
-          .from('prescriptions')
-          .update({
-            symptoms: formData.symptoms || null,
-            findings: null,
-            diagnosis: formData.diagnosis || null,
-            procedures: formData.procedures || null,
-          })
-          .eq('prescription_id', existingPrescriptionId);
-
-        if (updateError) throw updateError;
-
-        // Delete old medicines
-        const { error: deleteError } = await supabase
-          .from('prescription_medicines')
-          .delete()
-          .eq('prescription_id', existingPrescriptionId);
-
-        if (deleteError) throw deleteError;
-      } else {
-        // Insert new prescription
-        const { data: prescriptionData, error: prescError } = await supabase
-          .from('prescriptions')
-          .insert({
-            visit_id: parseInt(formData.visit_id),
-            symptoms: formData.symptoms || null,
-            findings: null,
-            diagnosis: formData.diagnosis || null,
-            procedures: formData.procedures || null,
-          })
-          .select()
-          .single();
-
-        if (prescError) throw prescError;
-        prescriptionId = prescriptionData.prescription_id;
-        setExistingPrescriptionId(prescriptionId);
-      }
-
-      // Insert medicines (fresh for both new and updated prescriptions)
-      if (formData.medicines.length > 0 && prescriptionId) {
-        const medicinesData = formData.medicines.map(med => ({
-          prescription_id: prescriptionId,
+      // One request: the backend diffs the medicines and writes everything in a single transaction
+      const medicines = formData.medicines;
+      const saved = await savePrescription({
+        visit_id: formData.visit_id,
+        symptoms: formData.symptoms || null,
+        findings: null,
+        diagnosis: formData.diagnosis || null,
+        procedures: formData.procedures || null,
+        medicines: medicines.map(med => ({
+          medicine_id: med.medicine_id ?? null,
           medicine_name: med.name,
           quantity: med.quantity,
           time: med.time,
           areasite: med.areasite,
           duration: med.duration,
-        }));
-
-        const { error: medError } = await supabase
-          .from('prescription_medicines')
-          .insert(medicinesData);
-
-        if (medError) throw medError;
-      }
+        })),
+        log_action: logAction,
+      });
 
+      // Inserted rows come back keyed by their position in the request, so saving again updates them
+      const idByRow = new Map(medicines.map((med, i) => [med.id, saved.inserted_ids[i] ?? med.medicine_id]));
+      setFormData(prev => ({
+        ...prev,
+        medicines: prev.medicines.map(med => ({ ...med, medicine_id: idByRow.get(med.id) ?? med.medicine_id })),
+      }));
       return true;
     } catch (err) {
       console.error('Error saving prescription:', err);
@@ -476,33 +381,21 @@ export default function Prescription() {
   };
 
   const savePrescriptionAndPrint = async () => {
-    const saved = await savePrescriptionToDB();
+    const saved = await savePrescriptionToDB(
+      `Saved and Printed Prescription For Visit (Visit ID: ${formData.visit_id}, Patient Name: ${formData.patient_name}, ${formData.medicines.length} medicines prescribed)`
+    );
     if (saved) {
-      // Log activity
-      await logActivity(`Saved and Printed Prescription For Visit (Visit ID: ${formData.visit_id}, Patient Name: ${formData.patient_name}, ${formData.medicines.length} medicines prescribed)`);
-      
       generatePDF();
     }
   };
 
   const generatePDF = async () => {
-    // Fetch and convert logo to base64
+    // Logo as a data URI, pre-encoded by the backend and cached for the session
     let logoBase64 = '';
     try {
-      const apiBase = import.meta.env.VITE_API_URL || 'http://localhost:4000';
-      const logoUrl = `${apiBase.replace('/api', '')}/static_images/logo.jpeg`;
-      const response = await fetch(logoUrl);
-      if (!response.ok) {
-        throw new Error(`Failed to fetch logo: ${response.status}`);
-      }
-      const blob = await response.blob();
-      logoBase64 = await new Promise<string>((resolve) => {
-        const reader = new FileReader();
-        reader.onloadend = () => resolve(reader.result as string);
-        reader.readAsDataURL(blob);
-      });
-      console.log('Logo loaded successfully');
+      logoBase64 = await fetchLetterheadLogo();
     } catch (err) {
+      letterheadLogo = null;
       console.error('Failed to load logo:', err);
     }
 
@@ -1201,6 +1094,7 @@ export default function Prescription() {
                             onChange={(e) => {
                               setMedicineSearchTerms({ ...medicineSearchTerms, [medicine.id]: e.target.value });
                               setShowMedicineDropdown({ ...showMedicineDropdown, [medicine.id]: true });
+                              requestSuggestions(e.target.value);
                             }}
                             onFocus={() => setShowMedicineDropdown({ ...showMedicineDropdown, [medicine.id]: true })}
                             placeholder="Search medicine..."
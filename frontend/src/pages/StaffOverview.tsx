@@ -22,6 +22,8 @@ export default function StaffOverview() {
   const [error, setError] = useState('');
   const [currentPage, setCurrentPage] = useState(1);
   const [totalCount, setTotalCount] = useState(0);
+  const [pageCursors, setPageCursors] = useState<(string | null)[]>([null]);
+  const [hasMore, setHasMore] = useState(false);
   const [dateFrom, setDateFrom] = useState('');
   const [dateTo, setDateTo] = useState('');
   const [selectedUser, setSelectedUser] = useState('');
@@ -37,13 +39,23 @@ export default function StaffOverview() {
 
   const fetchUsers = async () => {
     try {
-      const { data, error } = await supabase
-        .from('users')
-        .select('uuid, screenname, email')
-        .order('screenname', { ascending: true, nullsFirst: false });
+      const session = await supabase.auth.getSession();
+      const token = session?.data?.session?.access_token;
+      if (!token) return;
+
+      const apiBase = import.meta.env.VITE_API_URL || 'http://localhost:4000/api';
+      const response = await fetch(`${apiBase}/users`, {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+        },
+      });
+
+      if (!response.ok) {
+        throw new Error('Failed to fetch users');
+      }
 
-      if (error) throw error;
-      setUsers(data || []);
+      const data = await response.json();
+      setUsers(data.users || []);
     } catch (err) {
       console.error('Failed to fetch users:', err);
     }
@@ -64,11 +76,17 @@ export default function StaffOverview() {
 
       const apiBase = import.meta.env.VITE_API_URL || 'http://localhost:4000/api';
       
-      // Build query params
+      // Build query params: page 1 starts at the top, later pages continue from the previous page's cursor
       const params = new URLSearchParams({
-        page: currentPage.toString(),
         per_page: logsPerPage.toString(),
       });
+      const cursor = currentPage > 1 ? pageCursors[currentPage - 1] : null;
+      if (cursor) {
+        params.append('cursor', cursor);
+      } else {
+        params.append('page', currentPage.toString());
+        params.append('count', 'estimated');
+      }
 
       if (dateFrom) params.append('date_from', dateFrom);
       if (dateTo) params.append('date_to', dateTo);
@@ -86,7 +104,15 @@ export default function StaffOverview() {
 
       const data = await response.json();
       setLogs(data.logs || []);
-      setTotalCount(data.total || 0);
+      setHasMore(!!data.has_more);
+      if (data.next_cursor) {
+        setPageCursors(prev => {
+          const next = [...prev];
+          next[currentPage] = data.next_cursor;
+          return next;
+        });
+      }
+      if (data.total !== null && data.total !== undefined) setTotalCount(data.total);
     } catch (err: any) {
       setError(err.message || 'Failed to fetch logs');
       console.error('Error fetching logs:', err);
@@ -109,7 +135,7 @@ export default function StaffOverview() {
     });
   };
 
-  const totalPages = Math.ceil(totalCount / logsPerPage);
+  const totalPages = Math.max(Math.ceil(totalCount / logsPerPage), currentPage);
 
   const handlePrevPage = () => {
     if (currentPage > 1) {
@@ -118,7 +144,7 @@ export default function StaffOverview() {
   };
 
   const handleNextPage = () => {
-    if (currentPage < totalPages) {
+    if (hasMore) {
       setCurrentPage(currentPage + 1);
     }
   };
@@ -229,7 +255,7 @@ export default function StaffOverview() {
             </table>
           </div>
 
-          {totalCount > logsPerPage && (
+          {(currentPage > 1 || hasMore) && (
             <div className="pagination">
               <button 
                 onClick={handlePrevPage} 
@@ -243,7 +269,7 @@ export default function StaffOverview() {
               </span>
               <button 
                 onClick={handleNextPage} 
-                disabled={currentPage >= totalPages}
+                disabled={!hasMore}
                 className="pagination-btn"
               >
                 Next →
@@ -55,7 +55,8 @@ export default function Tests() {
         .from('visits')
         .select('*', { count: 'exact' });
 
-      // Apply name search
+      // Apply name search on the visit's own fullname, so every matching
+      // visit is counted and paged, however many patients share the name
       if (searchName.trim()) {
         query = query.ilike('fullname', `%${searchName.trim()}%`);
       }